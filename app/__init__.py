@@ -16,6 +16,9 @@ except ImportError:
 # 加载 .env 环境变量文件（优先加载，避免敏感配置硬编码）
 load_dotenv()
 
+# 未配置 SECRET_KEY 时使用的开发密钥（公开值，任何人都能用它伪造 Session）
+DEV_SECRET_KEY = 'dev-secret-key'
+
 def create_app():
     """
     Flask 应用工厂函数
@@ -32,6 +35,9 @@ def create_app():
     # 2.1 基础配置：支持中文、保留 JSON 键顺序
     app.config['JSON_AS_ASCII'] = False  # 关闭 ASCII 编码，确保 JSON 响应中中文正常显示
     app.config['JSON_SORT_KEYS'] = False  # 禁止 Flask 自动排序 JSON 响应的键，保持自定义顺序
+    # Session 签名密钥（购物车保存在签名 Cookie 中），生产环境必须通过环境变量配置；
+    # 未配置时使用公开的开发密钥，此时非调试/测试模式下购物车相关接口拒绝服务（见 session_secret_required）
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY') or DEV_SECRET_KEY
 
     # 2.2 数据库配置（从 .env 文件读取，避免硬编码）
     # 数据库连接字符串格式：mysql+pymysql://用户名:密码@主机:端口/数据库名?charset=utf8mb4
@@ -46,10 +52,109 @@ def create_app():
     # 可选：开启数据库查询日志（开发环境调试用）
     # app.config['SQLALCHEMY_ECHO'] = True
 
+    # 2.3 商品搜索配置
+    # MySQL 下是否使用全文索引（MATCH ... AGAINST）检索标题/描述，关闭后回退为 LIKE
+    app.config['ITEM_SEARCH_FULLTEXT'] = os.getenv('ITEM_SEARCH_FULLTEXT', 'true').lower() == 'true'
+    # 是否启用进程内倒排索引（启用后标题关键词搜索优先走内存索引）
+    app.config['ITEM_SEARCH_INDEX'] = os.getenv('ITEM_SEARCH_INDEX', 'false').lower() == 'true'
+    # 倒排索引与数据库增量同步的最小间隔（秒），用于感知其他进程的商品写入
+    app.config['ITEM_SEARCH_INDEX_SYNC_INTERVAL'] = float(os.getenv('ITEM_SEARCH_INDEX_SYNC_INTERVAL', '5'))
+    # 搜索总数缓存时间（秒），商品写入后立即失效
+    app.config['ITEM_COUNT_CACHE_TTL'] = float(os.getenv('ITEM_COUNT_CACHE_TTL', '30'))
+
+    # 2.4 商品浏览量写回缓冲配置
+    # 是否启用缓冲（关闭后每次浏览立即写库）
+    app.config['VIEW_COUNTER_ENABLED'] = os.getenv('VIEW_COUNTER_ENABLED', 'true').lower() == 'true'
+    # 缓冲写回间隔（秒），即进程崩溃时最多丢失的浏览量时间窗口
+    app.config['VIEW_COUNTER_FLUSH_INTERVAL'] = float(os.getenv('VIEW_COUNTER_FLUSH_INTERVAL', '5'))
+    # 缓冲中待写回浏览次数上限，达到后立即同步写回
+    app.config['VIEW_COUNTER_MAX_PENDING'] = int(os.getenv('VIEW_COUNTER_MAX_PENDING', '1000'))
+
+    # 2.5 事务重试配置（MySQL 死锁/锁等待超时时整体重试订单事务）
+    app.config['TX_MAX_RETRIES'] = int(os.getenv('TX_MAX_RETRIES', '3'))
+    # 重试退避基准时间（秒），第 n 次重试在 [0, base * 2^(n-1)] 内随机等待
+    app.config['TX_RETRY_BASE_DELAY'] = float(os.getenv('TX_RETRY_BASE_DELAY', '0.05'))
+
+    # 2.6 后台任务配置（浏览量写回等周期任务，测试模式下不启动）
+    app.config['BACKGROUND_JOBS_ENABLED'] = os.getenv('BACKGROUND_JOBS_ENABLED', 'true').lower() == 'true'
+
+    # 2.7 用户统计缓存配置
+    # 用户统计（已发布/已售出/收藏数）缓存时间（秒），商品写入与订单完成时失效
+    app.config['USER_STATS_CACHE_TTL'] = float(os.getenv('USER_STATS_CACHE_TTL', '60'))
+
+    # 2.8 接口响应缓存配置（商品推荐/搜索/分类列表）
+    app.config['RESPONSE_CACHE_ENABLED'] = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    # 缓存后端：memory（进程内 LRU）/ sqlite（本地文件，同一主机的多个工作进程共享）
+    app.config['RESPONSE_CACHE_BACKEND'] = os.getenv('RESPONSE_CACHE_BACKEND', 'memory')
+    # 最大缓存条目数
+    app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '2048'))
+    # sqlite 后端的缓存文件路径
+    app.config['RESPONSE_CACHE_PATH'] = os.getenv(
+        'RESPONSE_CACHE_PATH', os.path.join(app.instance_path, 'response_cache.sqlite3')
+    )
+    # 商品详情缓存时间（秒），商品写入、下单/取消订单（库存变化）时按标签失效
+    app.config['ITEM_DETAIL_CACHE_TTL'] = float(os.getenv('ITEM_DETAIL_CACHE_TTL', '300'))
+    # memory 后端的过期时间上限（秒）：标签失效只对执行写操作的进程生效，其他工作进程最多读到
+    # 这么久之前的库存/价格；上面的长 TTL（120-300 秒）只在 sqlite 共享后端下完整生效。
+    # 单进程部署可设为 0 取消上限
+    app.config['CACHE_LOCAL_MAX_TTL'] = float(os.getenv('CACHE_LOCAL_MAX_TTL', '30'))
+
+    # 2.9 首页推荐榜单配置
+    # 榜单容量（按浏览量取前 N 个商品），请求数量超出时直接查询数据库
+    app.config['FEATURED_LEADERBOARD_SIZE'] = int(os.getenv('FEATURED_LEADERBOARD_SIZE', '50'))
+    # 后台刷新间隔（秒）
+    app.config['FEATURED_REFRESH_INTERVAL'] = float(os.getenv('FEATURED_REFRESH_INTERVAL', '30'))
+    # 最大陈旧时间（秒），榜单超过该时间未刷新时在请求中重算
+    app.config['FEATURED_MAX_STALENESS'] = float(os.getenv('FEATURED_MAX_STALENESS', '60'))
+
+    # 2.10 库存预留配置（结算页检查库存时预留，下单时消费）
+    # 预留时长（秒），过期后归还库存
+    app.config['STOCK_RESERVATION_TTL'] = float(os.getenv('STOCK_RESERVATION_TTL', '600'))
+    # 后台归还过期预留的间隔（秒）
+    app.config['STOCK_RESERVATION_SWEEP_INTERVAL'] = float(os.getenv('STOCK_RESERVATION_SWEEP_INTERVAL', '30'))
+    # 每批归还的预留条数（每批一个事务、一条库存 UPDATE）
+    app.config['STOCK_RESERVATION_SWEEP_BATCH'] = int(os.getenv('STOCK_RESERVATION_SWEEP_BATCH', '500'))
+
+    # 2.11 待支付订单超时配置
+    # 支付超时时间（秒），超时未支付的订单自动取消并恢复库存
+    app.config['ORDER_PAYMENT_TIMEOUT'] = float(os.getenv('ORDER_PAYMENT_TIMEOUT', '1800'))
+    # 后台检查超时订单的间隔（秒）
+    app.config['ORDER_EXPIRY_INTERVAL'] = float(os.getenv('ORDER_EXPIRY_INTERVAL', '60'))
+    # 每批取消的订单数（每批一个事务、一条库存 UPDATE）
+    app.config['ORDER_EXPIRY_BATCH'] = int(os.getenv('ORDER_EXPIRY_BATCH', '200'))
+
+    # 2.12 购物车配置（保存在 Session 签名 Cookie 中）
+    # 购物车最多包含的商品种类数（限制 Cookie 体积）
+    app.config['CART_MAX_ITEMS'] = int(os.getenv('CART_MAX_ITEMS', '50'))
+
+    # 2.13 SQL 执行统计配置（每个请求的语句数/数据库耗时、慢查询日志）
+    app.config['SQL_INSTRUMENTATION_ENABLED'] = os.getenv('SQL_INSTRUMENTATION_ENABLED', 'true').lower() == 'true'
+    # 慢查询阈值（毫秒），超过时记录语句、参数与执行计划，0 表示不记录
+    app.config['SQL_SLOW_QUERY_MS'] = float(os.getenv('SQL_SLOW_QUERY_MS', '200'))
+    # 慢查询日志是否附带执行计划（仅 SELECT 语句）
+    app.config['SQL_SLOW_QUERY_EXPLAIN'] = os.getenv('SQL_SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+    # 是否在响应中添加 Server-Timing 头（数据库耗时、语句数、总耗时）
+    app.config['SERVER_TIMING_ENABLED'] = os.getenv('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+
     # 3. 注册 SQLAlchemy 实例（将 db 与 Flask 应用绑定）
     db.init_app(app)
     migrate.init_app(app, db)  # 初始化 Flask-Migrate，支持数据库迁移
     
+    # 3.1 配置缓存后端（接口响应缓存与业务数据缓存共用，标签失效对两者同时生效）
+    from app.utils.cache import response_cache, data_cache, create_backend
+    cache_backend = create_backend(
+        app.config['RESPONSE_CACHE_BACKEND'],
+        max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+        path=app.config['RESPONSE_CACHE_PATH'],
+        local_max_ttl=app.config['CACHE_LOCAL_MAX_TTL']
+    )
+    response_cache.configure(cache_backend)
+    data_cache.configure(cache_backend)
+
+    # 3.2 注册 SQL 执行统计（请求级语句数与数据库耗时、Server-Timing 响应头、慢查询日志）
+    from app.middleware.sql_instrumentation import register_sql_instrumentation
+    register_sql_instrumentation(app)
+    
     # 4. 注册所有API蓝图
     from app.api.auth import auth_bp
     from app.api.users import users_bp
@@ -65,10 +170,56 @@ def create_app():
     
     print("API蓝图注册完成: auth, users, items, orders, cart")  # 添加日志
 
+    # 4.1 构建商品倒排索引（启用时；数据库不可用则在首次搜索时重试）
+    if app.config['ITEM_SEARCH_INDEX']:
+        from app.services.item_index import item_index
+        with app.app_context():
+            try:
+                item_index.build()
+                print("商品倒排索引构建完成")
+            except Exception as e:
+                print(f"商品倒排索引构建失败，将在首次搜索时重试: {e}")
+
+    # 4.2 未配置 SECRET_KEY 时输出警告
+    if app.config['SECRET_KEY'] == DEV_SECRET_KEY:
+        app.logger.warning("未配置 SECRET_KEY，使用开发密钥；非调试/测试模式下购物车相关接口将拒绝服务")
+
+    # 4.3 注册后台任务（首个请求到达时启动）
+    _register_background_jobs(app)
+
     # 5. 注册路由（若存在路由注册函数）
     if register_routes is not None:
         register_routes(app)
         print("页面路由注册成功！")
 
-    # 6. 返回配置完整的应用实例
-    return app
\ No newline at end of file
+    # 6. 注册命令行工具（flask rebuild-ratings 等）
+    from app.commands import register_commands
+    register_commands(app)
+
+    # 7. 返回配置完整的应用实例
+    return app
+
+
+def _register_background_jobs(app):
+    """注册周期任务，并在进程退出时写回剩余的缓冲数据"""
+    import atexit
+    from app.utils.scheduler import scheduler
+    from app.services.view_counter import view_counter
+    from app.services.item_service import ItemService
+    from app.services.reservation_service import ReservationService
+    from app.services.order_service import OrderService
+
+    scheduler.add_task('flush-views', app.config['VIEW_COUNTER_FLUSH_INTERVAL'], view_counter.flush)
+    scheduler.add_task('refresh-featured', app.config['FEATURED_REFRESH_INTERVAL'], ItemService.refresh_featured)
+    scheduler.add_task('release-reservations', app.config['STOCK_RESERVATION_SWEEP_INTERVAL'],
+                       ReservationService.release_expired)
+    scheduler.add_task('expire-orders', app.config['ORDER_EXPIRY_INTERVAL'], OrderService.expire_pending_orders)
+    scheduler.init_app(app)
+
+    def _flush_on_exit():
+        if app.testing:
+            return
+        with app.app_context():
+            view_counter.flush()
+
+    atexit.register(_flush_on_exit)
@@ -4,13 +4,92 @@
 注意：购物车数据存储在Session中，不存储在数据库
 """
 
-from flask import Blueprint
+from flask import Blueprint, request, session
+from app.utils.response import APIResponse
+from app.services.cart_service import CartService
+from app.utils.decorators import check_session_secret
 
-cart_bp = Blueprint('cart_api', __name__, url_prefix='/cart')
+cart_bp = Blueprint('cart_api', __name__, url_prefix='/api/cart')
+# 购物车保存在签名 Session 中，未配置 SECRET_KEY 时拒绝服务
+cart_bp.before_request(check_session_secret)
 
-# TODO: 实现以下接口
-# GET    /                   - 获取购物车
-# POST   /add                - 添加到购物车
-# PUT    /<item_id>          - 修改购物车项数量
-# DELETE /<item_id>          - 删除购物车项
-# DELETE /                   - 清空购物车
+
+# -------------------------- 1. 获取购物车 --------------------------
+@cart_bp.route('/getCart', methods=['POST'])
+def get_cart():
+    """API.cart.getCart 接口实现（返回购物车项列表，价格与库存为最新值）"""
+    result = CartService.get_cart(session)
+    return APIResponse.success(
+        message='获取成功',
+        data=result['data']['items']
+    )
+
+
+# -------------------------- 2. 获取购物车统计 --------------------------
+@cart_bp.route('/getStats', methods=['POST'])
+def get_stats():
+    """API.cart.getStats 接口实现"""
+    result = CartService.get_cart_stats(session)
+    return APIResponse.success(
+        message='获取成功',
+        data=result['data']
+    )
+
+
+# -------------------------- 3. 添加到购物车 --------------------------
+@cart_bp.route('/addCart', methods=['POST'])
+def add_cart():
+    """API.cart.addCart 接口实现"""
+    data = request.json or {}
+
+    # 调用服务层
+    result = CartService.add_to_cart(session, data.get('itemId'), data.get('quantity', 1))
+    if not result['success']:
+        return APIResponse.error(message=result['message'])
+
+    # 返回成功响应
+    return APIResponse.success(
+        message='添加成功',
+        data=result['data']
+    )
+
+
+# -------------------------- 4. 修改购物车项数量 --------------------------
+@cart_bp.route('/updateCart', methods=['POST'])
+def update_cart():
+    """API.cart.updateCart 接口实现"""
+    data = request.json or {}
+
+    # 调用服务层
+    result = CartService.update_cart_item(session, data.get('itemId'), data.get('quantity'))
+    if not result['success']:
+        return APIResponse.error(message=result['message'])
+
+    # 返回成功响应
+    return APIResponse.success(
+        message='修改成功',
+        data=result['data']
+    )
+
+
+# -------------------------- 5. 删除购物车项 --------------------------
+@cart_bp.route('/removeCart', methods=['POST'])
+def remove_cart():
+    """API.cart.removeCart 接口实现"""
+    data = request.json or {}
+
+    # 调用服务层
+    result = CartService.remove_from_cart(session, data.get('itemId'))
+    if not result['success']:
+        return APIResponse.error(message=result['message'])
+
+    # 返回成功响应
+    return APIResponse.success(message=result['message'])
+
+
+# -------------------------- 6. 清空购物车 --------------------------
+@cart_bp.route('/clearCart', methods=['POST'])
+def clear_cart():
+    """API.cart.clearCart 接口实现"""
+    result = CartService.clear_cart(session)
+    return APIResponse.success(message=result['message'])
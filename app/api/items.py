@@ -5,7 +5,9 @@
 from flask import Blueprint, request, g
 from app.utils.response import APIResponse
 from app.services.item_service import ItemService
-from app.middleware.auth_middleware import auth_required
+from app.middleware.auth_middleware import auth_required, optional_auth
+from app.utils.decorators import cache_response
+from app.utils.cache import add_cache_tags
 
 items_bp = Blueprint('items', __name__, url_prefix='/api/item')
 
@@ -20,7 +22,7 @@ def get_featured():
     if not isinstance(limit, int) or limit <= 0:
         limit = 12
 
-    # 调用服务层
+    # 调用服务层（直接读取预先计算的推荐榜单）
     result = ItemService.get_featured_items(limit)
     if not result['success']:
         return APIResponse.error(message=result['message'])
@@ -33,6 +35,7 @@ def get_featured():
 
 # -------------------------- 2. 搜索商品 --------------------------
 @items_bp.route('/search', methods=['POST'])
+@cache_response(ttl=120, tags=('search',))
 def search():
     """API.item.search 接口实现"""
     data = request.json or {}
@@ -44,6 +47,10 @@ def search():
     min_price = data.get('minPrice', None)
     max_price = data.get('maxPrice', None)
     sort = data.get('sort', 'latest').strip()
+    # 游标分页（可选）：请求体包含 cursor 字段即启用，首页传空字符串或null
+    cursor = (data.get('cursor') or '') if 'cursor' in data else None
+    # 总数统计方式：exact（默认，精确计数并短期缓存）/ estimate（估算，响应中 total_is_estimate 为 true）
+    count_mode = data.get('countMode', 'exact')
 
     # 验证分页参数
     if not isinstance(page, int) or page <= 0:
@@ -53,11 +60,13 @@ def search():
 
     # 验证搜索类型和排序方式
     valid_search_types = ['title', 'seller', 'category']
-    valid_sorts = ['latest', 'popular', 'price-asc', 'price-desc']
+    valid_sorts = ['latest', 'popular', 'price-asc', 'price-desc', 'relevance']
     if search_type not in valid_search_types:
         search_type = 'title'
     if sort not in valid_sorts:
         sort = 'latest'
+    if count_mode not in ['exact', 'estimate']:
+        count_mode = 'exact'
 
     # 调用服务层
     result = ItemService.search_items(
@@ -68,10 +77,13 @@ def search():
         category=category if category else None,
         min_price=min_price,
         max_price=max_price,
-        sort=sort
+        sort=sort,
+        cursor=cursor,
+        count_mode=count_mode
     )
     if not result['success']:
         return APIResponse.error(message=result['message'])
+    add_cache_tags(*ItemService.listing_cache_tags(result['data']['items']))
 
     # 返回成功响应
     return APIResponse.success(
@@ -81,6 +93,7 @@ def search():
 
 # -------------------------- 3. 按分类获取商品 --------------------------
 @items_bp.route('/getByCategory/<category>', methods=['POST'])
+@cache_response(ttl=300)
 def get_by_category(category):
     """API.item.getByCategory 接口实现"""
     data = request.json or {}
@@ -97,6 +110,7 @@ def get_by_category(category):
     result = ItemService.get_items_by_category(category, page, limit)
     if not result['success']:
         return APIResponse.error(message=result['message'])
+    add_cache_tags(f'category:{category}', *ItemService.listing_cache_tags(result['data']['items']))
 
     # 返回成功响应
     return APIResponse.success(
@@ -177,12 +191,24 @@ def delete(item_id):
 
 # -------------------------- 8. 检查商品库存 --------------------------
 @items_bp.route('/checkStock', methods=['POST'])
+@optional_auth
 def check_stock():
     """API.item.checkStock 接口实现"""
-    item_list = request.json or []
+    # 兼容两种请求体：商品列表，或 {'items': [...], 'reserve': true}
+    data = request.json or []
+    reserve = False
+    item_list = data
+    if isinstance(data, dict):
+        item_list = data.get('items') or []
+        reserve = data.get('reserve') is True
+
+    # 预留库存需要登录
+    buyer_id = g.user_id if reserve else None
+    if reserve and not buyer_id:
+        return APIResponse.auth_error(message='请先登录')
 
     # 调用服务层
-    result = ItemService.check_stock(item_list)
+    result = ItemService.check_stock(item_list, buyer_id=buyer_id, reserve=reserve)
     if not result['success']:
         return APIResponse.error(message=result['message'])
 
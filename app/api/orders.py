@@ -3,10 +3,11 @@
 处理订单创建、查询、取消等操作（最复杂，涉及事务处理）
 """
 
-from flask import Blueprint, request, g
+from flask import Blueprint, request, g, session
 from app.services.order_service import OrderService
+from app.services.cart_service import CartService
 from app.middleware.auth_middleware import auth_required
-from app.utils.decorators import validate_request
+from app.utils.decorators import validate_request, session_secret_required
 from app.utils.response import success_response, error_response, validation_response, not_found_response
 
 orders_bp = Blueprint('orders_api', __name__, url_prefix='/orders')
@@ -31,7 +32,7 @@ orders_bp = Blueprint('orders_api', __name__, url_prefix='/orders')
 })
 def create_order():
     """
-    创建订单
+    创建订单（所有商品必须来自同一卖家，只创建一个订单；跨卖家购物车使用 POST /orders/checkout）
     POST /orders/
     
     请求体：
@@ -87,16 +88,83 @@ def create_order():
         )
 
 
+@orders_bp.route('/checkout', methods=['POST'])
+@auth_required
+@session_secret_required
+@validate_request({
+    'address_id': {'type': 'integer', 'required': True, 'min': 1}
+})
+def checkout():
+    """
+    购物车结算（按卖家拆分订单，同一事务内创建）
+    POST /orders/checkout
+    
+    请求体：
+    {
+        "address_id": 123
+    }
+    
+    响应：
+    {
+        "code": 0,
+        "message": "订单创建成功",
+        "data": {
+            "orders": [
+                {"order_id": 1, "seller_id": 3, "total_amount": 150.00, "status": "pending", ...},
+                {"order_id": 2, "seller_id": 5, "total_amount": 20.00, "status": "pending", ...}
+            ],
+            "total_amount": 170.00,
+            "items_count": 3
+        },
+        "timestamp": 1705300200
+    }
+    """
+    try:
+        data = request.get_json()
+        items_data = CartService.to_order_items(session)
+        if not items_data:
+            return error_response(message="购物车为空", code=400)
+        
+        # 调用订单服务结算
+        success, result = OrderService.checkout(
+            buyer_id=g.user_id,
+            items_data=items_data,
+            address_id=data['address_id']
+        )
+        
+        if success:
+            # 已下单的商品从购物车中移除
+            CartService.remove_items(session, [item['item_id'] for item in items_data])
+            return success_response(
+                data=result,
+                message="订单创建成功"
+            )
+        else:
+            return error_response(
+                message=result,
+                code=400
+            )
+            
+    except Exception as e:
+        return error_response(
+            message=f"结算失败: {str(e)}",
+            code=500
+        )
+
+
 @orders_bp.route('/', methods=['GET'])
 @auth_required
 def get_orders_list():
     """
     获取用户订单列表
     GET /orders/?page=1&limit=10
+    GET /orders/?cursor=&limit=10   （游标分页）
     
     查询参数：
     - page: 页码，默认1
     - limit: 每页数量，默认10
+    - cursor: 可选，传入即启用游标分页（首页传空值，后续传上一页的 next_cursor），
+      此时 pagination 返回 {"page_size", "next_cursor", "has_more"}，不再返回 total
     
     响应：
     {
@@ -141,6 +209,7 @@ def get_orders_list():
         # 获取分页参数
         page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 10, type=int)
+        cursor = request.args.get('cursor')
         
         # 参数验证
         if page < 1:
@@ -152,7 +221,8 @@ def get_orders_list():
         success, result = OrderService.get_orders(
             buyer_id=buyer_id,
             page=page,
-            limit=limit
+            limit=limit,
+            cursor=cursor
         )
         
         if success:
@@ -0,0 +1,37 @@
+# 命令行工具定义文件
+import click
+
+
+def register_commands(app):
+    """
+    注册所有 flask 命令行工具
+    使用方式：flask <命令名>
+    """
+
+    @app.cli.command('rebuild-ratings')
+    def rebuild_ratings():
+        """从 reviews 表重建 user_ratings 评分汇总"""
+        from app.services.review_service import ReviewService
+        count = ReviewService.rebuild_rating_summaries()
+        click.echo(f"评分汇总重建完成，共 {count} 个用户")
+
+    @app.cli.command('refresh-featured')
+    def refresh_featured():
+        """重新计算首页推荐榜单"""
+        from app.services.item_service import ItemService
+        ItemService.refresh_featured()
+        click.echo("推荐榜单刷新完成")
+
+    @app.cli.command('release-reservations')
+    def release_reservations():
+        """归还所有过期库存预留"""
+        from app.services.reservation_service import ReservationService
+        count = ReservationService.release_expired()
+        click.echo(f"过期库存预留归还完成，共 {count} 条")
+
+    @app.cli.command('expire-orders')
+    def expire_orders():
+        """取消超时未支付的订单并恢复库存"""
+        from app.services.order_service import OrderService
+        count = OrderService.expire_pending_orders()
+        click.echo(f"超时订单处理完成，共取消 {count} 个")
@@ -1,6 +1,6 @@
 """
 中间件模块
-包含全局错误处理、认证检查等中间件
+包含全局错误处理、认证检查、SQL 执行统计等中间件
 """
 
-__all__ = ['auth_middleware', 'error_handler']
+__all__ = ['auth_middleware', 'error_handler', 'sql_instrumentation']
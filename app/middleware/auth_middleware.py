@@ -53,4 +53,19 @@ def auth_required(func):
         
         g.user_id = payload.get('user_id')
         return func(*args, **kwargs)
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+
+def optional_auth(func):
+    """
+    可选登录装饰器
+    携带有效 Token 时设置 g.user_id，未携带或 Token 无效时 g.user_id 为 None，由接口自行决定是否要求登录
+    """
+    from functools import wraps
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = request.headers.get('Authorization', '').replace('Bearer ', '')
+        payload = verify_token(token) if token else None
+        g.user_id = payload.get('user_id') if payload else None
+        return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,137 @@
+"""
+SQL 执行统计
+通过 SQLAlchemy before_cursor_execute / after_cursor_execute 事件统计每条语句的耗时：
+
+- 请求级统计：语句数与数据库耗时记入当前请求（flask.g），并按接口（endpoint）累计到 metrics
+  （sql.requests.<endpoint> / sql.queries.<endpoint> / sql.time_ms.<endpoint>）
+- 响应头：Server-Timing: db;dur=..;desc="N queries", app;dur=..，浏览器开发者工具可直接查看
+- 慢查询日志：耗时超过 SQL_SLOW_QUERY_MS 的语句记录参数、所属接口，SELECT 语句附带执行计划
+
+后台任务、命令行工具中执行的语句没有请求上下文，只参与慢查询日志
+"""
+import logging
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 慢查询日志中参数的最大长度（IN 列表等参数可能很长）
+MAX_PARAMS_LENGTH = 500
+
+
+def register_sql_instrumentation(app):
+    """为应用的数据库引擎注册语句计时事件，并注册请求钩子"""
+    from app.models import db
+
+    if not app.config.get('SQL_INSTRUMENTATION_ENABLED', True):
+        return
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+    @app.before_request
+    def _start_sql_stats():
+        g.sql_queries = 0
+        g.sql_time = 0.0
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _finish_sql_stats(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = g.sql_time * 1000
+
+        endpoint = request.endpoint or 'unknown'
+        metrics.incr(f'sql.requests.{endpoint}')
+        metrics.incr(f'sql.queries.{endpoint}', g.sql_queries)
+        metrics.incr(f'sql.time_ms.{endpoint}', round(db_ms, 3))
+
+        if current_app.config.get('SERVER_TIMING_ENABLED', True):
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={db_ms:.2f};desc="{g.sql_queries} queries", app;dur={total_ms:.2f}'
+            )
+        return response
+
+
+def get_request_sql_stats() -> dict:
+    """当前请求到目前为止的语句数与数据库耗时（毫秒），不在请求中时返回 None"""
+    if not has_request_context() or 'sql_queries' not in g:
+        return None
+    return {'queries': g.sql_queries, 'time_ms': round(g.sql_time * 1000, 3)}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # 开始时间保存在连接上（同一连接同一时刻只执行一条语句），执行失败时由 _handle_error 弹出
+    conn.info.setdefault('sql_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['sql_started'].pop()
+    elapsed = time.perf_counter() - started
+
+    if has_request_context() and 'sql_queries' in g:
+        g.sql_queries += 1
+        g.sql_time += elapsed
+
+    if not has_app_context():
+        return
+    threshold = current_app.config.get('SQL_SLOW_QUERY_MS', 200)
+    if threshold <= 0 or elapsed * 1000 < threshold:
+        return
+
+    metrics.incr('sql.slow_queries')
+    endpoint = request.endpoint if has_request_context() else None
+    params = repr(parameters)
+    if len(params) > MAX_PARAMS_LENGTH:
+        params = params[:MAX_PARAMS_LENGTH] + '...'
+    message = (f"慢查询 {elapsed * 1000:.1f}ms（接口: {endpoint or '无'}）\n"
+               f"SQL: {statement}\n参数: {params}")
+    if not executemany and current_app.config.get('SQL_SLOW_QUERY_EXPLAIN', True):
+        plan = _explain(conn, cursor, statement, parameters)
+        if plan:
+            message += f"\n执行计划:\n{plan}"
+    logger.warning(message)
+
+
+def _handle_error(context):
+    # 执行失败时不会触发 after_cursor_execute，弹出对应的开始时间
+    # （ExceptionContext 的 cursor 属性可能未设置，只依赖 connection；不能抛出异常，否则会替换原始数据库错误）
+    if context.connection is not None:
+        started = context.connection.info.get('sql_started')
+        if started:
+            started.pop()
+
+
+def _explain(conn, cursor, statement, parameters):
+    """
+    获取 SELECT 语句的执行计划（其他语句返回 None）
+    直接使用底层 DBAPI 连接执行，不触发语句事件，也不影响调用方的游标结果
+    """
+    if statement.lstrip()[:6].upper() != 'SELECT':
+        return None
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    explain_cursor = None
+    try:
+        explain_cursor = cursor.connection.cursor()
+        explain_cursor.execute(prefix + statement, parameters)
+        columns = [column[0] for column in explain_cursor.description or ()]
+        rows = explain_cursor.fetchall()
+    except Exception as e:
+        logger.debug(f"获取执行计划失败: {str(e)}")
+        return None
+    finally:
+        if explain_cursor is not None:
+            explain_cursor.close()
+    lines = [' | '.join(columns)] if columns else []
+    lines += [' | '.join('' if value is None else str(value) for value in row) for row in rows]
+    return '\n'.join(lines)
@@ -85,9 +85,12 @@ class Item(db.Model):
         db.Index('idx_seller_id', 'seller_id'),
         db.Index('idx_category', 'category'),
         db.Index('idx_price', 'price'),
+        db.Index('idx_views', 'views'),
         db.Index('idx_created_at', 'created_at'),
-        # 全文索引在SQLAlchemy中通常通过数据库直接创建，此处仅做标记
-        # db.Index('idx_title_description', 'title', 'description', postgresql_using='gin')
+        db.Index('idx_updated_at', 'updated_at'),
+        # 全文索引（MySQL FULLTEXT + ngram 分词器，支持中文标题/描述检索）
+        db.Index('idx_title_description', 'title', 'description',
+                 mysql_prefix='FULLTEXT', mysql_with_parser='ngram'),
     )
 
     # 模型关联关系
@@ -156,6 +159,8 @@ class Order(db.Model):
     # 索引定义
     __table_args__ = (
         db.Index('idx_buyer_id', 'buyer_id'),
+        db.Index('idx_buyer_created_at', 'buyer_id', 'created_at', 'id'),
+        db.Index('idx_buyer_status', 'buyer_id', 'status', 'total_amount'),
         db.Index('idx_seller_id', 'seller_id'),
         db.Index('idx_status', 'status'),
         db.Index('idx_created_at', 'created_at'),
@@ -186,11 +191,8 @@ class Order(db.Model):
     def generate_order_number(self):
         """生成订单号（如果需要）"""
         if not self.order_number:
-            import time
-            import random
-            timestamp = int(time.time())
-            random_num = random.randint(1000, 9999)
-            self.order_number = f'ORD{timestamp}{random_num}'
+            from app.utils.order_number import generate_order_number
+            self.order_number = generate_order_number()
 
 # -------------------------- 4. 订单明细表（Order_Items）- 关联表 --------------------------
 class OrderItem(db.Model):
@@ -257,7 +259,71 @@ class Review(db.Model):
         db.CheckConstraint('rating BETWEEN 1 AND 5', name='check_rating_range'),
         db.Index('idx_item_id', 'item_id'),
         db.Index('idx_reviewer_id', 'reviewer_id'),
+        db.Index('idx_reviewee_id', 'reviewee_id'),
     )
 
     def __repr__(self):
-        return f"<Review(id={self.id}, item_id={self.item_id}, reviewer_id={self.reviewer_id}, reviewee_id={self.reviewee_id}, rating={self.rating})>"
\ No newline at end of file
+        return f"<Review(id={self.id}, item_id={self.item_id}, reviewer_id={self.reviewer_id}, reviewee_id={self.reviewee_id}, rating={self.rating})>"
+
+
+# -------------------------- 7. 用户评分汇总表（User_Ratings）- 统计表 --------------------------
+class UserRating(db.Model):
+    __tablename__ = 'user_ratings'
+
+    # 评分汇总字段（由 ReviewService.create_review 在同一事务内维护，可通过 flask rebuild-ratings 重建）
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True, comment='被评价用户ID')
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, comment='评分总和')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, comment='评价数量')
+    positive_count = db.Column(db.Integer, nullable=False, default=0, comment='好评数量（4星及以上）')
+    star_1_count = db.Column(db.Integer, nullable=False, default=0, comment='1星评价数量')
+    star_2_count = db.Column(db.Integer, nullable=False, default=0, comment='2星评价数量')
+    star_3_count = db.Column(db.Integer, nullable=False, default=0, comment='3星评价数量')
+    star_4_count = db.Column(db.Integer, nullable=False, default=0, comment='4星评价数量')
+    star_5_count = db.Column(db.Integer, nullable=False, default=0, comment='5星评价数量')
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, nullable=False, comment='更新时间')
+
+    # 好评阈值（评分大于等于该值计为好评）
+    POSITIVE_THRESHOLD = 4
+
+    @property
+    def average_rating(self) -> float:
+        """平均评分（无评价时默认5分）"""
+        if not self.rating_count:
+            return 5.0
+        return round(self.rating_sum / self.rating_count, 1)
+
+    def to_dict(self):
+        """将评分汇总转换为字典"""
+        return {
+            'user_id': self.user_id,
+            'average_rating': self.average_rating,
+            'review_count': self.rating_count,
+            'positive_count': self.positive_count,
+            'positive_rate': round(self.positive_count / self.rating_count, 3) if self.rating_count else 1.0,
+            'histogram': {str(star): getattr(self, f'star_{star}_count') for star in range(1, 6)}
+        }
+
+    def __repr__(self):
+        return f"<UserRating(user_id={self.user_id}, rating_sum={self.rating_sum}, rating_count={self.rating_count})>"
+
+# -------------------------- 8. 库存预留表（Stock_Reservations）- 临时占用 --------------------------
+class StockReservation(db.Model):
+    __tablename__ = 'stock_reservations'
+
+    # 预留时已从 items.stock 扣除对应数量；下单时消费，过期后归还库存并删除
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment='预留ID')
+    buyer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, comment='买家ID')
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id'), nullable=False, comment='商品ID')
+    quantity = db.Column(db.Integer, nullable=False, comment='预留数量')
+    expires_at = db.Column(db.DateTime, nullable=False, comment='过期时间')
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False, comment='创建时间')
+
+    # 索引定义（匹配schema.sql）
+    __table_args__ = (
+        db.UniqueConstraint('buyer_id', 'item_id', name='uk_buyer_item'),
+        db.Index('idx_item_expires', 'item_id', 'expires_at'),
+        db.Index('idx_expires_at', 'expires_at'),
+    )
+
+    def __repr__(self):
+        return f"<StockReservation(id={self.id}, buyer_id={self.buyer_id}, item_id={self.item_id}, quantity={self.quantity}, expires_at={self.expires_at})>"
@@ -104,22 +104,6 @@ def register_routes(app):
     # ============ API 路由（Mock 数据用） ============
     
     
-    @app.route('/api/cart', methods=['GET'])
-    def api_get_cart():
-        """获取购物车 API"""
-        return jsonify({
-            'statusCode': 200,
-            'data': {'items': []}
-        })
-    
-    @app.route('/api/cart/add', methods=['POST'])
-    def api_add_to_cart():
-        """添加到购物车 API"""
-        return jsonify({
-            'statusCode': 200,
-            'data': {'cart': []}
-        })
-    
     @app.route('/api/orders', methods=['POST'])
     def api_create_order():
         """创建订单 API"""
@@ -2,56 +2,143 @@
 购物车业务逻辑服务
 处理基于Session的购物车操作
 注意：购物车数据存储在Session中，不存储在数据库！
+
+Session 中只保存紧凑的 {商品ID: 数量} 映射（session['cart']，JSON 键为字符串），
+不冗余保存标题、价格等商品数据；读取购物车时一次 IN 查询刷新所有购物车项的
+价格、库存与在售状态，并在同一次遍历中计算统计数据
 """
+from flask import current_app
+
+from app.models import Item, db
+
+# Session 中保存购物车的键
+CART_SESSION_KEY = 'cart'
+# 单个商品的最大购买数量（与下单限制一致）
+MAX_QUANTITY = 100
 
 
 class CartService:
     """购物车服务类"""
-    
+
     @staticmethod
     def get_cart(session):
         """
         获取购物车
-        TODO: 从Session中读取购物车数据
-        - 检查库存是否仍充足
-        - 计算购物车统计（总件数、总金额）
+        一次查询取回所有购物车项的最新价格、库存与在售状态，同时计算统计数据；
+        已删除的商品从购物车中移除
+        :param session: Flask session
+        :return: 业务处理结果，data 为 {'items': [...], 'stats': {...}}
         """
-        pass
-    
+        cart = CartService._load(session)
+        items = {}
+        if cart:
+            rows = db.session.query(
+                Item.id, Item.title, Item.price, Item.image_url, Item.seller_id, Item.stock, Item.is_active
+            ).filter(Item.id.in_(list(cart)))
+            items = {row.id: row for row in rows}
+
+        lines = []
+        total_quantity = 0
+        total_amount = 0.0
+        unavailable_count = 0
+        for item_id, quantity in cart.items():
+            item = items.get(item_id)
+            if item is None:
+                continue
+            price = float(item.price) if item.price else 0.0
+            available = item.is_active and item.stock >= quantity
+            lines.append({
+                'item_id': item.id,
+                'title': item.title,
+                'price': price,
+                'image': item.image_url or '',
+                'seller_id': item.seller_id,
+                'quantity': quantity,
+                'stock': item.stock,
+                'is_active': item.is_active,
+                'available': available,
+                'subtotal': round(price * quantity, 2)
+            })
+            if available:
+                total_quantity += quantity
+                total_amount += price * quantity
+            else:
+                unavailable_count += 1
+
+        if len(lines) != len(cart):
+            CartService._save(session, {line['item_id']: line['quantity'] for line in lines})
+
+        return {
+            'success': True,
+            'data': {
+                'items': lines,
+                'stats': {
+                    'item_count': len(lines),
+                    'total_quantity': total_quantity,
+                    'total_amount': round(total_amount, 2),
+                    'unavailable_count': unavailable_count
+                }
+            }
+        }
+
     @staticmethod
     def add_to_cart(session, item_id, quantity):
         """
-        添加到购物车
-        TODO: 将商品添加到Session中的购物车
-        - 检查商品是否存在
-        - 检查库存是否充足
+        添加到购物车（已在购物车中的商品累加数量）
+        :param session: Flask session
+        :param item_id: 商品ID
+        :param quantity: 添加数量
+        :return: 业务处理结果
         """
-        pass
-    
+        error = CartService._validate(item_id, quantity)
+        if error:
+            return {'success': False, 'message': error}
+        cart = CartService._load(session)
+        if item_id not in cart and len(cart) >= current_app.config.get('CART_MAX_ITEMS', 50):
+            return {'success': False, 'message': '购物车商品种类已达上限'}
+        return CartService._set_quantity(session, cart, item_id, cart.get(item_id, 0) + quantity)
+
     @staticmethod
     def update_cart_item(session, item_id, quantity):
         """
         修改购物车项数量
-        TODO: 更新Session中的购物车项
+        :param session: Flask session
+        :param item_id: 商品ID
+        :param quantity: 新数量
+        :return: 业务处理结果
         """
-        pass
-    
+        error = CartService._validate(item_id, quantity)
+        if error:
+            return {'success': False, 'message': error}
+        cart = CartService._load(session)
+        if item_id not in cart:
+            return {'success': False, 'message': '商品不在购物车中'}
+        return CartService._set_quantity(session, cart, item_id, quantity)
+
     @staticmethod
     def remove_from_cart(session, item_id):
         """
         删除购物车项
-        TODO: 从Session中删除特定商品
+        :param session: Flask session
+        :param item_id: 商品ID
+        :return: 业务处理结果
         """
-        pass
-    
+        cart = CartService._load(session)
+        if cart.pop(item_id, None) is None:
+            return {'success': False, 'message': '商品不在购物车中'}
+        CartService._save(session, cart)
+        return {'success': True, 'message': '删除成功'}
+
     @staticmethod
     def clear_cart(session):
         """
         清空购物车
-        TODO: 清空Session中的所有购物车数据
+        :param session: Flask session
+        :return: 业务处理结果
         """
-        pass
-    
+        session.pop(CART_SESSION_KEY, None)
+        return {'success': True, 'message': '购物车已清空'}
+
     @staticmethod
     def get_cart_stats(session):
         """
@@ -60,4 +147,71 @@ class CartService:
         - 总金额
         - 商品数量
         """
-        pass
+        result = CartService.get_cart(session)
+        return {'success': True, 'data': result['data']['stats']}
+
+    @staticmethod
+    def to_order_items(session) -> list:
+        """
+        把购物车转换为下单参数（OrderService.checkout 的 items_data）
+        :return: [{'item_id': 1, 'quantity': 2}, ...]
+        """
+        return [{'item_id': item_id, 'quantity': quantity}
+                for item_id, quantity in CartService._load(session).items()]
+
+    @staticmethod
+    def remove_items(session, item_ids):
+        """从购物车中移除多个商品（结算成功后调用）"""
+        cart = CartService._load(session)
+        for item_id in item_ids:
+            cart.pop(item_id, None)
+        CartService._save(session, cart)
+
+    # -------------------------- 内部辅助方法 --------------------------
+    @staticmethod
+    def _load(session) -> dict:
+        """读取 Session 中的购物车：{商品ID(int): 数量}"""
+        return {int(item_id): quantity for item_id, quantity in session.get(CART_SESSION_KEY, {}).items()}
+
+    @staticmethod
+    def _save(session, cart: dict):
+        """写回 Session（空购物车直接删除键，减小 Cookie 体积）"""
+        if cart:
+            session[CART_SESSION_KEY] = {str(item_id): quantity for item_id, quantity in cart.items()}
+        else:
+            session.pop(CART_SESSION_KEY, None)
+
+    @staticmethod
+    def _validate(item_id, quantity):
+        """校验请求参数，返回错误信息或 None"""
+        if not isinstance(item_id, int) or item_id <= 0:
+            return '商品ID无效'
+        if not isinstance(quantity, int) or quantity <= 0:
+            return '数量必须为正整数'
+        return None
+
+    @staticmethod
+    def _set_quantity(session, cart: dict, item_id: int, new_quantity: int):
+        """
+        校验商品后设置购物车项数量
+        库存不足时仍允许加入，购物车中标记为不可购买，结算时以库存检查/预留结果为准
+        """
+        if new_quantity > MAX_QUANTITY:
+            return {'success': False, 'message': f'单个商品最多购买 {MAX_QUANTITY} 件'}
+
+        row = db.session.query(Item.stock, Item.is_active).filter(Item.id == item_id).first()
+        if row is None or not row.is_active:
+            return {'success': False, 'message': '商品不存在或已下架'}
+
+        cart[item_id] = new_quantity
+        CartService._save(session, cart)
+        return {
+            'success': True,
+            'message': '操作成功',
+            'data': {
+                'item_id': item_id,
+                'quantity': new_quantity,
+                'stock': row.stock,
+                'available': row.stock >= new_quantity
+            }
+        }
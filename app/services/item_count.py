@@ -0,0 +1,97 @@
+"""
+商品搜索总数统计策略
+搜索分页的 count 查询需要扫描整个过滤结果集，在空关键词浏览等热门场景下是主要耗时来源
+
+- exact：精确计数，按规范化后的过滤条件缓存（短TTL），商品写入后整体失效
+- estimate：估算计数，MySQL 下读取 EXPLAIN 的预估行数（rows × filtered%），
+  其他数据库不支持估算时退回精确计数
+"""
+import logging
+from flask import current_app
+from app.models import db
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class ItemCountStrategy:
+    """商品搜索总数统计策略"""
+
+    COUNT_MODES = ('exact', 'estimate')
+
+    # 进程内计数缓存：(计数模式, 规范化过滤条件) -> (总数, 是否估算)
+    _cache = TTLCache(ttl=30, max_entries=2048)
+
+    @staticmethod
+    def make_key(keyword: str, search_type: str, category: str = None,
+                 min_price: float = None, max_price: float = None) -> tuple:
+        """
+        规范化过滤条件（与排序/分页无关），作为计数缓存键
+        """
+        return (
+            (keyword or '').strip().lower(),
+            search_type if keyword else '',
+            (category or '').strip(),
+            float(min_price) if min_price is not None and min_price >= 0 else None,
+            float(max_price) if max_price is not None and max_price > 0 else None
+        )
+
+    @staticmethod
+    def count(items_query, filter_key: tuple, mode: str = 'exact'):
+        """
+        获取过滤结果总数
+        :param items_query: 已应用过滤条件的商品查询
+        :param filter_key: make_key 生成的规范化过滤条件
+        :param mode: 计数模式（exact/estimate）
+        :return: (总数, 是否为估算值)
+        """
+        if mode not in ItemCountStrategy.COUNT_MODES:
+            mode = 'exact'
+        cache_key = (mode, filter_key)
+        cached = ItemCountStrategy._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        result = None
+        if mode == 'estimate':
+            estimated = ItemCountStrategy._estimate(items_query)
+            if estimated is not None:
+                result = (estimated, True)
+        if result is None:
+            result = (items_query.order_by(None).count(), False)
+
+        ItemCountStrategy._cache.set(
+            cache_key, result, ttl=current_app.config.get('ITEM_COUNT_CACHE_TTL', 30)
+        )
+        return result
+
+    @staticmethod
+    def invalidate():
+        """商品写入后使所有计数缓存失效"""
+        ItemCountStrategy._cache.clear()
+
+    @staticmethod
+    def _estimate(items_query):
+        """
+        通过 EXPLAIN 读取 items 表的预估行数（仅 MySQL）
+        :return: 估算总数；不支持或失败时返回 None
+        """
+        bind = db.session.get_bind()
+        if bind.dialect.name != 'mysql':
+            return None
+        try:
+            compiled = items_query.order_by(None).statement.compile(
+                dialect=bind.dialect, compile_kwargs={'render_postcompile': True}
+            )
+            # pymysql 使用位置参数（format 风格），按编译后的参数顺序传参
+            params = tuple(compiled.params[name] for name in compiled.positiontup)
+            rows = db.session.connection().exec_driver_sql(
+                f'EXPLAIN {compiled}', params
+            ).mappings().all()
+            for row in rows:
+                if row.get('table') == 'items':
+                    filtered = float(row.get('filtered') or 100.0)
+                    return int(round(int(row.get('rows') or 0) * filtered / 100.0))
+        except Exception as e:
+            logger.warning(f"估算商品总数失败，退回精确计数: {str(e)}")
+        return None
@@ -0,0 +1,209 @@
+"""
+商品内存倒排索引（可选）
+适用于无法使用 MySQL 全文索引、或全文索引性能不足的部署
+
+- 索引字段：标题、描述、分类（分类代码 + 中文名）
+- 分词：按非文字字符切分为片段，每个片段生成单字和相邻二元组（中文 bigram）
+- 启动时从 items 表全量构建，ItemService 的发布/更新/删除在提交后增量更新
+- 多进程部署时各进程各自维护一份索引，检索前按 updated_at 增量同步其他进程的写入；
+  同步点向前回退 SYNC_OVERLAP_SECONDS，覆盖查询时尚未提交、但 updated_at 早于同步点的事务
+  （重复拉取的商品按 upsert 幂等处理）
+
+检索只返回候选商品ID及相关度得分，分页/过滤/排序仍由数据库在候选ID范围内完成
+"""
+import re
+import threading
+import time
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from app.models import Item, db
+
+logger = logging.getLogger(__name__)
+
+# 非文字字符（用于切分片段），保留字母、数字、下划线和中日韩文字
+_SPLIT_PATTERN = re.compile(r'[^\w]+', re.UNICODE)
+
+# 增量同步的回退时间（秒），应长于最长的商品写事务（含 MySQL DATETIME 秒级截断）
+SYNC_OVERLAP_SECONDS = 60
+
+
+class ItemInvertedIndex:
+    """商品内存倒排索引"""
+
+    # 字段分隔符，避免匹配跨越标题/描述/分类边界
+    FIELD_SEPARATOR = '\x00'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(set)  # 词元 -> {商品ID}
+        self._docs = {}                    # 商品ID -> (标题规范化文本, 全文规范化文本, 词元集合)
+        self.ready = False
+        self.synced_at = None              # 最近一次与数据库同步的时间（datetime）
+        self._last_sync_check = 0.0
+
+    # -------------------------- 分词 --------------------------
+    @staticmethod
+    def normalize(text: str) -> list:
+        """
+        规范化文本并切分为片段
+        :param text: 原始文本
+        :return: 小写片段列表
+        """
+        if not text:
+            return []
+        return [segment for segment in _SPLIT_PATTERN.split(text.lower()) if segment]
+
+    @staticmethod
+    def tokenize_segment(segment: str) -> set:
+        """单个片段的词元：全部单字 + 相邻二元组"""
+        tokens = set(segment)
+        tokens.update(segment[i:i + 2] for i in range(len(segment) - 1))
+        return tokens
+
+    @staticmethod
+    def _query_tokens(segment: str) -> set:
+        """检索片段使用的词元：单字片段用单字，其余用二元组"""
+        if len(segment) == 1:
+            return {segment}
+        return {segment[i:i + 2] for i in range(len(segment) - 1)}
+
+    # -------------------------- 构建与增量更新 --------------------------
+    def build(self):
+        """从 items 表全量构建索引（仅索引在售商品）"""
+        started = time.perf_counter()
+        sync_point = datetime.now() - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+        rows = db.session.query(
+            Item.id, Item.title, Item.description, Item.category
+        ).filter(Item.is_active == True).all()
+
+        postings = defaultdict(set)
+        docs = {}
+        for row in rows:
+            doc = self._make_doc(row.title, row.description, row.category)
+            docs[row.id] = doc
+            for token in doc[2]:
+                postings[token].add(row.id)
+
+        with self._lock:
+            self._postings = postings
+            self._docs = docs
+            self.synced_at = sync_point
+            self._last_sync_check = time.monotonic()
+            self.ready = True
+
+        logger.info(f"商品倒排索引构建完成: 商品数={len(docs)}, 词元数={len(postings)}, "
+                    f"耗时={(time.perf_counter() - started) * 1000:.1f}ms")
+
+    def upsert(self, item):
+        """新增或更新单个商品（已下架商品会被移出索引）"""
+        if not item.is_active:
+            self.remove(item.id)
+            return
+        doc = self._make_doc(item.title, item.description, item.category)
+        with self._lock:
+            self._remove_locked(item.id)
+            self._docs[item.id] = doc
+            for token in doc[2]:
+                self._postings[token].add(item.id)
+
+    def remove(self, item_id: int):
+        """从索引中移除商品"""
+        with self._lock:
+            self._remove_locked(item_id)
+
+    def sync(self, min_interval: float = 0.0):
+        """
+        增量同步其他进程的写入：拉取 updated_at 晚于上次同步点（已回退 SYNC_OVERLAP_SECONDS）的商品
+        :param min_interval: 两次同步检查的最小间隔（秒）
+        """
+        if not self.ready:
+            self.build()
+            return
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_sync_check < min_interval:
+                return
+            self._last_sync_check = now
+            since = self.synced_at
+
+        sync_point = datetime.now() - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+        changed = Item.query.filter(Item.updated_at >= since).all()
+        for item in changed:
+            self.upsert(item)
+        with self._lock:
+            self.synced_at = max(self.synced_at, sync_point)
+
+    # -------------------------- 检索 --------------------------
+    def search(self, keyword: str) -> dict:
+        """
+        检索关键词（空白分隔的多个词按 AND 组合，每个词按子串语义匹配）
+        :param keyword: 搜索关键词
+        :return: {商品ID: 相关度得分}，标题命中得分高于描述/分类命中
+        """
+        terms = [self.normalize(term) for term in keyword.split()]
+        terms = [segments for segments in terms if segments]
+        if not terms:
+            return {}
+
+        with self._lock:
+            scores = None
+            for segments in terms:
+                # 先用词元倒排表求交集得到候选，再用子串校验消除二元组误命中
+                candidates = None
+                for segment in segments:
+                    for token in self._query_tokens(segment):
+                        posting = self._postings.get(token)
+                        if not posting:
+                            return {}
+                        candidates = set(posting) if candidates is None else candidates & posting
+                        if not candidates:
+                            return {}
+
+                term_scores = {}
+                for item_id in candidates:
+                    title_text, full_text, _ = self._docs[item_id]
+                    if all(segment in full_text for segment in segments):
+                        term_scores[item_id] = 2 if all(segment in title_text for segment in segments) else 1
+
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {item_id: scores[item_id] + score
+                              for item_id, score in term_scores.items() if item_id in scores}
+                if not scores:
+                    return {}
+            return scores
+
+    # -------------------------- 内部方法 --------------------------
+    def _make_doc(self, title, description, category):
+        """生成单个商品的索引文档"""
+        category_name = dict(Item.CATEGORY_CHOICES).get(category, '')
+        title_segments = self.normalize(title)
+        all_segments = title_segments + self.normalize(description) + self.normalize(category) \
+            + self.normalize(category_name)
+        tokens = set()
+        for segment in all_segments:
+            tokens.update(self.tokenize_segment(segment))
+        return (
+            self.FIELD_SEPARATOR.join(title_segments),
+            self.FIELD_SEPARATOR.join(all_segments),
+            tokens
+        )
+
+    def _remove_locked(self, item_id: int):
+        """移除商品（调用方需持有锁）"""
+        doc = self._docs.pop(item_id, None)
+        if not doc:
+            return
+        for token in doc[2]:
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.discard(item_id)
+                if not posting:
+                    del self._postings[token]
+
+
+# 进程内全局索引实例
+item_index = ItemInvertedIndex()
@@ -0,0 +1,64 @@
+"""
+商品关键词搜索引擎
+负责把搜索关键词转换为查询条件和相关度排序表达式
+
+- MySQL：使用 items 表上的 FULLTEXT 索引（idx_title_description，ngram 分词器支持中文），
+  MATCH ... AGAINST 同时检索标题和描述，并提供相关度得分
+- 其他数据库（如测试使用的 SQLite）：回退为标题/描述的 LIKE 模糊匹配，
+  相关度按“标题命中优先、其次描述命中”近似
+"""
+from flask import current_app
+from sqlalchemy import or_, case
+from sqlalchemy.dialects.mysql import match
+from app.models import Item, db
+
+
+class ItemSearchEngine:
+    """商品关键词搜索引擎"""
+
+    # ngram 分词器默认 ngram_token_size=2，短于该长度的关键词无法命中全文索引，回退为 LIKE
+    NGRAM_TOKEN_SIZE = 2
+
+    @staticmethod
+    def use_fulltext(keyword: str) -> bool:
+        """
+        判断当前关键词是否走全文索引
+        :param keyword: 已去除首尾空格的关键词
+        :return: 是否使用 MATCH ... AGAINST
+        """
+        if not current_app.config.get('ITEM_SEARCH_FULLTEXT', True):
+            return False
+        if len(keyword) < ItemSearchEngine.NGRAM_TOKEN_SIZE:
+            return False
+        return db.session.get_bind().dialect.name == 'mysql'
+
+    @staticmethod
+    def keyword_condition(keyword: str):
+        """
+        关键词过滤条件（标题 + 描述）
+        :param keyword: 已去除首尾空格的关键词
+        :return: SQLAlchemy 过滤表达式
+        """
+        if ItemSearchEngine.use_fulltext(keyword):
+            return ItemSearchEngine._match(keyword) > 0
+        return or_(
+            Item.title.like(f'%{keyword}%'),
+            Item.description.like(f'%{keyword}%')
+        )
+
+    @staticmethod
+    def relevance_order(keyword: str) -> list:
+        """
+        相关度排序表达式（sort='relevance'）
+        :param keyword: 已去除首尾空格的关键词
+        :return: order_by 表达式列表
+        """
+        if ItemSearchEngine.use_fulltext(keyword):
+            return [ItemSearchEngine._match(keyword).desc(), Item.created_at.desc()]
+        title_hit = case((Item.title.like(f'%{keyword}%'), 1), else_=0)
+        return [title_hit.desc(), Item.created_at.desc()]
+
+    @staticmethod
+    def _match(keyword: str):
+        """MATCH(title, description) AGAINST(:keyword) —— 自然语言模式，返回相关度得分"""
+        return match(Item.title, Item.description, against=keyword)
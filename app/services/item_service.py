@@ -2,9 +2,26 @@
 商品业务逻辑服务层
 负责处理商品查询、创建、更新、删除等核心业务逻辑
 """
+import logging
 from app.models import Item, User, OrderItem, db
+from app.services.item_index import item_index
+from app.services.item_search import ItemSearchEngine
+from app.services.item_count import ItemCountStrategy
+from app.services.view_counter import view_counter
+from app.services.reservation_service import ReservationService
+from app.services.stock_service import InsufficientStockError
+from app.utils.cache import data_cache, invalidate_cache_tags
+from app.utils.pagination import CursorError, encode_cursor, decode_cursor, keyset_condition, keyset_order
+from flask import current_app
 from datetime import datetime
 from sqlalchemy import or_, and_
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+# 推荐榜单在缓存中的键
+FEATURED_CACHE_KEY = 'featured:leaderboard'
+
 
 class ItemService:
     """商品服务类"""
@@ -14,58 +31,93 @@ class ItemService:
     def get_featured_items(limit: int = 12):
         """
         获取首页推荐商品
+        直接读取预先计算好的推荐榜单（浏览量前 FEATURED_LEADERBOARD_SIZE 名的商品卡片），
+        榜单由后台任务定期刷新，超过 FEATURED_MAX_STALENESS 秒未刷新时在本次请求中重算；
+        商品发布/更新/下架后榜单立即失效；榜单按成员商品打标签，
+        榜单内商品的库存/价格变化（下单、取消订单、库存预留）同样使榜单失效
         :param limit: 返回商品数量
         :return: 业务处理结果
         """
-        # 查询推荐商品（按浏览量倒序排序，取前limit条）
-        items = Item.query.filter_by(is_active=True).order_by(Item.views.desc()).limit(limit).all()
+        size = current_app.config.get('FEATURED_LEADERBOARD_SIZE', 50)
+        if limit > size:
+            # 超出榜单容量时直接查询
+            return {'success': True, 'data': ItemService._query_featured_cards(limit)}
+
+        leaderboard = data_cache.get_or_set(
+            FEATURED_CACHE_KEY,
+            lambda: ItemService._build_featured_leaderboard(size),
+            ttl=current_app.config.get('FEATURED_MAX_STALENESS', 60),
+            tags=ItemService._featured_cache_tags
+        )
+        return {'success': True, 'data': leaderboard['items'][:limit]}
 
-        # 组装商品数据
-        item_list = []
-        for item in items:
-            seller = User.query.get(item.seller_id)
-            item_data = {
-                'id': item.id,
-                'title': item.title,
-                'description': item.description,
-                'price': float(item.price) if item.price else 0.0,
-                'stock': item.stock,
-                'image': item.image_url or '',
-                'category': item.category,
-                'seller_id': item.seller_id,
-                'seller_name': seller.username if seller else '未知卖家',
-                'seller_rating': UserService._get_user_rating(item.seller_id) if seller else 0.0,
-                'views': item.views,
-                'created_at': item.created_at.isoformat() if item.created_at else None
-            }
-            item_list.append(item_data)
+    @staticmethod
+    def refresh_featured():
+        """重新计算推荐榜单并写入缓存（后台任务定期调用）"""
+        size = current_app.config.get('FEATURED_LEADERBOARD_SIZE', 50)
+        data_cache.refresh(
+            FEATURED_CACHE_KEY,
+            lambda: ItemService._build_featured_leaderboard(size),
+            ttl=current_app.config.get('FEATURED_MAX_STALENESS', 60),
+            tags=ItemService._featured_cache_tags
+        )
+
+    @staticmethod
+    def _build_featured_leaderboard(size: int) -> dict:
+        """计算推荐榜单（可直接返回给前端的商品卡片列表）"""
+        return {
+            'items': ItemService._query_featured_cards(size),
+            'generated_at': datetime.now().isoformat()
+        }
 
-        return {'success': True, 'data': item_list}
+    @staticmethod
+    def _featured_cache_tags(leaderboard: dict) -> list:
+        """推荐榜单的缓存标签：featured 加上榜单中每个商品及其卖家（与列表接口的响应缓存一致）"""
+        return ['featured'] + ItemService.listing_cache_tags(leaderboard['items'])
+
+    @staticmethod
+    def _query_featured_cards(limit: int) -> list:
+        """查询推荐商品（按浏览量倒序排序，取前limit条）并组装商品卡片"""
+        items = Item.query.filter_by(is_active=True).order_by(
+            Item.views.desc(), Item.id.desc()
+        ).limit(limit).all()
+
+        # 组装商品数据（批量查询卖家信息与评分）
+        return ItemService._build_item_cards(items)
 
     # -------------------------- 2. 搜索商品 --------------------------
     @staticmethod
     def search_items(query: str, search_type: str, page: int = 1, limit: int = 12,
                      category: str = None, min_price: float = None, max_price: float = None,
-                     sort: str = 'latest'):
+                     sort: str = 'latest', cursor: str = None, count_mode: str = 'exact'):
         """
         搜索商品
         :param query: 搜索关键词
-        :param search_type: 搜索类型（title/seller/category）
+        :param search_type: 搜索类型（title/seller/category），title 同时检索标题和描述
         :param page: 当前页码
         :param limit: 每页数量
         :param category: 分类过滤
         :param min_price: 最小价格
         :param max_price: 最大价格
-        :param sort: 排序方式（latest/popular/price-asc/price-desc）
+        :param sort: 排序方式（latest/popular/price-asc/price-desc/relevance）
+        :param cursor: 游标分页（传入即启用，首页传空字符串）；为None时使用页码分页
+        :param count_mode: 总数统计方式（exact 精确计数并短期缓存 / estimate 估算）
         :return: 业务处理结果
         """
         # 基础查询条件
         query_filter = [Item.is_active == True]
 
         # 搜索关键词过滤
-        if query.strip():
+        keyword = query.strip()
+        index_scores = None
+        if keyword:
             if search_type == 'title':
-                query_filter.append(Item.title.like(f'%{query.strip()}%'))
+                # 优先使用内存倒排索引解析候选ID；未启用时 MySQL 走全文索引，其他数据库回退为 LIKE
+                index_scores = ItemService._search_index(keyword)
+                if index_scores is not None:
+                    query_filter.append(Item.id.in_(list(index_scores.keys())))
+                else:
+                    query_filter.append(ItemSearchEngine.keyword_condition(keyword))
             elif search_type == 'seller':
                 # 关联用户表，按卖家名称搜索
                 seller_subquery = User.query.filter(User.username.like(f'%{query.strip()}%')).with_entities(User.id)
@@ -83,6 +135,10 @@ class ItemService:
         if max_price is not None and max_price > 0:
             query_filter.append(Item.price <= max_price)
 
+        # 游标分页：按 (排序键, id) 索引范围定位，不执行 OFFSET 和 count 查询
+        if cursor is not None:
+            return ItemService._search_page_by_cursor(query_filter, sort, limit, cursor)
+
         # 排序方式
         sort_map = {
             'latest': Item.created_at.desc(),
@@ -90,42 +146,43 @@ class ItemService:
             'price-asc': Item.price.asc(),
             'price-desc': Item.price.desc()
         }
-        order_by = sort_map.get(sort, Item.created_at.desc())
+        order_by = [sort_map.get(sort, Item.created_at.desc())]
+        # 相关度排序仅对标题关键词搜索有意义，其余情况按最新排序
+        if sort == 'relevance' and keyword and search_type == 'title':
+            order_by = ItemSearchEngine.relevance_order(keyword)
 
         # 分页查询
         offset = (page - 1) * limit
-        items_query = Item.query.filter(and_(*query_filter)).order_by(order_by)
-        total_items = items_query.count()
-        items = items_query.offset(offset).limit(limit).all()
+        total_is_estimate = False
+        if sort == 'relevance' and index_scores is not None:
+            # 倒排索引相关度排序：只查询候选ID，按得分排序后仅加载当前页商品
+            matched_ids = [row[0] for row in db.session.query(Item.id).filter(and_(*query_filter)).all()]
+            matched_ids.sort(key=lambda item_id: (-index_scores[item_id], -item_id))
+            total_items = len(matched_ids)
+            page_ids = matched_ids[offset:offset + limit]
+            items_by_id = {item.id: item for item in Item.query.filter(Item.id.in_(page_ids)).all()}
+            items = [items_by_id[item_id] for item_id in page_ids if item_id in items_by_id]
+        else:
+            items_query = Item.query.filter(and_(*query_filter)).order_by(*order_by)
+            items = items_query.offset(offset).limit(limit).all()
+            # 总数统计：按规范化过滤条件缓存，estimate 模式使用执行计划估算
+            filter_key = ItemCountStrategy.make_key(keyword, search_type, category, min_price, max_price)
+            total_items, total_is_estimate = ItemCountStrategy.count(items_query, filter_key, count_mode)
+            # 估算值/缓存值不能少于已实际取到的记录数
+            total_items = max(total_items, offset + len(items))
 
         # 计算总页数
         total_pages = (total_items + limit - 1) // limit if limit > 0 else 0
 
-        # 组装商品列表
-        item_list = []
-        for item in items:
-            seller = User.query.get(item.seller_id)
-            item_data = {
-                'id': item.id,
-                'title': item.title,
-                'description': item.description,
-                'price': float(item.price) if item.price else 0.0,
-                'stock': item.stock,
-                'image': item.image_url or '',
-                'category': item.category,
-                'seller_id': item.seller_id,
-                'seller_name': seller.username if seller else '未知卖家',
-                'seller_rating': UserService._get_user_rating(item.seller_id) if seller else 0.0,
-                'views': item.views,
-                'created_at': item.created_at.isoformat() if item.created_at else None
-            }
-            item_list.append(item_data)
+        # 组装商品列表（批量查询卖家信息与评分）
+        item_list = ItemService._build_item_cards(items)
 
         # 组装分页信息
         pagination = {
             'current_page': page,
             'total_pages': total_pages,
             'total_items': total_items,
+            'total_is_estimate': total_is_estimate,
             'page_size': limit
         }
 
@@ -165,6 +222,33 @@ class ItemService:
         :param item_id: 商品ID
         :return: 业务处理结果
         """
+        result = data_cache.get_or_set(
+            f'item_detail:{item_id}',
+            lambda: ItemService._load_item_detail(item_id),
+            ttl=current_app.config.get('ITEM_DETAIL_CACHE_TTL', 300),
+            cacheable=lambda r: r['success'],
+            tags=lambda r: [f"item:{item_id}", f"seller:{r['data']['seller_id']}", f"item_views:{item_id}"]
+        )
+        if not result['success']:
+            return result
+
+        # 浏览量 = 已写回数据库的值 + 本进程缓冲中尚未写回的次数
+        # （浏览量写回后 item_views 标签失效，详情缓存随之刷新）
+        item_detail = dict(result['data'])
+        item_detail['views'] = item_detail['views'] + view_counter.pending(item_id)
+
+        # 增加商品浏览量（写入缓冲区，由后台任务批量写回，避免读请求产生行锁写入）
+        view_counter.record(item_id)
+
+        return {'success': True, 'data': item_detail}
+
+    @staticmethod
+    def _load_item_detail(item_id: int):
+        """
+        从数据库组装商品详情（get_item_detail 缓存未命中时调用）
+        :param item_id: 商品ID
+        :return: 业务处理结果，浏览量为已写回数据库的值
+        """
         item = Item.query.get(item_id)
         if not item or not item.is_active:
             return {'success': False, 'message': '商品不存在或已下架'}
@@ -188,16 +272,12 @@ class ItemService:
             'seller_email': seller.email,
             'seller_rating': UserService._get_user_rating(seller.id),
             'seller_verified': seller.is_active,  # 假设is_active代表是否验证
-            'views': item.views,
+            'views': item.views or 0,
             'favorites': item.favorites,
             'created_at': item.created_at.isoformat() if item.created_at else None,
             'images': [item.image_url or '']  # 若有多张图片，可扩展为关联表查询
         }
 
-        # 增加商品浏览量
-        item.views += 1
-        db.session.commit()
-
         return {'success': True, 'data': item_detail}
 
     # -------------------------- 5. 发布新商品 --------------------------
@@ -246,6 +326,7 @@ class ItemService:
             )
             db.session.add(item)
             db.session.commit()
+            ItemService._after_item_write(item, 'search', 'featured', f'category:{item.category}')
 
             # 返回商品详情
             return {'success': True, 'data': ItemService.get_item_detail(item.id)['data']}
@@ -281,6 +362,8 @@ class ItemService:
             item.price = item_data['price']
         if 'stock' in item_data and item_data['stock'] >= 0:
             item.stock = item_data['stock']
+        # 分类变更时原分类与新分类的列表都需要失效
+        old_category = item.category
         if 'category' in item_data and item_data['category'].strip():
             item.category = item_data['category'].strip()
         if 'images' in item_data and item_data['images']:
@@ -290,6 +373,8 @@ class ItemService:
 
         try:
             db.session.commit()
+            ItemService._after_item_write(item, 'search', 'featured',
+                                          f'category:{old_category}', f'category:{item.category}')
             # 返回更新后的商品详情
             return {'success': True, 'data': ItemService.get_item_detail(item.id)['data']}
         except Exception as e:
@@ -319,6 +404,7 @@ class ItemService:
 
         try:
             db.session.commit()
+            ItemService._after_item_write(item, 'search', 'featured', f'category:{item.category}')
             return {'success': True, 'message': '删除成功'}
         except Exception as e:
             db.session.rollback()
@@ -326,13 +412,31 @@ class ItemService:
 
     # -------------------------- 8. 检查商品库存 --------------------------
     @staticmethod
-    def check_stock(item_list: list):
+    def check_stock(item_list: list, buyer_id: int = None, reserve: bool = False):
         """
         检查商品库存
+        所有商品一次 IN 查询取回后在内存中校验；reserve 为真且全部可用时为买家预留库存，
+        预留期间（STOCK_RESERVATION_TTL 秒）库存答复保持有效，下单时消费预留
         :param item_list: 商品列表 [{'itemId': 1, 'quantity': 2}, ...]
+        :param buyer_id: 买家ID（预留时必填；买家已有的预留计入可用库存）
+        :param reserve: 是否预留库存
         :return: 业务处理结果
         """
+        if reserve and not buyer_id:
+            return {'success': False, 'message': '预留库存需要登录'}
+
+        item_ids = {info.get('itemId') for info in item_list
+                    if isinstance(info.get('itemId'), int) and info.get('itemId') > 0}
+        stocks = {}
+        held = {}
+        if item_ids:
+            rows = db.session.query(Item.id, Item.stock, Item.is_active).filter(Item.id.in_(item_ids))
+            stocks = {item_id: (stock, is_active) for item_id, stock, is_active in rows}
+            if buyer_id:
+                held = ReservationService.held_quantities(buyer_id, item_ids)
+
         stock_check_result = []
+        requested = {}
         is_valid = True
 
         for item_info in item_list:
@@ -340,50 +444,183 @@ class ItemService:
             quantity = item_info.get('quantity', 1)
 
             # 验证参数
-            if not isinstance(item_id, int) or item_id <= 0:
-                stock_check_result.append({
-                    'itemId': item_id,
-                    'available': False,
-                    'stock': 0
-                })
+            if item_id not in item_ids:
+                stock_check_result.append({'itemId': item_id, 'available': False, 'stock': 0})
+                is_valid = False
+                continue
+
+            stock, is_active = stocks.get(item_id, (0, False))
+            stock += held.get(item_id, 0)
+            if not is_active:
+                stock_check_result.append({'itemId': item_id, 'available': False, 'stock': 0})
                 is_valid = False
                 continue
 
             if not isinstance(quantity, int) or quantity <= 0:
-                stock_check_result.append({
-                    'itemId': item_id,
-                    'available': False,
-                    'stock': 0 if not Item.query.get(item_id) else Item.query.get(item_id).stock
-                })
+                stock_check_result.append({'itemId': item_id, 'available': False, 'stock': stock})
                 is_valid = False
                 continue
 
-            # 查询商品
-            item = Item.query.get(item_id)
-            if not item or not item.is_active:
-                stock_check_result.append({
-                    'itemId': item_id,
-                    'available': False,
-                    'stock': 0
-                })
+            requested[item_id] = requested.get(item_id, 0) + quantity
+            available = stock >= requested[item_id]
+            if not available:
                 is_valid = False
+            stock_check_result.append({'itemId': item_id, 'available': available, 'stock': stock})
+
+        data = {'valid': is_valid, 'items': stock_check_result}
+        if reserve and is_valid and requested:
+            try:
+                expires_at = ReservationService.reserve(buyer_id, requested)
+            except InsufficientStockError as e:
+                # 检查与预留之间库存被其他买家抢占
+                data['valid'] = False
+                for result in stock_check_result:
+                    if result['itemId'] == e.item_id:
+                        result['available'] = False
+            except DBAPIError as e:
+                # 锁冲突重试耗尽或其他数据库错误（事务已由 run_in_transaction 回滚）
+                db.session.rollback()
+                logger.error(f"库存预留失败: 买家ID={buyer_id}, 商品={requested}, {str(e)}")
+                return {'success': False, 'message': '库存预留失败，请稍后重试'}
             else:
-                available = item.stock >= quantity
-                if not available:
-                    is_valid = False
-                stock_check_result.append({
-                    'itemId': item_id,
-                    'available': available,
-                    'stock': item.stock
-                })
+                data['reservation'] = {
+                    'items': [{'itemId': item_id, 'quantity': quantity}
+                              for item_id, quantity in requested.items()],
+                    'expiresAt': expires_at.isoformat()
+                }
+
+        return {'success': True, 'data': data}
+
+    # -------------------------- 内部辅助方法 --------------------------
+    # 游标分页支持的排序方式：排序名 -> (排序列, 是否倒序, 游标键类型)
+    CURSOR_SORTS = {
+        'latest': (Item.created_at, True, 'datetime'),
+        'popular': (Item.views, True, 'int'),
+        'price-asc': (Item.price, False, 'decimal'),
+        'price-desc': (Item.price, True, 'decimal')
+    }
+
+    @staticmethod
+    def _search_page_by_cursor(query_filter: list, sort: str, limit: int, cursor: str):
+        """
+        游标分页查询商品（相关度排序不支持游标，按最新排序处理）
+        :param query_filter: 已组装的过滤条件
+        :param sort: 排序方式
+        :param limit: 每页数量
+        :param cursor: 上一页返回的 next_cursor，空字符串表示第一页
+        :return: 业务处理结果
+        """
+        if sort not in ItemService.CURSOR_SORTS:
+            sort = 'latest'
+        key_column, descending, key_type = ItemService.CURSOR_SORTS[sort]
+
+        conditions = list(query_filter)
+        if cursor:
+            try:
+                key_value, last_id = decode_cursor(cursor, sort, key_type)
+            except CursorError as e:
+                return {'success': False, 'message': str(e)}
+            conditions.append(keyset_condition(key_column, Item.id, key_value, last_id, descending))
+
+        # 多取一条用于判断是否还有下一页
+        items = Item.query.filter(and_(*conditions)).order_by(
+            *keyset_order(key_column, Item.id, descending)
+        ).limit(limit + 1).all()
+        has_more = len(items) > limit
+        items = items[:limit]
+
+        next_cursor = None
+        if has_more:
+            last_item = items[-1]
+            next_cursor = encode_cursor(sort, getattr(last_item, key_column.key), last_item.id)
 
         return {
             'success': True,
             'data': {
-                'valid': is_valid,
-                'items': stock_check_result
+                'items': ItemService._build_item_cards(items),
+                'pagination': {
+                    'page_size': limit,
+                    'next_cursor': next_cursor,
+                    'has_more': has_more
+                }
             }
         }
 
+    @staticmethod
+    def _after_item_write(item, *cache_tags):
+        """
+        商品写入（发布/更新/删除）提交后的同步处理
+        :param item: 已提交的商品对象
+        :param cache_tags: 除 item:<ID> 外还需失效的缓存标签
+            （发布、下架影响搜索/推荐/所属分类列表的总数与分页边界，
+            更新影响搜索结果、推荐榜单与原分类、新分类列表）
+        """
+        invalidate_cache_tags(f'item:{item.id}', *cache_tags)
+        ItemCountStrategy.invalidate()
+        UserService.invalidate_user_stats(item.seller_id)
+        if current_app.config.get('ITEM_SEARCH_INDEX'):
+            item_index.upsert(item)
+
+    @staticmethod
+    def _search_index(keyword: str):
+        """
+        使用内存倒排索引检索关键词
+        :param keyword: 已去除首尾空格的关键词
+        :return: {商品ID: 相关度得分}；索引未启用时返回 None
+        """
+        if not current_app.config.get('ITEM_SEARCH_INDEX'):
+            return None
+        item_index.sync(min_interval=current_app.config.get('ITEM_SEARCH_INDEX_SYNC_INTERVAL', 5))
+        return item_index.search(keyword)
+
+    @staticmethod
+    def listing_cache_tags(item_cards: list) -> list:
+        """
+        商品列表响应的缓存标签：列表中每个商品及其卖家
+        :param item_cards: _build_item_cards 生成的商品卡片列表
+        """
+        tags = set()
+        for card in item_cards:
+            tags.add(f"item:{card['id']}")
+            tags.add(f"seller:{card['seller_id']}")
+        return sorted(tags)
+
+    @staticmethod
+    def _build_item_cards(items: list) -> list:
+        """
+        批量组装商品卡片数据（首页推荐/搜索/分类列表共用）
+        卖家信息通过一次IN查询获取，卖家评分通过一次主键IN查询（评分汇总表）获取，
+        查询次数与当前页商品数量无关
+        :param items: 商品对象列表
+        :return: 商品卡片字典列表
+        """
+        seller_ids = list({item.seller_id for item in items})
+        seller_names = {}
+        seller_ratings = {}
+        if seller_ids:
+            seller_names = dict(
+                db.session.query(User.id, User.username).filter(User.id.in_(seller_ids)).all()
+            )
+            seller_ratings = UserService._get_user_ratings(list(seller_names.keys()))
+
+        item_list = []
+        for item in items:
+            has_seller = item.seller_id in seller_names
+            item_list.append({
+                'id': item.id,
+                'title': item.title,
+                'description': item.description,
+                'price': float(item.price) if item.price else 0.0,
+                'stock': item.stock,
+                'image': item.image_url or '',
+                'category': item.category,
+                'seller_id': item.seller_id,
+                'seller_name': seller_names[item.seller_id] if has_seller else '未知卖家',
+                'seller_rating': seller_ratings.get(item.seller_id, 5.0) if has_seller else 0.0,
+                'views': item.views,
+                'created_at': item.created_at.isoformat() if item.created_at else None
+            })
+        return item_list
+
 # 导入用户服务的内部方法（解决循环导入问题）
 from app.services.user_service import UserService
\ No newline at end of file
@@ -5,23 +5,35 @@
 
 这是整个后端最复杂的模块，需要特别关注：
 - 数据库事务处理 (BEGIN/COMMIT/ROLLBACK)
-- 行级锁 (SELECT FOR UPDATE) 防止库存冲突
+- 条件 UPDATE 原子扣减库存，防止超卖（见 StockService）
+- 按ID升序加锁，死锁/锁等待超时时整体重试事务（见 run_in_transaction）
 - 原子性操作保证
 """
 
 from app.models import db, Order, OrderItem, Item, Address, User
 from app.utils.response import error_response, success_response
-from sqlalchemy import select, update
+from app.services.user_service import UserService
+from app.services.stock_service import StockService, InsufficientStockError
+from app.services.reservation_service import ReservationService
+from app.utils.cache import invalidate_cache_tags
+from app.utils.metrics import metrics
+from app.utils.order_number import generate_order_number, is_duplicate_order_number
+from app.utils.transaction import run_in_transaction, classify_lock_error
+from app.utils.pagination import CursorError, encode_cursor, decode_cursor, keyset_condition, keyset_order
+from flask import current_app
+from sqlalchemy import select, update, insert, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload, selectinload
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, timedelta
 import traceback
 import logging
-import time
-import random
 
 logger = logging.getLogger(__name__)
 
+# 订单号唯一约束冲突时的最大重试次数
+ORDER_NUMBER_MAX_RETRIES = 3
+
 
 class OrderService:
     """订单服务类"""
@@ -33,11 +45,11 @@ class OrderService:
         完整事务流程：
         1. 开启事务
         2. 检查地址是否存在
-        3. 对每个商品：锁定库存行 + 检查库存
-        4. 计算总金额
-        5. 扣减库存
-        6. 创建订单记录
-        7. 创建订单明细
+        3. 读取商品并校验（不加锁）
+        4. 按卖家分组计算总金额
+        5. 一条条件 UPDATE 原子扣减全部库存（先于订单写入，按主键顺序加锁，避免外键共享锁引起死锁）
+        6. 每个卖家创建一个订单记录
+        7. 一条 INSERT 批量写入所有订单明细
         8. 提交或回滚
         
         Args:
@@ -50,6 +62,26 @@ class OrderService:
             
         Returns:
             (success, result_or_error_message)
+            result 为单个订单信息 {order_id, total_amount, status, ...}；
+            商品来自多个卖家时返回错误，需通过 checkout（POST /orders/checkout）拆分为多个订单
+        """
+        success, result = OrderService.checkout(buyer_id, items_data, address_id, single_seller=True)
+        if success:
+            return True, result['orders'][0]
+        return success, result
+    
+    @staticmethod
+    def checkout(buyer_id, items_data, address_id, single_seller=False):
+        """
+        结算：按卖家拆分订单，所有订单在同一个事务中创建
+        语句数与卖家数、商品数无关（订单记录除外）：一次读取商品、一次批量写入明细、一次扣减库存
+        
+        Args:
+            single_seller: 为 True 时只允许同一卖家的商品（create_order 使用，保证只生成一个订单）
+        
+        Returns:
+            (success, {'orders': [订单信息, ...], 'total_amount': 总金额, 'items_count': 商品种数})
+            或 (False, 错误信息)
         """
         # 验证输入数据
         if not items_data:
@@ -63,158 +95,21 @@ class OrderService:
         if len(item_ids) != len(set(item_ids)):
             return False, "购物车中存在重复商品"
         
-        # 开启事务
         try:
-            # 使用SQLAlchemy的会话进行事务管理
-            session = db.session
-            
-            # ==================== 步骤1: 检查地址是否存在 ====================
-            address = session.get(Address, address_id)
-            if not address:
-                return False, "配送地址不存在"
-            
-            if address.user_id != buyer_id:
-                return False, "无权使用该配送地址"
-            
-            # ==================== 步骤2: 获取所有商品并锁定库存 ====================
-            # 为了性能，先查询所有商品
-            stmt = select(Item).where(Item.id.in_(item_ids)).with_for_update()
-            items_result = session.execute(stmt)
-            all_items = {item.id: item for item in items_result.scalars().all()}
-            
-            # 检查商品是否存在且可用
-            missing_items = []
-            inactive_items = []
-            for item_data in items_data:
-                item_id = item_data['item_id']
-                quantity = item_data['quantity']
-                
-                if item_id not in all_items:
-                    missing_items.append(item_id)
-                    continue
-                    
-                item = all_items[item_id]
-                
-                # 检查商品是否在售
-                if not item.is_active:
-                    inactive_items.append(item_id)
-                    continue
-                
-                # 检查库存是否充足（此时item已被锁定）
-                if item.stock < quantity:
-                    return False, f"商品 {item.title} 库存不足，剩余 {item.stock} 件"
-                
-                # 检查是否购买自己的商品
-                if item.seller_id == buyer_id:
-                    return False, f"不能购买自己的商品: {item.title}"
-                
-                # 验证数量
-                if quantity <= 0:
-                    return False, f"商品 {item.title} 购买数量必须大于0"
-                if quantity > 100:  # 防止异常大量购买
-                    return False, f"商品 {item.title} 购买数量超出限制"
-            
-            if missing_items:
-                return False, f"商品不存在: {missing_items}"
-            if inactive_items:
-                return False, f"商品已下架: {inactive_items}"
-            
-            # ==================== 步骤3: 计算总金额 ====================
-            total_amount = Decimal('0.00')
-            order_items_data = []
-            
-            for item_data in items_data:
-                item_id = item_data['item_id']
-                quantity = item_data['quantity']
-                item = all_items[item_id]
-                
-                # 计算金额（数量 * 单价）
-                item_total = Decimal(str(item.price)) * Decimal(str(quantity))
-                total_amount += item_total
-                
-                # 准备订单明细数据
-                order_items_data.append({
-                    'item': item,
-                    'quantity': quantity,
-                    'unit_price': item.price,
-                    'item_total': item_total
-                })
-            
-            # 检查总金额是否合理
-            if total_amount <= Decimal('0.00'):
-                return False, "订单总金额必须大于0"
-            
-            # ==================== 步骤4: 创建订单记录 ====================
-            shipping_address = f"{address.recipient_name} {address.phone} {address.detail}"
-            if address.city:
-                shipping_address = f"{address.city}{address.district or ''}{address.detail}"
-
-            # 生成订单号：ORD + 时间戳 + 随机数
-            timestamp = int(time.time())
-            random_num = random.randint(1000, 9999)
-            order_number = f"ORD{timestamp}{random_num}"
-
-            # 获取卖家ID（从第一个商品）
-            first_item = all_items[items_data[0]['item_id']]
-            seller_id = first_item.seller_id
-            
-            order = Order(
-                order_number=order_number,  # 添加订单号
-                buyer_id=buyer_id,
-                total_amount=total_amount,
-                seller_id=seller_id,  # 从第一个商品获取卖家ID
-                address_id=address_id,  # 添加地址ID
-                status='pending',
-                shipping_address=shipping_address,
-                total_price=total_amount,  # 设置total_price（与total_amount相同）
-                remarks='',  # 空备注
-                created_at=datetime.now(),
-                updated_at=datetime.now()
-            )
-            session.add(order)
-            
-            # 立即flush，获取order.id（但不提交事务）
-            session.flush()
-            
-            # ==================== 步骤5: 创建订单明细并扣减库存 ====================
-            for item_data in order_items_data:
-                item = item_data['item']
-                quantity = item_data['quantity']
-                
-                # 创建订单明细
-                order_item = OrderItem(
-                    order_id=order.id,
-                    item_id=item.id,
-                    quantity=quantity,
-                    unit_price=item.price,
-                    created_at=datetime.now()
-                )
-                session.add(order_item)
-                
-                # 扣减库存
-                item.stock -= quantity
-                item.updated_at = datetime.now()
-                
-                # 记录库存变化日志
-                logger.info(f"订单 {order.id}: 商品 {item.id} 扣减库存 {quantity}, 剩余 {item.stock}")
-            
-            # ==================== 步骤6: 提交事务 ====================
-            session.commit()
-            
-            logger.info(f"订单创建成功: 订单ID={order.id}, 买家ID={buyer_id}, 总金额={total_amount}")
-            
-            # 返回订单信息
-            order_info = {
-                'order_id': order.id,
-                'total_amount': float(total_amount),
-                'status': order.status,
-                'shipping_address': order.shipping_address,
-                'created_at': order.created_at.isoformat(),
-                'items_count': len(order_items_data)
-            }
-            
-            return True, order_info
-            
+            # 锁冲突（死锁/锁等待超时）时整体重试事务；
+            # 订单号与其他进程生成的重复（工作进程ID冲突）时重新生成订单号再执行一次
+            for attempt in range(ORDER_NUMBER_MAX_RETRIES + 1):
+                try:
+                    return run_in_transaction(
+                        lambda: OrderService._checkout_tx(buyer_id, items_data, item_ids, address_id, single_seller),
+                        name='create_order'
+                    )
+                except IntegrityError as e:
+                    if not is_duplicate_order_number(e) or attempt >= ORDER_NUMBER_MAX_RETRIES:
+                        raise
+                    db.session.rollback()
+                    metrics.incr('order.number_collisions')
+                    logger.warning(f"订单号重复（工作进程ID可能与其他进程相同），第 {attempt + 1} 次重试: {e.orig}")
         except Exception as e:
             # 发生异常时回滚事务
             db.session.rollback()
@@ -222,7 +117,9 @@ class OrderService:
             
             # 返回具体的错误信息
             error_msg = str(e)
-            if "stock" in error_msg.lower() or "库存" in error_msg:
+            if classify_lock_error(e):
+                return False, "下单人数较多，请稍后重试"
+            elif "stock" in error_msg.lower() or "库存" in error_msg:
                 return False, "库存不足，请刷新页面后重试"
             elif "foreign key" in error_msg.lower():
                 return False, "数据验证失败，请检查商品或地址信息"
@@ -230,75 +127,288 @@ class OrderService:
                 return False, f"创建订单失败: {error_msg}"
     
     @staticmethod
-    def get_orders(buyer_id, page=1, limit=10):
-        """获取用户订单列表"""
+    def _checkout_tx(buyer_id, items_data, item_ids, address_id, single_seller=False):
+        """
+        结算的事务体（由 run_in_transaction 执行，锁冲突时整体重试）
+        商品库存在写入订单前用一条 UPDATE 扣减，按主键顺序加锁，保证并发订单加锁顺序一致
+        """
+        # 使用SQLAlchemy的会话进行事务管理
+        session = db.session
+        
+        # ==================== 步骤1: 检查地址是否存在 ====================
+        address = session.get(Address, address_id)
+        if not address:
+            return False, "配送地址不存在"
+        
+        if address.user_id != buyer_id:
+            return False, "无权使用该配送地址"
+        
+        # ==================== 步骤2: 获取所有商品并校验 ====================
+        # 不加行锁，库存以步骤4的条件 UPDATE 为准
+        stmt = select(Item).where(Item.id.in_(item_ids))
+        items_result = session.execute(stmt)
+        all_items = {item.id: item for item in items_result.scalars().all()}
+        # 买家在结算页预留的数量已从库存中扣除，可直接用于本订单
+        held = ReservationService.held_quantities(buyer_id, item_ids, session)
+        
+        # 检查商品是否存在且可用
+        missing_items = []
+        inactive_items = []
+        for item_data in items_data:
+            item_id = item_data['item_id']
+            quantity = item_data['quantity']
+        
+            if item_id not in all_items:
+                missing_items.append(item_id)
+                continue
+        
+            item = all_items[item_id]
+        
+            # 检查商品是否在售
+            if not item.is_active:
+                inactive_items.append(item_id)
+                continue
+        
+            # 预检查库存（快速失败，最终以原子扣减结果为准）
+            if item.stock + held.get(item_id, 0) < quantity:
+                return False, f"商品 {item.title} 库存不足，剩余 {item.stock} 件"
+        
+            # 检查是否购买自己的商品
+            if item.seller_id == buyer_id:
+                return False, f"不能购买自己的商品: {item.title}"
+        
+            # 验证数量
+            if quantity <= 0:
+                return False, f"商品 {item.title} 购买数量必须大于0"
+            if quantity > 100:  # 防止异常大量购买
+                return False, f"商品 {item.title} 购买数量超出限制"
+        
+        if missing_items:
+            return False, f"商品不存在: {missing_items}"
+        if inactive_items:
+            return False, f"商品已下架: {inactive_items}"
+        
+        # ==================== 步骤3: 按卖家分组计算总金额 ====================
+        # 卖家按在购物车中首次出现的顺序排列
+        seller_lines = {}
+        for item_data in items_data:
+            item = all_items[item_data['item_id']]
+            seller_lines.setdefault(item.seller_id, []).append((item, item_data['quantity']))
+        if single_seller and len(seller_lines) > 1:
+            return False, "商品来自多个卖家，请通过购物车结算（每个卖家生成一个订单）"
+        
+        seller_totals = {}
+        for seller_id, lines in seller_lines.items():
+            # 计算金额（数量 * 单价）
+            seller_totals[seller_id] = sum(
+                (Decimal(str(item.price)) * Decimal(str(quantity)) for item, quantity in lines),
+                Decimal('0.00')
+            )
+            # 检查总金额是否合理
+            if seller_totals[seller_id] <= Decimal('0.00'):
+                return False, "订单总金额必须大于0"
+        
+        # ==================== 步骤4: 扣减库存 ====================
+        # 先扣库存再写订单：条件 UPDATE 按主键顺序对商品行加排他锁，之后写入订单明细时
+        # 外键检查需要的共享锁已被本事务持有，不会再与并发结算互相等待
+        # （反过来先写明细，会各自持有共享锁再等待排他锁，热点商品的并发结算必然死锁）
+        quantities = {item_data['item_id']: item_data['quantity'] for item_data in items_data}
+        # 先消费买家的预留：预留部分不再扣减，只扣超出部分，多余的预留归还库存
+        consumed = ReservationService.consume(buyer_id, item_ids, session)
+        changes = {item_id: quantity - consumed.get(item_id, 0) for item_id, quantity in quantities.items()}
+        try:
+            StockService.adjust(changes, session)
+        except InsufficientStockError as e:
+            item = session.get(Item, e.item_id)
+            if item is None or not item.is_active:
+                return False, f"商品已下架: [{e.item_id}]"
+            return False, f"商品 {item.title} 库存不足，剩余 {item.stock} 件"
+        
+        # ==================== 步骤5: 每个卖家创建一个订单记录 ====================
+        shipping_address = f"{address.recipient_name} {address.phone} {address.detail}"
+        if address.city:
+            shipping_address = f"{address.city}{address.district or ''}{address.detail}"
+        
+        # 同一次结算的所有记录共用一个时间戳
+        now = datetime.now()
+        orders = [{
+            # 订单号：ORD + Snowflake 数字ID（进程内生成，全局唯一且按时间递增）
+            'order_number': generate_order_number(),
+            'buyer_id': buyer_id,
+            'total_amount': seller_totals[seller_id],
+            'seller_id': seller_id,
+            'address_id': address_id,
+            'status': 'pending',
+            'shipping_address': shipping_address,
+            'total_price': seller_totals[seller_id],  # 设置total_price（与total_amount相同）
+            'remarks': '',  # 空备注
+            'created_at': now,
+            'updated_at': now
+        } for seller_id in seller_lines]
+        OrderService._insert_orders(session, orders)
+        
+        # ==================== 步骤6: 批量写入订单明细 ====================
+        order_item_rows = [{
+            'order_id': order['id'],
+            'item_id': item.id,
+            'quantity': quantity,
+            'unit_price': item.price,
+            'created_at': now
+        } for order in orders for item, quantity in seller_lines[order['seller_id']]]
+        session.execute(insert(OrderItem), order_item_rows)
+        
+        order_ids = [order['id'] for order in orders]
+        logger.info(f"订单 {order_ids}: 扣减库存 {changes}（消费预留 {consumed}）")
+        
+        # ==================== 步骤7: 提交事务 ====================
+        session.commit()
+        
+        # 库存已变化，失效包含这些商品的缓存
+        invalidate_cache_tags(*[f'item:{item_id}' for item_id in quantities])
+        
+        total_amount = sum(seller_totals.values(), Decimal('0.00'))
+        logger.info(f"订单创建成功: 订单ID={order_ids}, 买家ID={buyer_id}, 总金额={total_amount}")
+        
+        # 返回订单信息
+        order_infos = [{
+            'order_id': order['id'],
+            'seller_id': order['seller_id'],
+            'total_amount': float(order['total_amount']),
+            'status': order['status'],
+            'shipping_address': order['shipping_address'],
+            'created_at': now.isoformat(),
+            'items_count': len(seller_lines[order['seller_id']])
+        } for order in orders]
+        
+        return True, {
+            'orders': order_infos,
+            'total_amount': float(total_amount),
+            'items_count': len(items_data)
+        }
+    
+    @staticmethod
+    def _insert_orders(session, orders):
+        """
+        批量写入订单记录，并把数据库生成的ID写回每个订单字典的 'id'
+        单个订单直接取自增ID（一条语句）；多个订单 executemany 写入后按订单号一次查回ID（两条语句）
+        """
+        if len(orders) == 1:
+            result = session.execute(insert(Order).values(**orders[0]))
+            orders[0]['id'] = result.inserted_primary_key[0]
+            return
+        
+        session.execute(insert(Order), orders)
+        order_ids = dict(session.execute(
+            select(Order.order_number, Order.id)
+            .where(Order.order_number.in_([order['order_number'] for order in orders]))
+        ).all())
+        for order in orders:
+            order['id'] = order_ids[order['order_number']]
+    
+    @staticmethod
+    def get_orders(buyer_id, page=1, limit=10, cursor=None):
+        """
+        获取用户订单列表
+        cursor 不为 None 时使用游标分页（首页传空字符串）：按 (created_at, id) 倒序范围定位，
+        不执行 OFFSET 和 count 查询
+        """
         try:
             session = db.session
             
-            # 计算偏移量
-            offset = (page - 1) * limit
-            
-            # 查询订单总数
-            total = session.query(Order).filter(
-                Order.buyer_id == buyer_id
-            ).count()
-            
-            # 查询订单列表（按创建时间倒序）
-            orders = session.query(Order).filter(
-                Order.buyer_id == buyer_id
-            ).order_by(
-                Order.created_at.desc()
-            ).offset(offset).limit(limit).all()
-            
-            # 转换为字典格式
-            orders_list = []
-            for order in orders:
-                # 查询订单对应的商品信息
-                order_items = session.query(OrderItem).filter(
-                    OrderItem.order_id == order.id
-                ).options(
-                    joinedload(OrderItem.item)
-                ).all()
-                
-                # 获取商品缩略信息
-                items_info = []
-                for oi in order_items:
-                    if oi.item:
-                        items_info.append({
-                            'item_id': oi.item_id,
-                            'title': oi.item.title,
-                            'quantity': oi.quantity,
-                            'price': float(oi.unit_price),
-                            'image_url': oi.item.image_url
-                        })
+            if cursor is not None:
+                # ==================== 游标分页 ====================
+                conditions = [Order.buyer_id == buyer_id]
+                if cursor:
+                    try:
+                        last_created_at, last_id = decode_cursor(cursor, 'latest', 'datetime')
+                    except CursorError as e:
+                        return False, str(e)
+                    conditions.append(keyset_condition(Order.created_at, Order.id, last_created_at, last_id, True))
                 
-                order_dict = {
-                    'id': order.id,
-                    'total_amount': float(order.total_amount),
-                    'status': order.status,
-                    'status_text': dict(Order.STATUS_CHOICES).get(order.status, '未知'),
-                    'shipping_address': order.shipping_address,
-                    'created_at': order.created_at.isoformat() if order.created_at else None,
-                    'updated_at': order.updated_at.isoformat() if order.updated_at else None,
-                    'items': items_info,
-                    'items_count': len(items_info)
+                # 多取一条用于判断是否还有下一页
+                orders = session.query(Order).options(
+                    OrderService._order_list_loader()
+                ).filter(*conditions).order_by(
+                    *keyset_order(Order.created_at, Order.id, True)
+                ).limit(limit + 1).all()
+                has_more = len(orders) > limit
+                orders = orders[:limit]
+                next_cursor = encode_cursor('latest', orders[-1].created_at, orders[-1].id) if has_more else None
+                pagination = {
+                    'page_size': limit,
+                    'next_cursor': next_cursor,
+                    'has_more': has_more
                 }
-                orders_list.append(order_dict)
-            
-            return True, {
-                'orders': orders_list,
-                'pagination': {
+            else:
+                # 计算偏移量
+                offset = (page - 1) * limit
+                
+                # 查询订单总数
+                total = session.query(Order).filter(
+                    Order.buyer_id == buyer_id
+                ).count()
+                
+                # 查询订单列表（按创建时间倒序）
+                orders = session.query(Order).options(
+                    OrderService._order_list_loader()
+                ).filter(
+                    Order.buyer_id == buyer_id
+                ).order_by(
+                    Order.created_at.desc()
+                ).offset(offset).limit(limit).all()
+                pagination = {
                     'page': page,
                     'limit': limit,
                     'total': total,
                     'total_pages': (total + limit - 1) // limit if limit > 0 else 0
                 }
+            
+            # 转换为字典格式（订单明细已随订单批量加载，不再逐单查询）
+            orders_list = [OrderService._serialize_order_summary(order) for order in orders]
+            
+            return True, {
+                'orders': orders_list,
+                'pagination': pagination
             }
             
         except Exception as e:
             logger.error(f"获取订单列表失败: {str(e)}")
             return False, f"获取订单列表失败: {str(e)}"
     
+    @staticmethod
+    def _order_list_loader():
+        """
+        订单列表的明细加载选项：
+        整页订单的明细及其商品用一条 IN 查询批量加载（selectinload + joinedload）
+        """
+        return selectinload(Order.order_items).joinedload(OrderItem.item)
+    
+    @staticmethod
+    def _serialize_order_summary(order):
+        """把已加载明细的订单转换为列表项字典"""
+        items_info = []
+        for oi in order.order_items:
+            if oi.item:
+                items_info.append({
+                    'item_id': oi.item_id,
+                    'title': oi.item.title,
+                    'quantity': oi.quantity,
+                    'price': float(oi.unit_price),
+                    'image_url': oi.item.image_url
+                })
+        
+        return {
+            'id': order.id,
+            'total_amount': float(order.total_amount),
+            'status': order.status,
+            'status_text': dict(Order.STATUS_CHOICES).get(order.status, '未知'),
+            'shipping_address': order.shipping_address,
+            'created_at': order.created_at.isoformat() if order.created_at else None,
+            'updated_at': order.updated_at.isoformat() if order.updated_at else None,
+            'items': items_info,
+            'items_count': len(items_info)
+        }
+    
     @staticmethod
     def get_order_detail(order_id, buyer_id):
         """获取订单详情（权限检查）"""
@@ -411,6 +521,15 @@ class OrderService:
             order.updated_at = datetime.now()
             session.commit()
             
+            # 订单完成会改变卖家的已售出统计
+            if status == 'completed':
+                seller_ids = [row[0] for row in session.query(Item.seller_id).join(
+                    OrderItem, OrderItem.item_id == Item.id
+                ).filter(
+                    OrderItem.order_id == order_id
+                ).distinct().all()]
+                UserService.invalidate_user_stats(*seller_ids)
+            
             logger.info(f"订单状态更新: 订单ID={order_id}, 新状态={status}")
             return True, "订单状态更新成功"
             
@@ -423,66 +542,141 @@ class OrderService:
     def cancel_order(order_id, buyer_id):
         """
         取消订单并恢复库存
-        使用事务保证库存恢复和状态更新的原子性
+        使用事务保证库存恢复和状态更新的原子性，锁冲突时整体重试
         """
         session = db.session
         
         try:
-            # ==================== 步骤1: 查询订单并锁定 ====================
-            stmt = select(Order).where(Order.id == order_id).with_for_update()
-            order_result = session.execute(stmt)
-            order = order_result.scalar_one_or_none()
-            
-            if not order:
-                return False, "订单不存在"
-            
-            # 权限检查
-            if order.buyer_id != buyer_id:
-                return False, "无权取消此订单"
-            
-            # 状态检查：只能取消待支付的订单
-            if order.status != 'pending':
-                return False, "只能取消待支付的订单"
-            
-            # ==================== 步骤2: 查询订单明细并锁定商品 ====================
-            order_items = session.query(OrderItem).filter(
-                OrderItem.order_id == order_id
-            ).options(
-                joinedload(OrderItem.item)
-            ).all()
-            
-            # 获取所有商品ID
-            item_ids = [oi.item_id for oi in order_items]
-            
-            # 锁定所有相关商品
-            if item_ids:
-                items_stmt = select(Item).where(Item.id.in_(item_ids)).with_for_update()
-                items_result = session.execute(items_stmt)
-                items_dict = {item.id: item for item in items_result.scalars().all()}
-            
-            # ==================== 步骤3: 恢复库存 ====================
-            for oi in order_items:
-                if oi.item_id in items_dict:
-                    item = items_dict[oi.item_id]
-                    item.stock += oi.quantity
-                    item.updated_at = datetime.now()
-                    logger.info(f"订单取消恢复库存: 商品 {item.id} 恢复 {oi.quantity}, 当前 {item.stock}")
-            
-            # ==================== 步骤4: 更新订单状态 ====================
-            order.status = 'cancelled'
-            order.updated_at = datetime.now()
-            
-            # ==================== 步骤5: 提交事务 ====================
-            session.commit()
-            
-            logger.info(f"订单取消成功: 订单ID={order_id}, 买家ID={buyer_id}")
-            return True, "订单取消成功，库存已恢复"
-            
+            return run_in_transaction(
+                lambda: OrderService._cancel_order_tx(order_id, buyer_id),
+                name='cancel_order'
+            )
         except Exception as e:
             session.rollback()
             logger.error(f"取消订单失败: {str(e)}\n{traceback.format_exc()}")
+            if classify_lock_error(e):
+                return False, "订单处理繁忙，请稍后重试"
             return False, f"取消订单失败: {str(e)}"
     
+    @staticmethod
+    def _cancel_order_tx(order_id, buyer_id):
+        """
+        取消订单的事务体（由 run_in_transaction 执行）
+        加锁顺序：先锁订单行，再按商品ID升序更新库存
+        """
+        session = db.session
+        
+        # ==================== 步骤1: 查询订单并锁定 ====================
+        stmt = select(Order).where(Order.id == order_id).with_for_update()
+        order_result = session.execute(stmt)
+        order = order_result.scalar_one_or_none()
+        
+        if not order:
+            return False, "订单不存在"
+        
+        # 权限检查
+        if order.buyer_id != buyer_id:
+            return False, "无权取消此订单"
+        
+        # 状态检查：只能取消待支付的订单
+        if order.status != 'pending':
+            return False, "只能取消待支付的订单"
+        
+        # ==================== 步骤2: 查询订单明细 ====================
+        order_items = session.query(OrderItem).filter(
+            OrderItem.order_id == order_id
+        ).all()
+        
+        quantities = {}
+        for oi in order_items:
+            quantities[oi.item_id] = quantities.get(oi.item_id, 0) + oi.quantity
+        
+        # ==================== 步骤3: 原子恢复库存 ====================
+        StockService.restore(quantities, session)
+        logger.info(f"订单取消恢复库存: 订单 {order_id}, {quantities}")
+        
+        # ==================== 步骤4: 更新订单状态 ====================
+        order.status = 'cancelled'
+        order.updated_at = datetime.now()
+        
+        # ==================== 步骤5: 提交事务 ====================
+        session.commit()
+        
+        invalidate_cache_tags(*[f'item:{item_id}' for item_id in quantities])
+        
+        logger.info(f"订单取消成功: 订单ID={order_id}, 买家ID={buyer_id}")
+        return True, "订单取消成功，库存已恢复"
+    
+    @staticmethod
+    def expire_pending_orders(batch_size=None):
+        """
+        自动取消超时未支付的订单并恢复库存（后台任务定期执行）
+        创建超过 ORDER_PAYMENT_TIMEOUT 秒仍为待支付的订单分批取消，每批一个事务
+        :param batch_size: 每批取消的订单数，默认读取 ORDER_EXPIRY_BATCH
+        :return: 取消的订单数
+        """
+        config = current_app.config
+        if batch_size is None:
+            batch_size = config.get('ORDER_EXPIRY_BATCH', 200)
+        cutoff = datetime.now() - timedelta(seconds=config.get('ORDER_PAYMENT_TIMEOUT', 1800))
+        
+        total = 0
+        while True:
+            count, quantities = run_in_transaction(
+                lambda: OrderService._expire_pending_batch(cutoff, batch_size),
+                name='expire_orders'
+            )
+            if count:
+                invalidate_cache_tags(*[f'item:{item_id}' for item_id in quantities])
+                metrics.incr('orders.expired', count)
+                total += count
+            if count < batch_size:
+                break
+        
+        if total:
+            logger.info(f"超时未支付订单自动取消 {total} 个")
+        return total
+    
+    @staticmethod
+    def _expire_pending_batch(cutoff, batch_size):
+        """
+        取消一批超时订单（由 run_in_transaction 执行）
+        固定语句数：锁定一批订单 -> 批量更新状态 -> 按商品汇总明细 -> 一条 UPDATE ... CASE 恢复库存
+        :return: (取消的订单数, {商品ID: 恢复数量})
+        """
+        session = db.session
+        
+        # 走 idx_status / idx_created_at 索引；SKIP LOCKED 跳过正被买家取消或支付的订单
+        order_ids = session.execute(
+            select(Order.id)
+            .where(Order.status == 'pending', Order.created_at <= cutoff)
+            .order_by(Order.created_at, Order.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not order_ids:
+            session.rollback()
+            return 0, {}
+        
+        session.execute(
+            update(Order)
+            .where(Order.id.in_(order_ids), Order.status == 'pending')
+            .values(status='cancelled', updated_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+        
+        rows = session.execute(
+            select(OrderItem.item_id, func.sum(OrderItem.quantity))
+            .where(OrderItem.order_id.in_(order_ids))
+            .group_by(OrderItem.item_id)
+        ).all()
+        quantities = {item_id: int(quantity) for item_id, quantity in rows}
+        StockService.restore(quantities, session)
+        
+        session.commit()
+        logger.info(f"超时订单取消: {order_ids}，恢复库存 {quantities}")
+        return len(order_ids), quantities
+    
     @staticmethod
     def get_addresses(user_id):
         """获取用户的配送地址列表"""
@@ -614,36 +808,37 @@ class OrderService:
     
     @staticmethod
     def get_statistics(user_id):
-        """获取用户的订单统计信息"""
+        """
+        获取用户的订单统计信息
+        一条 GROUP BY status 聚合查询完成（idx_buyer_status 覆盖索引），不加载订单行
+        """
         try:
             session = db.session
             
-            stats = {
-                'total_orders': 0,
-                'pending_orders': 0,
-                'completed_orders': 0,
-                'total_spent': 0.0
-            }
-            
-            # 获取所有订单
-            orders = session.query(Order).filter(
+            # 按状态聚合订单数量与金额
+            rows = session.query(
+                Order.status,
+                func.count(Order.id),
+                func.coalesce(func.sum(Order.total_amount), 0)
+            ).filter(
                 Order.buyer_id == user_id
+            ).group_by(
+                Order.status
             ).all()
             
-            stats['total_orders'] = len(orders)
-            
-            # 统计各状态订单数量
             status_counts = {}
             total_spent = Decimal('0.00')
+            for status, count, amount in rows:
+                status_counts[status] = count
+                if status in ['paid', 'shipped', 'completed']:
+                    total_spent += Decimal(str(amount))
             
-            for order in orders:
-                status_counts[order.status] = status_counts.get(order.status, 0) + 1
-                if order.status in ['paid', 'shipped', 'completed']:
-                    total_spent += order.total_amount
-            
-            stats['pending_orders'] = status_counts.get('pending', 0)
-            stats['completed_orders'] = status_counts.get('completed', 0)
-            stats['total_spent'] = float(total_spent)
+            stats = {
+                'total_orders': sum(status_counts.values()),
+                'pending_orders': status_counts.get('pending', 0),
+                'completed_orders': status_counts.get('completed', 0),
+                'total_spent': float(total_spent)
+            }
             
             return True, stats
             
@@ -0,0 +1,178 @@
+"""
+库存预留服务
+结算页检查库存时可同时预留，保证从结算页到提交订单期间库存答复持续有效：
+
+- 预留：按商品ID升序原子扣减 items.stock（同 StockService），并写入 stock_reservations
+- 消费：create_order 在事务内删除买家对所购商品的预留，预留数量直接计入订单，
+  只对超出预留的部分扣减库存（预留多于购买数量时归还差额）
+- 过期：后台任务（release-reservations）分批归还过期预留的库存并删除记录；
+  预留商品时也会先清理这些商品的过期预留
+
+每个买家对同一商品只保留一条预留，重复预留会替换旧预留
+"""
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, delete, or_
+
+from app.models import db, StockReservation
+from app.services.stock_service import StockService
+from app.utils.cache import invalidate_cache_tags
+from app.utils.metrics import metrics
+from app.utils.transaction import run_in_transaction
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationService:
+    """库存预留服务类"""
+
+    @staticmethod
+    def reserve(buyer_id: int, quantities: dict, ttl: float = None) -> datetime:
+        """
+        为买家预留库存（提交事务）
+        :param buyer_id: 买家ID
+        :param quantities: {商品ID: 预留数量}，数量必须大于0
+        :param ttl: 预留时长（秒），默认读取 STOCK_RESERVATION_TTL
+        :return: 预留过期时间
+        :raises InsufficientStockError: 任一商品库存不足或已下架（不会留下部分预留）
+        """
+        if ttl is None:
+            ttl = current_app.config.get('STOCK_RESERVATION_TTL', 600)
+
+        def tx():
+            session = db.session
+            now = datetime.now()
+            expires_at = now + timedelta(seconds=ttl)
+            item_ids = list(quantities)
+
+            # 买家对这些商品的旧预留、以及这些商品上其他买家的过期预留，一并归还后重新扣减
+            released = ReservationService._release(session, select(StockReservation).where(
+                StockReservation.item_id.in_(item_ids),
+                or_(StockReservation.buyer_id == buyer_id, StockReservation.expires_at <= now)
+            ))
+            changes = {item_id: -quantity for item_id, quantity in released.items()}
+            for item_id, quantity in quantities.items():
+                changes[item_id] = changes.get(item_id, 0) + quantity
+            StockService.adjust(changes, session)
+
+            session.add_all([
+                StockReservation(buyer_id=buyer_id, item_id=item_id, quantity=quantity,
+                                 expires_at=expires_at, created_at=now)
+                for item_id, quantity in quantities.items()
+            ])
+            session.commit()
+            return expires_at
+
+        expires_at = run_in_transaction(tx, name='reserve_stock')
+        invalidate_cache_tags(*[f'item:{item_id}' for item_id in quantities])
+        return expires_at
+
+    @staticmethod
+    def held_quantities(buyer_id: int, item_ids, session=None) -> dict:
+        """
+        查询买家对这些商品的预留数量（含已过期但尚未归还的预留）
+        :return: {商品ID: 预留数量}
+        """
+        session = session or db.session
+        rows = session.execute(
+            select(StockReservation.item_id, StockReservation.quantity).where(
+                StockReservation.buyer_id == buyer_id,
+                StockReservation.item_id.in_(list(item_ids))
+            )
+        )
+        return {item_id: quantity for item_id, quantity in rows}
+
+    @staticmethod
+    def consume(buyer_id: int, item_ids, session=None) -> dict:
+        """
+        消费买家对这些商品的预留（不提交事务）
+        已过期但尚未归还的预留同样可以消费，此时库存仍处于扣减状态
+        :return: {商品ID: 实际消费的预留数量}，调用方据此少扣库存
+        """
+        session = session or db.session
+        return ReservationService._release(session, select(StockReservation).where(
+            StockReservation.buyer_id == buyer_id,
+            StockReservation.item_id.in_(list(item_ids))
+        ))
+
+    @staticmethod
+    def release_expired(batch_size: int = None) -> int:
+        """
+        归还所有过期预留的库存（后台任务定期执行）
+        每批一个事务：删除一批过期记录，再用一条 UPDATE ... CASE 归还这批记录涉及的全部库存
+        :param batch_size: 每批处理的预留条数，默认读取 STOCK_RESERVATION_SWEEP_BATCH
+        :return: 归还的预留条数
+        """
+        if batch_size is None:
+            batch_size = current_app.config.get('STOCK_RESERVATION_SWEEP_BATCH', 500)
+
+        total = 0
+        while True:
+            count, quantities = run_in_transaction(
+                lambda: ReservationService._release_expired_batch(batch_size),
+                name='release_reservations'
+            )
+            if count:
+                invalidate_cache_tags(*[f'item:{item_id}' for item_id in quantities])
+                metrics.incr('reservations.expired', count)
+                total += count
+            if count < batch_size:
+                break
+
+        if total:
+            logger.info(f"归还过期库存预留 {total} 条")
+        return total
+
+    @staticmethod
+    def _release_expired_batch(batch_size: int):
+        """
+        归还一批过期预留（由 run_in_transaction 执行）
+        SKIP LOCKED 跳过正被下单消费的记录，多个进程同时清理时互不等待
+        :return: (归还条数, {商品ID: 归还数量})
+        """
+        session = db.session
+        rows = session.execute(
+            select(StockReservation.id, StockReservation.item_id, StockReservation.quantity)
+            .where(StockReservation.expires_at <= datetime.now())
+            .order_by(StockReservation.expires_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            session.rollback()
+            return 0, {}
+
+        result = session.execute(
+            delete(StockReservation).where(StockReservation.id.in_([row.id for row in rows]))
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(rows):
+            # 部分记录已被并发消费，放弃本批，下次任务执行时重新读取
+            session.rollback()
+            return 0, {}
+
+        quantities = {}
+        for row in rows:
+            quantities[row.item_id] = quantities.get(row.item_id, 0) + row.quantity
+        StockService.restore(quantities, session)
+        session.commit()
+        return len(rows), quantities
+
+    @staticmethod
+    def _release(session, stmt) -> dict:
+        """
+        删除查询到的预留记录（不恢复库存，不提交事务）
+        逐条按ID删除，只统计本事务实际删除的记录，避免与并发的消费/清理重复归还
+        :return: {商品ID: 删除的预留数量}
+        """
+        released = {}
+        for reservation in session.execute(stmt).scalars().all():
+            result = session.execute(
+                delete(StockReservation).where(StockReservation.id == reservation.id)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                released[reservation.item_id] = released.get(reservation.item_id, 0) + reservation.quantity
+            session.expunge(reservation)
+        return released
@@ -1,43 +1,215 @@
 """
 评价与推荐业务逻辑服务
 处理用户评价、商品推荐等
+
+卖家评分读取走 user_ratings 汇总表（O(1) 主键查询），
+汇总表在创建评价的同一事务内增量维护，可通过 flask rebuild-ratings 从 reviews 表重建
 """
 
+from app.models import db, Review, Order, OrderItem, Item, UserRating
+from app.utils.cache import invalidate_cache_tags
+from sqlalchemy import update, case
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
 
 class ReviewService:
     """评价服务类"""
-    
+
     @staticmethod
     def get_item_reviews(item_id, page=1, limit=10):
         """获取商品的评价列表"""
         pass
-    
+
     @staticmethod
     def create_review(order_id, item_id, reviewer_id, rating, content):
         """
         创建评价
-        TODO: 创建新的评价记录
         - 验证订单和商品的有效性
         - 验证评分 (1-5)
+        - 在同一事务内更新被评价者的评分汇总
+
+        Returns:
+            (success, result_or_error_message)
         """
-        pass
-    
+        # 验证评分
+        if not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 5:
+            return False, "评分必须是1-5之间的整数"
+
+        session = db.session
+        try:
+            # 验证订单
+            order = session.get(Order, order_id)
+            if not order:
+                return False, "订单不存在"
+            if order.buyer_id != reviewer_id:
+                return False, "无权评价此订单"
+            if order.status != 'completed':
+                return False, "只能评价已完成的订单"
+
+            # 验证商品属于该订单
+            order_item = session.query(OrderItem).filter(
+                OrderItem.order_id == order_id,
+                OrderItem.item_id == item_id
+            ).first()
+            if not order_item:
+                return False, "订单中不包含该商品"
+
+            item = session.get(Item, item_id)
+            if not item:
+                return False, "商品不存在"
+
+            # 同一订单的同一商品只能评价一次
+            exists = session.query(Review.id).filter(
+                Review.order_id == order_id,
+                Review.item_id == item_id,
+                Review.reviewer_id == reviewer_id
+            ).first()
+            if exists:
+                return False, "已评价过该商品"
+
+            review = Review(
+                order_id=order_id,
+                item_id=item_id,
+                reviewer_id=reviewer_id,
+                reviewee_id=item.seller_id,
+                rating=rating,
+                content=content,
+                created_at=datetime.now()
+            )
+            session.add(review)
+
+            # 增量更新评分汇总（与评价记录同一事务提交）
+            ReviewService._apply_rating(session, item.seller_id, rating)
+
+            session.commit()
+            # 卖家评分已变化，失效展示该卖家评分的缓存
+            invalidate_cache_tags(f'seller:{item.seller_id}')
+
+            logger.info(f"评价创建成功: 评价ID={review.id}, 订单ID={order_id}, 商品ID={item_id}, 评分={rating}")
+            return True, {
+                'review_id': review.id,
+                'order_id': order_id,
+                'item_id': item_id,
+                'reviewee_id': review.reviewee_id,
+                'rating': rating,
+                'created_at': review.created_at.isoformat()
+            }
+
+        except Exception as e:
+            session.rollback()
+            logger.error(f"创建评价失败: {str(e)}")
+            return False, f"创建评价失败: {str(e)}"
+
     @staticmethod
     def get_popular_items(limit=12):
         """获取热销商品（基于销售量）"""
         pass
-    
+
     @staticmethod
     def get_latest_items(limit=12):
         """获取最新商品（基于发布时间）"""
         pass
-    
+
     @staticmethod
     def get_user_rating(user_id):
         """
-        获取用户的评分和统计
+        获取用户的评分和统计（读取评分汇总表，O(1)）
         - 平均评分
         - 收到的评价数量
         - 正面评价比例
+        - 各星级分布
         """
-        pass
+        try:
+            summary = db.session.get(UserRating, user_id)
+            if not summary:
+                summary = UserRating(user_id=user_id, rating_sum=0, rating_count=0, positive_count=0,
+                                     star_1_count=0, star_2_count=0, star_3_count=0,
+                                     star_4_count=0, star_5_count=0)
+            return True, summary.to_dict()
+        except Exception as e:
+            logger.error(f"获取用户评分失败: {str(e)}")
+            return False, f"获取用户评分失败: {str(e)}"
+
+    @staticmethod
+    def rebuild_rating_summaries():
+        """
+        从 reviews 表重建所有用户的评分汇总（用于历史数据回填/校正）
+        一次GROUP BY聚合计算全部用户的汇总值，然后整体替换 user_ratings 表
+
+        Returns:
+            重建的用户数量
+        """
+        session = db.session
+        rows = session.query(
+            Review.reviewee_id,
+            db.func.sum(Review.rating),
+            db.func.count(Review.id),
+            db.func.sum(case((Review.rating >= UserRating.POSITIVE_THRESHOLD, 1), else_=0)),
+            *[db.func.sum(case((Review.rating == star, 1), else_=0)) for star in range(1, 6)]
+        ).group_by(Review.reviewee_id).all()
+
+        try:
+            session.query(UserRating).delete()
+            now = datetime.now()
+            session.bulk_insert_mappings(UserRating, [
+                {
+                    'user_id': row[0],
+                    'rating_sum': int(row[1] or 0),
+                    'rating_count': int(row[2] or 0),
+                    'positive_count': int(row[3] or 0),
+                    'star_1_count': int(row[4] or 0),
+                    'star_2_count': int(row[5] or 0),
+                    'star_3_count': int(row[6] or 0),
+                    'star_4_count': int(row[7] or 0),
+                    'star_5_count': int(row[8] or 0),
+                    'updated_at': now
+                }
+                for row in rows
+            ])
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        logger.info(f"评分汇总重建完成: 用户数={len(rows)}")
+        return len(rows)
+
+    @staticmethod
+    def _apply_rating(session, user_id, rating):
+        """
+        在当前事务内把一条新评分累加到评分汇总
+        使用原子 UPDATE（col = col + 1）避免并发评价丢失更新；汇总行不存在时插入
+        """
+        star_column = f'star_{rating}_count'
+        increments = {
+            'rating_sum': UserRating.rating_sum + rating,
+            'rating_count': UserRating.rating_count + 1,
+            'positive_count': UserRating.positive_count + (1 if rating >= UserRating.POSITIVE_THRESHOLD else 0),
+            star_column: getattr(UserRating, star_column) + 1,
+            'updated_at': datetime.now()
+        }
+        stmt = update(UserRating).where(UserRating.user_id == user_id).values(**increments)
+        result = session.execute(stmt, execution_options={'synchronize_session': False})
+        if result.rowcount:
+            return
+
+        # 首条评价：插入汇总行（并发插入冲突时回退为累加）
+        values = {
+            'user_id': user_id,
+            'rating_sum': rating,
+            'rating_count': 1,
+            'positive_count': 1 if rating >= UserRating.POSITIVE_THRESHOLD else 0,
+            'star_1_count': 0, 'star_2_count': 0, 'star_3_count': 0,
+            'star_4_count': 0, 'star_5_count': 0,
+            'updated_at': datetime.now()
+        }
+        values[star_column] = 1
+        try:
+            with session.begin_nested():
+                session.execute(UserRating.__table__.insert().values(**values))
+        except IntegrityError:
+            session.execute(stmt, execution_options={'synchronize_session': False})
@@ -0,0 +1,102 @@
+"""
+库存扣减服务
+使用单条条件 UPDATE 原子扣减库存，代替 SELECT ... FOR UPDATE + 修改 ORM 对象 + 提交；
+一次扣减的所有商品合并为一条语句：
+
+    UPDATE items SET stock = stock - CASE id WHEN :id1 THEN :q1 WHEN :id2 THEN :q2 END
+    WHERE id IN (:id1, :id2) AND stock >= CASE id ... END AND is_active
+
+- 影响行数少于商品数即有商品库存不足或已下架，此时回滚整个事务并抛出 InsufficientStockError
+- 行锁只在 UPDATE 到事务提交之间持有；调用方应在写入引用商品的外键行（如订单明细）之前扣减，
+  否则外键检查先加的共享锁会与扣减需要的排他锁互相等待，并发扣减同一商品时死锁
+- 单条 UPDATE 按主键顺序加锁，保证并发订单加锁顺序一致
+- 恢复库存不会失败，多个商品同样合并为一条 UPDATE ... CASE 语句
+"""
+from datetime import datetime
+from sqlalchemy import update, case, or_
+
+from app.models import db, Item
+
+
+class InsufficientStockError(Exception):
+    """库存不足或商品已下架"""
+
+    def __init__(self, item_id: int, requested: int):
+        self.item_id = item_id
+        self.requested = requested
+        super().__init__(f"商品 {item_id} 库存不足（需要 {requested} 件）")
+
+
+class StockService:
+    """库存服务类"""
+
+    @staticmethod
+    def deduct(quantities: dict, session=None):
+        """
+        原子扣减库存（不提交事务）
+        :param quantities: {商品ID: 扣减数量}，数量必须大于0
+        :param session: 数据库会话，默认 db.session
+        :raises InsufficientStockError: 任一商品库存不足或已下架（已回滚事务）
+        """
+        StockService.adjust(quantities, session)
+
+    @staticmethod
+    def restore(quantities: dict, session=None):
+        """
+        原子恢复库存（不提交事务）
+        所有商品合并为一条 UPDATE ... CASE 语句（取消订单、批量归还过期预留）
+        :param quantities: {商品ID: 恢复数量}
+        :param session: 数据库会话，默认 db.session
+        """
+        if not quantities:
+            return
+        session = session or db.session
+        stmt = update(Item).where(Item.id.in_(sorted(quantities))).values(
+            stock=Item.stock + case(quantities, value=Item.id, else_=0),
+            updated_at=datetime.now()
+        ).execution_options(synchronize_session=False)
+        session.execute(stmt)
+
+    @staticmethod
+    def adjust(changes: dict, session=None):
+        """
+        用一条 UPDATE 同时扣减或恢复多个商品的库存（不提交事务）
+        同一事务内既有扣减又有恢复时（如替换预留、下单消费预留）使用；
+        恢复的商品不要求在售
+        :param changes: {商品ID: 扣减数量}，负数表示恢复，0 忽略
+        :param session: 数据库会话，默认 db.session
+        :raises InsufficientStockError: 任一扣减的商品库存不足或已下架（已回滚事务）
+        """
+        changes = {item_id: quantity for item_id, quantity in changes.items() if quantity}
+        if not changes:
+            return
+        session = session or db.session
+        delta = case(changes, value=Item.id, else_=0)
+        stmt = update(Item).where(
+            Item.id.in_(sorted(changes)),
+            Item.stock >= delta,
+            or_(Item.is_active.is_(True), delta < 0)
+        ).values(
+            stock=Item.stock - delta,
+            updated_at=datetime.now()
+        ).execution_options(synchronize_session=False)
+        if session.execute(stmt).rowcount != len(changes):
+            StockService._raise_shortfall(changes, session)
+
+    @staticmethod
+    def _raise_shortfall(changes: dict, session):
+        """
+        条件 UPDATE 未命中全部商品时，找出库存不足或已下架的商品并抛出异常
+        先回滚事务（撤销已扣减的部分商品并释放行锁），再按已提交的库存判断
+        """
+        session.rollback()
+        rows = session.query(Item.id, Item.stock, Item.is_active).filter(Item.id.in_(list(changes)))
+        current = {item_id: (stock, is_active) for item_id, stock, is_active in rows}
+        for item_id in sorted(changes):
+            quantity = changes[item_id]
+            stock, is_active = current.get(item_id, (0, False))
+            if quantity > 0 and (not is_active or stock < quantity):
+                raise InsufficientStockError(item_id, quantity)
+        # 未找到时（如商品被并发删除）归咎于第一个扣减的商品
+        item_id = min(item_id for item_id, quantity in changes.items() if quantity > 0)
+        raise InsufficientStockError(item_id, changes[item_id])
@@ -2,9 +2,13 @@
 用户业务逻辑服务层
 负责处理用户注册、登录、资料查询/更新等核心业务逻辑
 """
-from app.models import User, Item, Order, OrderItem, Review, db 
+from app.models import User, Item, Order, OrderItem, UserRating, db 
 from app.utils.password_helper import PasswordHelper
 from app.utils.jwt_helper import generate_token
+from app.utils.cache import data_cache, invalidate_cache_tags
+from flask import current_app
+from sqlalchemy import select, func, case
+from sqlalchemy.orm import aliased
 from datetime import datetime
 
 class UserService:
@@ -224,44 +228,77 @@ class UserService:
     @staticmethod
     def _get_user_rating(user_id: int) -> float:
         """
-        获取用户评分（1-5分）
+        获取用户评分（1-5分），读取评分汇总表
         :param user_id: 用户ID
         :return: 平均评分
         """
-        reviews = Review.query.filter_by(reviewee_id=user_id).all()
-        if not reviews:
-            return 5.0  # 无评价时默认5分
-        
-        total_rating = sum(review.rating for review in reviews)
-        return round(total_rating / len(reviews), 1)
+        summary = db.session.get(UserRating, user_id)
+        return summary.average_rating if summary else 5.0  # 无评价时默认5分
+
+    @staticmethod
+    def _get_user_ratings(user_ids: list) -> dict:
+        """
+        批量获取用户评分（1-5分），读取评分汇总表，一次主键IN查询
+        :param user_ids: 用户ID列表
+        :return: {用户ID: 平均评分}，无评价的用户默认5分
+        """
+        ratings = {user_id: 5.0 for user_id in user_ids}  # 无评价时默认5分
+        if not user_ids:
+            return ratings
+
+        summaries = UserRating.query.filter(UserRating.user_id.in_(user_ids)).all()
+        for summary in summaries:
+            ratings[summary.user_id] = summary.average_rating
+        return ratings
 
     @staticmethod
     def _get_user_stats(user_id: int) -> dict:
         """
         获取用户统计信息
+        已发布数、收藏总数与已售出数由一条聚合查询返回，结果按用户ID缓存在业务数据缓存中
+        （USER_STATS_CACHE_TTL 秒，标签 user_stats:<ID>），商品写入与订单完成时失效
         :param user_id: 用户ID
         :return: 统计数据
         """
-        # 已发布商品数
-        published_count = Item.query.filter_by(seller_id=user_id, is_active=True).count()
-        
-        # 已售出商品数（通过订单明细关联）
-        sold_subquery = db.session.query(OrderItem.item_id).join(
+        stats = data_cache.get_or_set(
+            f'user_stats:{user_id}',
+            lambda: UserService._query_user_stats(user_id),
+            ttl=current_app.config.get('USER_STATS_CACHE_TTL', 60),
+            tags=[f'user_stats:{user_id}']
+        )
+        return dict(stats)
+
+    @staticmethod
+    def _query_user_stats(user_id: int) -> dict:
+        """查询用户统计信息（一条聚合查询）"""
+        # 已售出商品数（该卖家商品出现在已完成订单中的去重数量）
+        sold_item = aliased(Item)
+        sold_subquery = select(func.count(func.distinct(OrderItem.item_id))).select_from(OrderItem).join(
+            sold_item, sold_item.id == OrderItem.item_id
+        ).join(
             Order, Order.id == OrderItem.order_id
-        ).filter(
-            Order.status == 'completed',
-            OrderItem.item_id.in_(
-                db.session.query(Item.id).filter_by(seller_id=user_id)
-            )
-        ).distinct()
-        sold_count = sold_subquery.count()
-        
-        # 收藏数（此处假设Item模型有favorites字段，若需用户收藏商品数需新增关联表）
-        # 暂使用商品收藏数总和，可根据实际需求调整
-        favorite_count = db.session.query(db.func.sum(Item.favorites)).filter_by(seller_id=user_id).scalar() or 0
-        
+        ).where(
+            sold_item.seller_id == user_id,
+            Order.status == 'completed'
+        ).scalar_subquery()
+
+        # 已发布商品数、收藏数（此处假设Item模型有favorites字段，暂使用商品收藏数总和）与已售出数一并查询
+        published_count, favorite_count, sold_count = db.session.query(
+            func.count(case((Item.is_active.is_(True), Item.id))),
+            func.coalesce(func.sum(Item.favorites), 0),
+            sold_subquery
+        ).filter(Item.seller_id == user_id).one()
+
         return {
             'published': published_count,
-            'sold': sold_count,
-            'favorites': favorite_count
-        }
\ No newline at end of file
+            'sold': sold_count or 0,
+            'favorites': int(favorite_count)
+        }
+
+    @staticmethod
+    def invalidate_user_stats(*user_ids):
+        """
+        使用户统计缓存失效（商品发布/更新/下架、订单完成后调用）
+        :param user_ids: 用户ID
+        """
+        invalidate_cache_tags(*[f'user_stats:{user_id}' for user_id in user_ids])
\ No newline at end of file
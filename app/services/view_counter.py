@@ -0,0 +1,134 @@
+"""
+商品浏览量写回缓冲（write-behind）
+商品详情是读接口，逐次执行 views = views + 1 并提交会把读请求变成行锁写入，
+热门商品上会产生热点行竞争
+
+浏览量先在进程内存中累加，定期（或累计条数达到上限时）用一条批量
+UPDATE items SET views = views + CASE id ... END 写回数据库
+- 进程崩溃最多丢失 VIEW_COUNTER_FLUSH_INTERVAL 秒内、且不超过 VIEW_COUNTER_MAX_PENDING 次的浏览量
+- 写回失败时计数并回缓冲区，下次重试
+- 指标：view_counter.pending（待写回次数）、view_counter.flush_lag_seconds（最早待写回浏览距今秒数），
+  每次记录浏览、写回（包括缓冲区为空和写回失败）时更新
+"""
+import threading
+import time
+import logging
+from flask import current_app
+from sqlalchemy import update, case
+
+from app.models import Item, db
+from app.utils.cache import invalidate_cache_tags
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """商品浏览量缓冲计数器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}          # 商品ID -> 待写回浏览次数
+        self._pending_total = 0
+        self._oldest_pending = None  # 最早一次未写回浏览的时间戳（monotonic）
+        self.last_flush_at = None   # 最近一次成功写回的时间戳（time.time）
+
+    def record(self, item_id: int):
+        """
+        记录一次浏览（需在应用上下文中调用）
+        未启用缓冲（VIEW_COUNTER_ENABLED=false）或待写回次数达到
+        VIEW_COUNTER_MAX_PENDING 时立即同步写回
+        """
+        enabled = current_app.config.get('VIEW_COUNTER_ENABLED', True)
+        max_pending = current_app.config.get('VIEW_COUNTER_MAX_PENDING', 1000)
+        with self._lock:
+            self._pending[item_id] = self._pending.get(item_id, 0) + 1
+            self._pending_total += 1
+            if self._oldest_pending is None:
+                self._oldest_pending = time.monotonic()
+            self._publish_gauges_locked()
+            should_flush = not enabled or self._pending_total >= max_pending
+        if should_flush:
+            self.flush()
+
+    def pending(self, item_id: int) -> int:
+        """商品尚未写回数据库的浏览次数"""
+        with self._lock:
+            return self._pending.get(item_id, 0)
+
+    def flush(self) -> int:
+        """
+        把缓冲区中的浏览量批量写回数据库
+        :return: 写回的浏览次数
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    self._publish_gauges_locked()
+                    return 0
+                batch = self._pending
+                batch_total = self._pending_total
+                oldest = self._oldest_pending
+                self._pending = {}
+                self._pending_total = 0
+                self._oldest_pending = None
+                self._publish_gauges_locked()
+
+            try:
+                # 显式保留 updated_at，浏览量变化不算商品内容更新
+                stmt = update(Item).where(Item.id.in_(list(batch.keys()))).values(
+                    views=Item.views + case(batch, value=Item.id, else_=0),
+                    updated_at=Item.updated_at
+                )
+                db.session.execute(stmt, execution_options={'synchronize_session': False})
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self._restore(batch, batch_total, oldest)
+                metrics.incr('view_counter.flush_errors')
+                logger.error(f"浏览量写回失败，已放回缓冲区: {str(e)}")
+                return 0
+
+            # 商品详情缓存中的浏览量随之刷新
+            invalidate_cache_tags(*[f'item_views:{item_id}' for item_id in batch])
+            self.last_flush_at = time.time()
+            metrics.incr('view_counter.flushed_views', batch_total)
+            metrics.incr('view_counter.flushes')
+            metrics.set_gauge('view_counter.last_flush_lag_seconds', round(time.monotonic() - oldest, 3))
+            return batch_total
+
+    def stats(self) -> dict:
+        """当前缓冲状态（同时刷新指标仪表）"""
+        with self._lock:
+            pending_total, lag = self._publish_gauges_locked()
+        return {
+            'pending': pending_total,
+            'flush_lag_seconds': lag,
+            'last_flush_at': self.last_flush_at
+        }
+
+    def _publish_gauges_locked(self):
+        """
+        更新待写回次数与写回延迟仪表（调用方持有 self._lock）
+        :return: (待写回次数, 最早待写回浏览距今秒数)
+        """
+        lag = time.monotonic() - self._oldest_pending if self._oldest_pending is not None else 0.0
+        lag = round(lag, 3)
+        metrics.set_gauge('view_counter.pending', self._pending_total)
+        metrics.set_gauge('view_counter.flush_lag_seconds', lag)
+        return self._pending_total, lag
+
+    def _restore(self, batch: dict, batch_total: int, oldest):
+        """写回失败时把批次计数合并回缓冲区"""
+        with self._lock:
+            for item_id, count in batch.items():
+                self._pending[item_id] = self._pending.get(item_id, 0) + count
+            self._pending_total += batch_total
+            if self._oldest_pending is None or (oldest is not None and oldest < self._oldest_pending):
+                self._oldest_pending = oldest
+            self._publish_gauges_locked()
+
+
+# 进程内全局浏览量计数器
+view_counter = ViewCounter()
@@ -446,7 +446,7 @@ const cartAPI = {
    * 获取购物车内容
    * @returns {Promise}
    */
-  getCart: () => apiClient.get('/cart'),
+  getCart: () => apiClient.post('/cart/getCart', {}),
 
   /**
    * 添加商品到购物车
@@ -455,7 +455,7 @@ const cartAPI = {
    * @param {number} item.quantity - 数量
    * @returns {Promise}
    */
-  addItem: (item) => apiClient.post('/cart/items', item),
+  addItem: (item) => apiClient.post('/cart/addCart', item),
 
   /**
    * 更新购物车商品数量
@@ -464,26 +464,26 @@ const cartAPI = {
    * @returns {Promise}
    */
   updateItem: (itemId, quantity) =>
-    apiClient.patch(`/cart/items/${itemId}`, { quantity }),
+    apiClient.post('/cart/updateCart', { itemId, quantity }),
 
   /**
    * 移除购物车商品
    * @param {number} itemId - 商品ID
    * @returns {Promise}
    */
-  removeItem: (itemId) => apiClient.delete(`/cart/items/${itemId}`),
+  removeItem: (itemId) => apiClient.post('/cart/removeCart', { itemId }),
 
   /**
    * 清空购物车
    * @returns {Promise}
    */
-  clear: () => apiClient.delete('/cart'),
+  clear: () => apiClient.post('/cart/clearCart', {}),
 
   /**
    * 获取购物车统计信息
    * @returns {Promise}
    */
-  getStats: () => apiClient.get('/cart/stats'),
+  getStats: () => apiClient.post('/cart/getStats', {}),
 };
 
 /**
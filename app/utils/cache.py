@@ -0,0 +1,428 @@
+"""
+缓存工具
+- TTLCache：进程内缓存，线程安全、容量有界（LRU 淘汰）、每条记录独立过期时间
+- SQLiteCacheBackend：基于本地 SQLite 文件的共享缓存，同一主机上的多个工作进程共享命中
+- SingleFlight：同一个键的并发加载只执行一次，其余请求等待结果（防缓存击穿）
+- Cache：缓存门面，组合后端 + SingleFlight + 命中/未命中计数（cache.<名称>.hits/misses 指标）
+
+后端统一接口：get(key, default) / set(key, value, ttl) / delete(key) / clear()
+
+标签失效：缓存条目写入时记录所带标签（如 item:12、seller:3、category:books）的当前版本号，
+读取时版本号不一致即视为未命中；写操作提交后调用 invalidate_cache_tags 为标签生成新版本号。
+版本号与缓存条目存放在同一后端，使用共享后端时失效对所有工作进程生效；
+进程内后端（memory）的失效只对执行写操作的进程生效，其他进程要等条目过期，
+因此 memory 后端按 max_ttl（CACHE_LOCAL_MAX_TTL）限制所有条目的过期时间，
+多进程部署需要长 TTL 时应使用 sqlite 共享后端。
+加载期间发生的失效会使本次加载结果不写入缓存（见 Cache.refresh），避免旧数据以新版本号缓存
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from app.utils.metrics import metrics
+
+_MISSING = object()
+
+# 标签版本号的保存时间（秒），应长于任何缓存条目的过期时间
+TAG_VERSION_TTL = 7 * 24 * 3600
+
+# 全局失效序号的缓存键：任何标签失效都会更新，用于判断加载期间是否发生过失效
+TAG_EPOCH_KEY = 'tag_epoch'
+
+
+class TTLCache:
+    """
+    带过期时间的内存缓存
+    - 每条缓存记录独立过期时间
+    - 容量达到上限时淘汰最久未访问的记录（LRU）
+    - 可设置过期时间上限，写入时传入的更长 TTL 按上限截断
+    """
+
+    def __init__(self, ttl: float = 60, max_entries: int = 1024, max_ttl: float = None):
+        """
+        :param ttl: 默认过期时间（秒）
+        :param max_entries: 最大缓存条目数
+        :param max_ttl: 过期时间上限（秒），None 或 0 表示不限制
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._data = OrderedDict()  # key -> (过期时间戳, value)，按访问顺序排列
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """读取缓存，不存在或已过期时返回 default"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        """写入缓存"""
+        ttl = self.ttl if ttl is None else ttl
+        if self.max_ttl:
+            ttl = min(ttl, self.max_ttl)
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            self._data.pop(key, None)
+            while len(self._data) >= self.max_entries:
+                # 淘汰最久未访问的记录
+                self._data.popitem(last=False)
+            self._data[key] = (expires_at, value)
+
+    def delete(self, key):
+        """删除单条缓存"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SQLiteCacheBackend:
+    """
+    本地 SQLite 文件缓存后端
+    同一主机上的多个工作进程共享同一个文件；值以 JSON 存储，只能缓存可 JSON 序列化的数据
+    """
+
+    # 每写入多少次清理一次过期记录并裁剪容量
+    PRUNE_EVERY = 200
+
+    def __init__(self, path: str, ttl: float = 60, max_entries: int = 10000):
+        """
+        :param path: 缓存文件路径
+        :param ttl: 默认过期时间（秒）
+        :param max_entries: 最大缓存条目数（超出时淘汰最早过期的记录）
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_expires_at ON cache_entries (expires_at)')
+
+    def _connect(self):
+        """每个线程复用一个连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, default=None):
+        """读取缓存，不存在或已过期时返回 default"""
+        row = self._connect().execute(
+            'SELECT value, expires_at FROM cache_entries WHERE key = ?', (str(key),)
+        ).fetchone()
+        if row is None or row[1] <= time.time():
+            return default
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl: float = None):
+        """写入缓存"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+            (str(key), json.dumps(value, ensure_ascii=False), expires_at)
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self._prune(conn)
+
+    def delete(self, key):
+        """删除单条缓存"""
+        self._connect().execute('DELETE FROM cache_entries WHERE key = ?', (str(key),))
+
+    def clear(self):
+        """清空缓存"""
+        self._connect().execute('DELETE FROM cache_entries')
+
+    def _prune(self, conn):
+        """删除过期记录，并把条目数裁剪到上限以内"""
+        conn.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (time.time(),))
+        conn.execute(
+            'DELETE FROM cache_entries WHERE key IN ('
+            'SELECT key FROM cache_entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+
+
+class _Flight:
+    """一次进行中的加载"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """合并同一个键的并发加载：只有第一个调用者执行加载函数，其余调用者等待并共享结果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, func):
+        """
+        执行加载函数
+        :return: (结果, 是否由本次调用执行)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, False
+
+        try:
+            flight.result = func()
+            return flight.result, True
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+
+# 带标签缓存条目的标记字段
+_TAGGED = '__cache_tags__'
+
+# 所有缓存实例（invalidate_cache_tags 逐个失效）
+_caches = []
+
+
+class Cache:
+    """
+    缓存门面
+    组合存储后端、SingleFlight 与命中统计，后端可在应用启动时按配置替换
+    """
+
+    def __init__(self, name: str, backend=None):
+        """
+        :param name: 缓存名称（用于指标）
+        :param backend: 存储后端，默认进程内 TTLCache
+        """
+        self.name = name
+        self.backend = backend if backend is not None else TTLCache()
+        self._flight = SingleFlight()
+        _caches.append(self)
+
+    def configure(self, backend):
+        """替换存储后端"""
+        self.backend = backend
+
+    def get(self, key, default=None):
+        """读取缓存（计入命中统计）"""
+        value = self._read(key)
+        if value is _MISSING:
+            metrics.incr(f'cache.{self.name}.misses')
+            return default
+        metrics.incr(f'cache.{self.name}.hits')
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        """写入缓存"""
+        self.backend.set(key, value, ttl)
+
+    def delete(self, key):
+        """删除单条缓存"""
+        self.backend.delete(key)
+
+    def clear(self):
+        """清空缓存"""
+        self.backend.clear()
+
+    def get_or_set(self, key, loader, ttl: float = None, cacheable=None, tags=None):
+        """
+        读取缓存，未命中时加载并写入
+        同一进程内同一个键的并发未命中只执行一次 loader
+        :param key: 缓存键
+        :param loader: 加载函数（无参数）
+        :param ttl: 过期时间（秒）
+        :param cacheable: 判断加载结果是否可缓存的函数，默认全部缓存
+        :param tags: 缓存标签列表，或根据加载结果返回标签列表的函数
+        :return: 缓存值或加载结果
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        def load():
+            # 等待期间其他调用者可能已写入缓存
+            cached = self._read(key)
+            if cached is not _MISSING:
+                return cached
+            return self.refresh(key, loader, ttl, cacheable, tags)
+
+        value, leader = self._flight.do(key, load)
+        if not leader:
+            metrics.incr(f'cache.{self.name}.coalesced')
+        return value
+
+    def refresh(self, key, loader, ttl: float = None, cacheable=None, tags=None):
+        """
+        加载并写入缓存（不读取旧值）
+        加载期间数据可能被修改并失效标签，此时加载结果可能已过期，不写入缓存：
+        - 固定标签：加载前记录标签版本号，写入时任一版本号变化则跳过
+        - 由加载结果决定的标签：加载前记录全局失效序号，任何标签失效都会改变该序号，变化则跳过
+        :return: 加载结果
+        """
+        if callable(tags):
+            epoch = self.backend.get(TAG_EPOCH_KEY)
+            versions = None
+        else:
+            versions = self._tag_versions(tags) if tags else None
+
+        result = loader()
+        if cacheable is not None and not cacheable(result):
+            return result
+
+        if callable(tags):
+            entry_tags = tags(result)
+            if entry_tags:
+                # 先读取版本号再核对失效序号（invalidate_tags 先更新序号），
+                # 序号未变则读到的版本号不晚于加载开始时
+                versions = self._tag_versions(entry_tags)
+                if self.backend.get(TAG_EPOCH_KEY) != epoch:
+                    metrics.incr(f'cache.{self.name}.stale_loads')
+                    return result
+        elif versions and any(self.backend.get(f'tag:{tag}') != version for tag, version in versions.items()):
+            metrics.incr(f'cache.{self.name}.stale_loads')
+            return result
+
+        if versions:
+            self.backend.set(key, {_TAGGED: versions, 'value': result}, ttl)
+        else:
+            self.backend.set(key, result, ttl)
+        return result
+
+    def set_tagged(self, key, value, tags, ttl: float = None):
+        """写入带标签的缓存（任一标签失效后该条目视为未命中）"""
+        if not tags:
+            self.backend.set(key, value, ttl)
+            return
+        self.backend.set(key, {_TAGGED: self._tag_versions(tags), 'value': value}, ttl)
+
+    def invalidate_tags(self, *tags):
+        """为标签生成新版本号，使带这些标签的缓存条目全部失效"""
+        # 先更新全局失效序号，再更新标签版本号（顺序见 refresh）
+        self.backend.set(TAG_EPOCH_KEY, uuid.uuid4().hex, TAG_VERSION_TTL)
+        for tag in set(tags):
+            self.backend.set(f'tag:{tag}', uuid.uuid4().hex, TAG_VERSION_TTL)
+
+    def _tag_versions(self, tags) -> dict:
+        """读取标签当前版本号（不存在时生成，避免版本号被淘汰后旧条目重新生效）"""
+        versions = {}
+        for tag in set(tags):
+            version = self.backend.get(f'tag:{tag}')
+            if version is None:
+                version = uuid.uuid4().hex
+                self.backend.set(f'tag:{tag}', version, TAG_VERSION_TTL)
+            versions[tag] = version
+        return versions
+
+    def _read(self, key):
+        """读取缓存值并校验标签版本，未命中返回 _MISSING"""
+        entry = self.backend.get(key, _MISSING)
+        if isinstance(entry, dict) and _TAGGED in entry:
+            for tag, version in entry[_TAGGED].items():
+                if self.backend.get(f'tag:{tag}') != version:
+                    return _MISSING
+            return entry['value']
+        return entry
+
+    def stats(self) -> dict:
+        """命中统计"""
+        hits = metrics.get(f'cache.{self.name}.hits')
+        misses = metrics.get(f'cache.{self.name}.misses')
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'coalesced': metrics.get(f'cache.{self.name}.coalesced'),
+            'hit_rate': round(hits / total, 4) if total else 0.0
+        }
+
+
+def create_backend(kind: str, ttl: float = 60, max_entries: int = 1024, path: str = None,
+                   local_max_ttl: float = None):
+    """
+    按名称创建缓存后端
+    :param kind: memory（进程内 LRU）/ sqlite（本地文件，多进程共享）
+    :param local_max_ttl: memory 后端的过期时间上限（秒），限制其他工作进程读到旧数据的最长时间
+    """
+    if kind == 'sqlite':
+        return SQLiteCacheBackend(path or 'instance/cache.sqlite3', ttl=ttl, max_entries=max_entries)
+    if kind != 'memory':
+        raise ValueError(f'未知的缓存后端: {kind}')
+    return TTLCache(ttl=ttl, max_entries=max_entries, max_ttl=local_max_ttl)
+
+
+def invalidate_cache_tags(*tags):
+    """
+    使所有缓存中带这些标签的条目失效（写操作提交后调用）
+    :param tags: 标签，如 item:12、seller:3、category:books、search、featured
+    """
+    if not tags:
+        return
+    backends = set()
+    for cache in _caches:
+        # 共享同一后端的缓存实例只需失效一次
+        if id(cache.backend) not in backends:
+            backends.add(id(cache.backend))
+            cache.invalidate_tags(*tags)
+    metrics.incr('cache.tag_invalidations', len(set(tags)))
+
+
+def add_cache_tags(*tags):
+    """
+    为当前请求的响应追加缓存标签（在 cache_response 装饰的视图中调用）
+    不在请求上下文中时忽略
+    """
+    from flask import g, has_request_context
+    if has_request_context():
+        g.setdefault('_cache_tags', set()).update(tags)
+
+
+# 接口响应缓存（cache_response 装饰器使用）
+response_cache = Cache('response')
+# 业务数据缓存（商品详情等），与响应缓存共用后端及标签版本
+data_cache = Cache('data')
@@ -369,6 +369,35 @@ def _validate_list_items(field_name, value, schema):
     return None
 
 
+# ==================== Session 密钥检查 ====================
+
+def check_session_secret():
+    """
+    检查 Session 签名密钥：未配置 SECRET_KEY（使用公开的开发密钥）且不在调试/测试模式时返回错误响应，
+    否则返回 None。可直接注册为蓝图的 before_request（如购物车蓝图）
+    """
+    from flask import current_app
+    from app import DEV_SECRET_KEY
+    from app.utils.response import APIResponse
+
+    if current_app.config['SECRET_KEY'] == DEV_SECRET_KEY and not (current_app.debug or current_app.testing):
+        # 公开密钥签名的 Session 可被伪造，拒绝读写
+        return APIResponse.server_error(message='服务端未配置 SECRET_KEY，购物车暂不可用')
+    return None
+
+
+def session_secret_required(f):
+    """读写 Session 的接口使用的装饰器，未配置 SECRET_KEY 时拒绝服务（见 check_session_secret）"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        error = check_session_secret()
+        if error is not None:
+            return error
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
 # ==================== 日志装饰器 ====================
 
 def log_request(f):
@@ -410,43 +439,60 @@ def log_request(f):
 
 # ==================== 缓存装饰器 ====================
 
-def cache_response(ttl=300):
+def cache_response(ttl=300, tags=()):
     """
     缓存响应装饰器
+    - 缓存键由接口名、路径参数、查询参数和 JSON 请求体（键排序后）共同决定
+    - 只缓存 200 响应，缓存内容为状态码 + 响应体，命中时重新构造 Response
+    - 缓存标签 = 固定标签 tags + 视图中 add_cache_tags 追加的标签，
+      任一标签被 invalidate_cache_tags 失效后重新生成
+    - 存储后端、容量由 response_cache 按配置决定（RESPONSE_CACHE_BACKEND），
+      同一键的并发未命中只执行一次视图函数
+    - RESPONSE_CACHE_ENABLED=false 时直接执行视图函数
     Args:
         ttl: 缓存时间（秒），默认5分钟
+        tags: 固定缓存标签
     """
-    # 这里使用简单的内存缓存，实际项目中可以使用Redis等
-    import time
-    _cache = {}
-    
+    import hashlib
+    import json
+    from flask import current_app, make_response, g
+    from app.utils.cache import response_cache
+
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            # 生成缓存键：函数名 + 参数 + 查询参数
-            cache_key = f"{f.__name__}:{str(args)}:{str(kwargs)}:{str(request.args)}"
-            
-            # 检查缓存
-            if cache_key in _cache:
-                cache_entry = _cache[cache_key]
-                if time.time() - cache_entry['timestamp'] < ttl:
-                    return cache_entry['response']
-                else:
-                    # 缓存过期
-                    del _cache[cache_key]
-            
-            # 执行函数
-            response = f(*args, **kwargs)
-            
-            # 缓存响应
-            if response and hasattr(response, 'status_code') and response.status_code == 200:
-                _cache[cache_key] = {
-                    'response': response,
-                    'timestamp': time.time()
+            if not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+                return f(*args, **kwargs)
+
+            # 生成缓存键：函数名 + 路径参数 + 查询参数 + 请求体
+            body = request.get_json(silent=True)
+            if body is None:
+                body = request.get_data(as_text=True)
+            raw_key = json.dumps(
+                [f.__name__, kwargs, sorted(request.args.items(multi=True)), body],
+                sort_keys=True, ensure_ascii=False, default=str
+            )
+            cache_key = f"{f.__name__}:{hashlib.sha1(raw_key.encode('utf-8')).hexdigest()}"
+
+            def render():
+                g._cache_tags = set(tags)
+                response = make_response(f(*args, **kwargs))
+                return {
+                    'status': response.status_code,
+                    'mimetype': response.mimetype,
+                    'body': response.get_data(as_text=True),
+                    'tags': sorted(g._cache_tags)
                 }
-            
-            return response
+
+            cached = response_cache.get_or_set(
+                cache_key, render, ttl=ttl,
+                cacheable=lambda entry: entry['status'] == 200,
+                tags=lambda entry: entry['tags']
+            )
+            return current_app.response_class(
+                cached['body'], status=cached['status'], mimetype=cached['mimetype']
+            )
         
         return decorated_function
     
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,50 @@
+"""
+进程内运行指标
+记录计数器（累计值）和仪表（当前值），通过 metrics.snapshot() 导出，供基准脚本、测试与日志排查使用
+多进程部署时每个进程各自统计
+"""
+import threading
+
+
+class MetricsRegistry:
+    """线程安全的指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+
+    def incr(self, name: str, value: float = 1):
+        """计数器累加"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        """设置仪表当前值"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def get(self, name: str, default=0):
+        """读取指标值（优先计数器）"""
+        with self._lock:
+            if name in self._counters:
+                return self._counters[name]
+            return self._gauges.get(name, default)
+
+    def snapshot(self) -> dict:
+        """导出全部指标"""
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges)
+            }
+
+    def reset(self):
+        """清空全部指标（测试/基准脚本使用）"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+
+
+# 进程内全局指标实例
+metrics = MetricsRegistry()
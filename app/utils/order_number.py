@@ -0,0 +1,120 @@
+"""
+订单号生成器（Snowflake 风格）
+订单号 = 'ORD' + 19 位十进制数字（左侧补零），数字部分为 63 位整数：
+
+    | 41 位毫秒时间戳（自 2024-01-01 起） | 10 位工作进程ID | 12 位毫秒内序号 |
+
+- 进程内生成，无需访问数据库；同一进程每毫秒最多 4096 个，超出时借用下一毫秒
+- 工作进程ID默认由主机名与进程号计算（只有 1024 个取值，进程号相差 1024 的倍数或不同主机时可能重复，
+  启动时输出警告）；多进程/多机部署应通过环境变量 ORDER_WORKER_ID（0-1023）为每个进程指定不同的值。
+  工作进程ID重复导致的订单号冲突由下单事务识别后重新生成订单号重试（见 is_duplicate_order_number）
+- 数字部分定长，订单号按字符串排序即按生成时间排序，可直接作为时间索引使用
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+EPOCH_MS = 1704067200000  # 2024-01-01 00:00:00 UTC
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+PREFIX = 'ORD'
+DIGITS = 19
+
+
+def default_worker_id() -> int:
+    """工作进程ID：优先读取 ORDER_WORKER_ID，否则由主机名和进程号计算（可能与其他进程重复）"""
+    configured = os.getenv('ORDER_WORKER_ID')
+    if configured:
+        return int(configured) & MAX_WORKER_ID
+    worker_id = (zlib.crc32(socket.gethostname().encode()) ^ os.getpid()) & MAX_WORKER_ID
+    logger.warning(f"未配置 ORDER_WORKER_ID，订单号工作进程ID由主机名与进程号计算为 {worker_id}，"
+                   f"多进程/多机部署时可能与其他进程重复，请为每个进程配置不同的 ORDER_WORKER_ID")
+    return worker_id
+
+
+def is_duplicate_order_number(exc) -> bool:
+    """判断数据库异常是否为订单号唯一约束冲突"""
+    if not isinstance(exc, IntegrityError) or exc.orig is None:
+        return False
+    message = str(exc.orig)
+    # MySQL: Duplicate entry 'ORD...' for key 'orders.order_number'（或 uq_order_number）
+    # SQLite: UNIQUE constraint failed: orders.order_number
+    return 'order_number' in message and ('Duplicate entry' in message or 'UNIQUE constraint' in message)
+
+
+class OrderNumberGenerator:
+    """订单号生成器"""
+
+    def __init__(self, worker_id: int = None):
+        self._fixed_worker_id = worker_id
+        self._lock = threading.Lock()
+        self._pid = None
+        self._worker_id = 0
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self) -> int:
+        """生成下一个数字ID（进程内严格递增）"""
+        with self._lock:
+            # fork 出的子进程重新计算工作进程ID，避免与父进程生成相同的订单号
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._worker_id = (self._fixed_worker_id if self._fixed_worker_id is not None
+                                   else default_worker_id()) & MAX_WORKER_ID
+                self._last_ms = -1
+                self._sequence = 0
+
+            now_ms = int(time.time() * 1000) - EPOCH_MS
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            else:
+                # 同一毫秒内或系统时钟回拨：沿用上次时间戳继续递增序号，序号用尽时借用下一毫秒
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    self._last_ms += 1
+                    self._sequence = 0
+
+            return (self._last_ms << (WORKER_BITS + SEQUENCE_BITS)) \
+                | (self._worker_id << SEQUENCE_BITS) | self._sequence
+
+    def next_order_number(self) -> str:
+        """生成下一个订单号"""
+        return f'{PREFIX}{self.next_id():0{DIGITS}d}'
+
+
+def parse_order_number(order_number: str):
+    """
+    解析订单号
+    :return: {'created_at': 生成时间, 'worker_id': 工作进程ID, 'sequence': 序号}；
+             非本生成器格式的订单号返回 None
+    """
+    digits = order_number[len(PREFIX):] if order_number and order_number.startswith(PREFIX) else ''
+    if len(digits) != DIGITS or not digits.isdigit():
+        return None
+    value = int(digits)
+    timestamp_ms = (value >> (WORKER_BITS + SEQUENCE_BITS)) + EPOCH_MS
+    return {
+        'created_at': datetime.fromtimestamp(timestamp_ms / 1000),
+        'worker_id': (value >> SEQUENCE_BITS) & MAX_WORKER_ID,
+        'sequence': value & MAX_SEQUENCE
+    }
+
+
+# 进程内全局生成器
+order_number_generator = OrderNumberGenerator()
+
+
+def generate_order_number() -> str:
+    """生成订单号"""
+    return order_number_generator.next_order_number()
@@ -0,0 +1,93 @@
+"""
+游标（Keyset）分页工具
+用于深分页场景：以“排序键 + id”作为游标，直接通过索引范围条件定位下一页，
+不再使用 OFFSET，也不需要额外的 count 查询
+
+游标对客户端不透明（base64url 编码的 JSON），仅服务端解析
+
+排序键允许为 NULL（数据库结构中 created_at/views 等列可为空）：游标中以 null 表示，
+范围条件按 MySQL 与 SQLite 共同的规则处理——NULL 小于任何值（升序排在最前，降序排在最后）
+"""
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import and_, or_
+
+
+class CursorError(ValueError):
+    """游标无效（格式错误、被篡改或与当前排序方式不匹配）"""
+    pass
+
+
+def encode_cursor(sort: str, key_value, last_id: int) -> str:
+    """
+    编码游标
+    :param sort: 排序方式名称（解析时校验一致）
+    :param key_value: 当前页最后一条记录的排序键值（可为 None）
+    :param last_id: 当前页最后一条记录的ID
+    :return: 游标字符串
+    """
+    if isinstance(key_value, datetime):
+        key_value = key_value.isoformat()
+    elif isinstance(key_value, Decimal):
+        key_value = str(key_value)
+    payload = json.dumps({'s': sort, 'k': key_value, 'i': last_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str, key_type: str):
+    """
+    解析游标
+    :param cursor: 游标字符串
+    :param sort: 当前请求的排序方式
+    :param key_type: 排序键类型（datetime/int/decimal）
+    :return: (排序键值, 最后一条记录ID)，排序键为 NULL 时键值为 None
+    :raises CursorError: 游标无效
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        if not isinstance(payload, dict):
+            raise CursorError('无效的分页游标')
+        if payload.get('s') != sort:
+            raise CursorError('分页游标与排序方式不匹配')
+        last_id = int(payload['i'])
+        raw_value = payload['k']
+        if raw_value is None:
+            key_value = None
+        elif key_type == 'datetime':
+            key_value = datetime.fromisoformat(raw_value)
+        elif key_type == 'decimal':
+            key_value = Decimal(raw_value)
+        else:
+            key_value = int(raw_value)
+        return key_value, last_id
+    except CursorError:
+        raise
+    except (ValueError, TypeError, KeyError, InvalidOperation, UnicodeError):
+        raise CursorError('无效的分页游标')
+
+
+def keyset_condition(key_column, id_column, key_value, last_id, descending: bool):
+    """
+    生成“位于游标之后”的范围条件：(key, id) 按同一方向严格越过游标
+    展开为 key < v OR (key = v AND id < last_id)，便于数据库使用 (key, id) 索引做范围扫描
+    NULL 排序键小于任何值：降序时 NULL 记录排在最后，升序时排在最前
+    """
+    if key_value is None:
+        if descending:
+            # 已进入末尾的 NULL 段，只在 NULL 记录中按 id 继续
+            return and_(key_column.is_(None), id_column < last_id)
+        return or_(key_column.is_not(None), and_(key_column.is_(None), id_column > last_id))
+    if descending:
+        return or_(key_column < key_value, and_(key_column == key_value, id_column < last_id),
+                   key_column.is_(None))
+    return or_(key_column > key_value, and_(key_column == key_value, id_column > last_id))
+
+
+def keyset_order(key_column, id_column, descending: bool) -> list:
+    """游标分页使用的排序表达式：排序键 + id 作为唯一决胜键"""
+    if descending:
+        return [key_column.desc(), id_column.desc()]
+    return [key_column.asc(), id_column.asc()]
@@ -0,0 +1,93 @@
+"""
+后台周期任务调度
+每个任务运行在独立的守护线程中，并在应用上下文内执行（可直接使用 db.session）
+
+任务在应用收到第一个请求时启动（测试模式或 BACKGROUND_JOBS_ENABLED=false 时不启动），
+也可以通过 flask 命令行手动执行单次任务
+"""
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """周期任务"""
+
+    def __init__(self, name: str, interval: float, func):
+        """
+        :param name: 任务名称
+        :param interval: 执行间隔（秒）
+        :param func: 任务函数（无参数）
+        """
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self, app):
+        """在守护线程中周期执行任务"""
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._thread = threading.Thread(
+            target=self._run, args=(app,), name=f'job-{self.name}', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """停止任务"""
+        self._stop_event.set()
+
+    def run_once(self, app):
+        """在应用上下文中执行一次任务"""
+        from app.models import db
+        with app.app_context():
+            try:
+                self.func()
+            except Exception as e:
+                logger.error(f"后台任务 {self.name} 执行失败: {str(e)}")
+            finally:
+                db.session.remove()
+
+    def _run(self, app):
+        while not self._stop_event.wait(self.interval):
+            self.run_once(app)
+
+
+class BackgroundScheduler:
+    """后台任务调度器"""
+
+    def __init__(self):
+        self.tasks = {}
+        self._started = False
+        self._lock = threading.Lock()
+
+    def add_task(self, name: str, interval: float, func):
+        """注册周期任务（同名任务覆盖）"""
+        self.tasks[name] = PeriodicTask(name, interval, func)
+
+    def init_app(self, app):
+        """在应用收到第一个请求时启动所有任务"""
+
+        @app.before_request
+        def _start_background_jobs():
+            if self._started:
+                return
+            if app.testing or not app.config.get('BACKGROUND_JOBS_ENABLED', True):
+                return
+            self.start(app)
+
+    def start(self, app):
+        """启动所有任务（重复调用无副作用）"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for task in self.tasks.values():
+            task.start(app)
+        logger.info(f"后台任务已启动: {', '.join(self.tasks) or '无'}")
+
+
+# 全局调度器实例
+scheduler = BackgroundScheduler()
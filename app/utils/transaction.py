@@ -0,0 +1,80 @@
+"""
+数据库事务重试工具
+MySQL 在并发事务互相等待行锁时会回滚其中一个事务：
+- 1213 死锁（Deadlock found when trying to get lock）
+- 1205 锁等待超时（Lock wait timeout exceeded）
+这两类错误与业务无关，回滚后整体重新执行事务通常即可成功
+
+用法：
+    result = run_in_transaction(lambda: do_work(), name='create_order')
+
+事务函数内部负责提交；遇到可重试错误时回滚会话，按带随机抖动的指数退避等待后重新执行，
+超过最大重试次数后抛出原异常。重试次数记录在 transaction.* 指标中
+重试只用于兜底不可避免的偶发冲突：事务本身应按固定顺序加锁（如下单先按主键顺序扣减库存，
+再写入引用商品的订单明细），同一热点数据的正常并发不应产生死锁
+"""
+import time
+import random
+import logging
+from flask import current_app
+from sqlalchemy.exc import DBAPIError
+
+from app.models import db
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# MySQL 错误码 -> 指标名称
+RETRYABLE_MYSQL_ERRORS = {
+    1213: 'deadlock',
+    1205: 'lock_wait_timeout',
+}
+
+
+def classify_lock_error(exc):
+    """
+    识别可重试的锁冲突错误
+    :return: 'deadlock' / 'lock_wait_timeout'；其他错误返回 None
+    """
+    if not isinstance(exc, DBAPIError) or exc.orig is None:
+        return None
+    args = getattr(exc.orig, 'args', ())
+    if args and isinstance(args[0], int):
+        return RETRYABLE_MYSQL_ERRORS.get(args[0])
+    return None
+
+
+def run_in_transaction(func, name: str = 'transaction', max_retries: int = None):
+    """
+    执行事务函数，锁冲突时回滚并重试
+    :param func: 事务函数（无参数，内部提交事务）
+    :param name: 事务名称（用于日志与指标）
+    :param max_retries: 最大重试次数，默认读取 TX_MAX_RETRIES
+    :return: 事务函数的返回值
+    """
+    if max_retries is None:
+        max_retries = current_app.config.get('TX_MAX_RETRIES', 3)
+    base_delay = current_app.config.get('TX_RETRY_BASE_DELAY', 0.05)
+
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except DBAPIError as e:
+            db.session.rollback()
+            kind = classify_lock_error(e)
+            if kind is None:
+                raise
+            metrics.incr(f'transaction.{kind}')
+            if attempt >= max_retries:
+                metrics.incr('transaction.retry_exhausted')
+                metrics.incr(f'transaction.retry_exhausted.{name}')
+                logger.error(f"事务 {name} 锁冲突（{kind}），重试 {attempt} 次后放弃")
+                raise
+            attempt += 1
+            metrics.incr('transaction.retries')
+            metrics.incr(f'transaction.retries.{name}')
+            # 指数退避 + 全随机抖动，避免冲突事务同时重试再次冲突
+            delay = random.uniform(0, base_delay * (2 ** (attempt - 1)))
+            logger.warning(f"事务 {name} 锁冲突（{kind}），{delay:.3f}s 后第 {attempt} 次重试")
+            time.sleep(delay)
@@ -0,0 +1,156 @@
+"""
+基准测试公共工具
+- make_app：创建指向 SQLite（内存或文件）或 MySQL 的应用并建表
+- seed_catalog：批量写入用户、商品、地址
+- StatementCounter：通过 SQLAlchemy before_cursor_execute 事件统计 SQL 语句数
+- percentile / format_table：结果统计与输出
+
+运行方式（项目根目录）：python -m benchmarks.<脚本名>
+"""
+import math
+import os
+import unicodedata
+import warnings
+
+from sqlalchemy import event
+from sqlalchemy.exc import SAWarning
+
+
+def make_app(database_uri: str = 'sqlite:///:memory:', **config):
+    """
+    创建用于基准测试的应用并建表（关闭后台任务与缓冲，避免干扰计时）
+    :param database_uri: 数据库连接串，默认 SQLite 内存库
+    :param config: 额外的应用配置
+    :return: 已推入应用上下文的应用实例
+    """
+    # 模型关系重叠等既有警告与基准无关，避免淹没输出
+    warnings.filterwarnings('ignore', category=SAWarning)
+    # create_app 在初始化时根据 DATABASE_URI 创建引擎
+    os.environ['DATABASE_URI'] = database_uri
+    from app import create_app, db
+
+    app = create_app()
+    app.config.update({
+        'TESTING': True,
+        'BACKGROUND_JOBS_ENABLED': False,
+        'VIEW_COUNTER_ENABLED': False,
+        'TX_RETRY_BASE_DELAY': 0.01,
+    })
+    app.config.update(config)
+    app.app_context().push()
+
+    if database_uri.startswith('sqlite'):
+        _dedupe_index_names(db.metadata)
+    db.create_all()
+    return app
+
+
+def _dedupe_index_names(metadata):
+    """
+    SQLite 的索引名在整个库内唯一，而 MySQL 只要求表内唯一（如多张表都有 idx_created_at）；
+    建表前为重名索引加上表名前缀
+    """
+    seen = set()
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in seen:
+                index.name = f'{table.name}_{index.name}'
+            seen.add(index.name)
+
+
+def seed_catalog(items: int = 100, sellers: int = 10, buyers: int = 10, stock: int = 1000,
+                 categories=('books', 'electronics', 'daily', 'sports', 'clothing')):
+    """
+    批量写入基准数据
+    :return: {'sellers': [ID], 'buyers': [ID], 'items': [ID], 'addresses': {买家ID: 地址ID}}
+    """
+    from app.models import db, User, Item, Address
+
+    users = [User(username=f'seller{i}', email=f'seller{i}@seu.edu.cn', password_hash='x')
+             for i in range(sellers)]
+    users += [User(username=f'buyer{i}', email=f'buyer{i}@seu.edu.cn', password_hash='x')
+              for i in range(buyers)]
+    db.session.add_all(users)
+    db.session.flush()
+    seller_ids = [user.id for user in users[:sellers]]
+    buyer_ids = [user.id for user in users[sellers:]]
+
+    words = ['计算机', '导论', '教材', '台灯', '耳机', '自行车', '篮球', '外套', '显示器', '键盘']
+    db.session.execute(Item.__table__.insert(), [{
+        'seller_id': seller_ids[i % sellers],
+        'title': f'{words[i % len(words)]}{words[(i // len(words)) % len(words)]} {i}',
+        'description': f'{words[(i * 7) % len(words)]} 九成新 编号{i}',
+        'category': categories[i % len(categories)],
+        'price': 10 + i % 500,
+        'stock': stock,
+        'views': (i * 37) % 1000,
+        'favorites': 0,
+        'is_active': True,
+    } for i in range(items)])
+
+    addresses = [Address(user_id=buyer_id, recipient_name='张三', phone='13800000000', detail='九龙湖校区')
+                 for buyer_id in buyer_ids]
+    db.session.add_all(addresses)
+    db.session.commit()
+
+    item_ids = [row[0] for row in db.session.query(Item.id).order_by(Item.id)]
+    return {
+        'sellers': seller_ids,
+        'buyers': buyer_ids,
+        'items': item_ids,
+        'addresses': {address.user_id: address.id for address in addresses},
+    }
+
+
+class StatementCounter:
+    """统计执行的 SQL 语句（executemany 计为一条，与数据库往返次数一致）"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def by_kind(self) -> dict:
+        """按语句类型（SELECT/INSERT/UPDATE/DELETE）统计"""
+        kinds = {}
+        for statement in self.statements:
+            kind = statement.lstrip().split(None, 1)[0].upper()
+            kinds[kind] = kinds.get(kind, 0) + 1
+        return kinds
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+
+
+def percentile(values, pct: float) -> float:
+    """百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered), math.ceil(pct / 100 * len(ordered))) - 1)
+    return ordered[rank]
+
+
+def format_table(headers, rows) -> str:
+    """输出等宽对齐的文本表格（中文按两个字符宽度计算）"""
+    cells = [[str(h) for h in headers]] + [[str(c) for c in row] for row in rows]
+    widths = [max(_display_width(row[i]) for row in cells) for i in range(len(headers))]
+    lines = ['  '.join(' ' * (width - _display_width(cell)) + cell for cell, width in zip(row, widths))
+             for row in cells]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    return '\n'.join(lines)
+
+
+def _display_width(text: str) -> int:
+    return sum(2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1 for char in text)
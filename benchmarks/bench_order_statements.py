@@ -0,0 +1,133 @@
+"""
+下单语句数微基准
+对比两种订单持久化写法在不同购物车规模下每次结算执行的 SQL 语句数与耗时：
+
+- legacy：逐行 ORM 写法（session.add(order) + flush 取ID、逐个 OrderItem、逐个商品 UPDATE 扣库存，
+  多卖家购物车按卖家拆成多个事务），即批量化之前 create_order 的做法
+- current：OrderService.checkout（Core 批量写入订单与明细、一条 UPDATE ... CASE 扣减库存、单个事务）
+
+SQLite 支持 INSERT ... RETURNING，SQLAlchemy 会把多行 ORM 插入合并为一条语句；
+MySQL 不支持，逐行 ORM 插入每行一次往返。这里关闭 use_insertmanyvalues，让 SQLite 上的统计与 MySQL 一致
+
+用法：python -m benchmarks.bench_order_statements [--repeat 50]
+"""
+import argparse
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import select, update
+
+from benchmarks._support import make_app, seed_catalog, StatementCounter, format_table
+
+# (每个卖家的商品种数, 卖家数)
+SCENARIOS = [(1, 1), (5, 1), (20, 1), (2, 5), (4, 10)]
+
+
+def legacy_create_order(buyer_id, items_data, address_id):
+    """逐行 ORM 写法（单个卖家、单个事务）"""
+    from app.models import db, Address, Item, Order, OrderItem
+    from app.utils.order_number import generate_order_number
+
+    session = db.session
+    address = session.get(Address, address_id)
+    item_ids = [line['item_id'] for line in items_data]
+    all_items = {item.id: item for item in session.execute(select(Item).where(Item.id.in_(item_ids))).scalars()}
+
+    total_amount = sum((Decimal(str(all_items[line['item_id']].price)) * line['quantity'] for line in items_data),
+                       Decimal('0.00'))
+    order = Order(
+        order_number=generate_order_number(), buyer_id=buyer_id, total_amount=total_amount,
+        seller_id=all_items[item_ids[0]].seller_id, address_id=address_id, status='pending',
+        shipping_address=address.detail, total_price=total_amount, remarks='',
+        created_at=datetime.now(), updated_at=datetime.now()
+    )
+    session.add(order)
+    session.flush()
+
+    for line in items_data:
+        session.add(OrderItem(order_id=order.id, item_id=line['item_id'], quantity=line['quantity'],
+                              unit_price=all_items[line['item_id']].price, created_at=datetime.now()))
+    session.flush()
+
+    for line in sorted(items_data, key=lambda line: line['item_id']):
+        stmt = update(Item).where(
+            Item.id == line['item_id'], Item.stock >= line['quantity'], Item.is_active.is_(True)
+        ).values(stock=Item.stock - line['quantity'], updated_at=datetime.now())
+        session.execute(stmt, execution_options={'synchronize_session': False})
+    session.commit()
+
+
+def legacy_checkout(buyer_id, items_data, address_id):
+    """多卖家购物车：每个卖家单独下单"""
+    from app.models import db, Item
+    seller_of = dict(db.session.query(Item.id, Item.seller_id).filter(
+        Item.id.in_([line['item_id'] for line in items_data])))
+    groups = {}
+    for line in items_data:
+        groups.setdefault(seller_of[line['item_id']], []).append(line)
+    for lines in groups.values():
+        legacy_create_order(buyer_id, lines, address_id)
+
+
+def current_checkout(buyer_id, items_data, address_id):
+    """批量写法"""
+    from app.services.order_service import OrderService
+    success, result = OrderService.checkout(buyer_id, items_data, address_id)
+    assert success, result
+
+
+def build_cart(catalog, lines_per_seller, sellers, offset):
+    """从每个卖家各取若干商品组成购物车"""
+    seller_count = len(catalog['sellers'])
+    items = catalog['items']
+    cart = []
+    for s in range(sellers):
+        for k in range(lines_per_seller):
+            # seed_catalog 中第 i 个商品属于第 i % seller_count 个卖家
+            index = (offset + k) * seller_count + s
+            cart.append({'item_id': items[index % len(items)], 'quantity': 1})
+    return cart
+
+
+def run(repeat: int):
+    from app.models import db
+
+    make_app()
+    db.engine.dialect.use_insertmanyvalues = False
+    catalog = seed_catalog(items=2000, sellers=10, buyers=1, stock=100000)
+    buyer_id = catalog['buyers'][0]
+    address_id = catalog['addresses'][buyer_id]
+
+    rows = []
+    for lines_per_seller, sellers in SCENARIOS:
+        result = [f'{lines_per_seller}x{sellers}']
+        for checkout in (legacy_checkout, current_checkout):
+            cart = build_cart(catalog, lines_per_seller, sellers, 0)
+            with StatementCounter(db.engine) as counter:
+                checkout(buyer_id, cart, address_id)
+            statements = counter.count
+
+            start = time.perf_counter()
+            for i in range(repeat):
+                checkout(buyer_id, build_cart(catalog, lines_per_seller, sellers, i + 1), address_id)
+            elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+            result += [statements, round(statements / sellers, 1), f'{elapsed_ms:.2f}']
+        rows.append(result)
+
+    print(format_table(
+        ['购物车(种数x卖家)', 'legacy语句', 'legacy语句/订单', 'legacy ms',
+         'current语句', 'current语句/订单', 'current ms'],
+        rows
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='下单语句数微基准')
+    parser.add_argument('--repeat', type=int, default=50, help='每种场景计时的结算次数')
+    args = parser.parse_args()
+    run(args.repeat)
+
+
+if __name__ == '__main__':
+    main()
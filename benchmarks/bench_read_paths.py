@@ -0,0 +1,147 @@
+"""
+商品读接口基准
+对不同规模的商品库（默认 1k/10k，可加 100k）逐个调用读接口，统计每次请求执行的 SQL 语句数与耗时：
+
+- POST /api/item/getFeatured
+- POST /api/item/search：type（title/seller/category）× sort（latest/popular/price-asc/price-desc/relevance）全部组合
+- GET  /api/item/getDetail/<id>
+
+每个场景先不计时地请求一次（预热语句编译缓存、倒排索引同步等一次性开销），再计时 --repeat 次。
+默认关闭接口响应缓存与业务数据缓存（TTL 置 0），每次请求都走数据库，反映真实的查询路径；
+--cached 时保留缓存，反映缓存命中后的开销
+
+每个接口有语句数预算（QUERY_BUDGETS）：语句数与商品库规模、分页大小无关，
+逐条查询卖家/评分之类的 N+1 回归会直接超出预算，脚本以退出码 1 结束，可用于 CI；
+--max-p95-ms 可额外设置耗时上限（与机器相关，默认不检查）
+
+用法：
+    python -m benchmarks.bench_read_paths
+    python -m benchmarks.bench_read_paths --sizes 1000,10000,100000 --repeat 50
+    python -m benchmarks.bench_read_paths --search-index --cached
+"""
+import argparse
+import random
+import time
+
+from benchmarks._support import make_app, seed_catalog, StatementCounter, percentile, format_table
+
+SEARCH_TYPES = ['title', 'seller', 'category']
+SEARCH_SORTS = ['latest', 'popular', 'price-asc', 'price-desc', 'relevance']
+# 各搜索类型使用的关键词（与 seed_catalog 生成的数据对应）
+SEARCH_KEYWORDS = {'title': '耳机', 'seller': 'seller1', 'category': 'books'}
+
+# 每次请求允许执行的最多 SQL 语句数（不使用缓存时）
+QUERY_BUDGETS = {
+    'getFeatured': 3,
+    'search': 4,
+    'getDetail': 4,
+}
+
+
+def build_cases(item_ids, rng, detail_samples: int):
+    """生成 (接口名, 场景名, 请求函数) 列表"""
+    cases = [('getFeatured', 'limit=12', lambda client: client.post('/api/item/getFeatured', json={'limit': 12}))]
+    for search_type in SEARCH_TYPES:
+        for sort in SEARCH_SORTS:
+            body = {'query': SEARCH_KEYWORDS[search_type], 'type': search_type, 'sort': sort, 'page': 1, 'limit': 12}
+            cases.append(('search', f'{search_type}/{sort}',
+                          lambda client, body=body: client.post('/api/item/search', json=body)))
+    detail_ids = rng.sample(item_ids, min(detail_samples, len(item_ids)))
+    cases.append(('getDetail', f'{len(detail_ids)}个商品',
+                  lambda client: client.get(f'/api/item/getDetail/{rng.choice(detail_ids)}')))
+    return cases
+
+
+def run_size(size: int, args):
+    """建库、写入指定规模的商品后逐个场景计时，返回结果行与超出预算的场景"""
+    from app.models import db
+
+    config = {}
+    if not args.cached:
+        config.update({
+            'RESPONSE_CACHE_ENABLED': False,
+            'ITEM_DETAIL_CACHE_TTL': 0,
+            'ITEM_COUNT_CACHE_TTL': 0,
+            'FEATURED_MAX_STALENESS': 0,
+        })
+    if args.search_index:
+        config.update({'ITEM_SEARCH_INDEX': True, 'ITEM_SEARCH_INDEX_SYNC_INTERVAL': 3600})
+    app = make_app(**config)
+    catalog = seed_catalog(items=size, sellers=args.sellers, buyers=1)
+    if args.search_index:
+        from app.services.item_index import item_index
+        item_index.build()
+    from app.utils.cache import response_cache, data_cache
+    response_cache.clear()
+    data_cache.clear()
+
+    client = app.test_client()
+    rng = random.Random(args.seed)
+    rows = []
+    violations = []
+    for endpoint, scenario, send in build_cases(catalog['items'], rng, args.repeat):
+        send(client)
+        statements = []
+        latencies = []
+        for _ in range(args.repeat):
+            with StatementCounter(db.engine) as counter:
+                start = time.perf_counter()
+                response = send(client)
+                latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200 and response.get_json()['code'] == 0, response.get_data(as_text=True)
+            statements.append(counter.count)
+
+        max_statements = max(statements)
+        p95 = percentile(latencies, 95)
+        over_budget = not args.cached and max_statements > QUERY_BUDGETS[endpoint]
+        too_slow = args.max_p95_ms is not None and p95 > args.max_p95_ms
+        if over_budget or too_slow:
+            violations.append(f'{size} {endpoint} {scenario}: 语句数 {max_statements}'
+                              f'（预算 {QUERY_BUDGETS[endpoint]}），p95 {p95:.2f}ms')
+        rows.append([size, endpoint, scenario, min(statements), max_statements,
+                     f'{percentile(latencies, 50):.2f}', f'{p95:.2f}', f'{max(latencies):.2f}',
+                     '超出' if over_budget or too_slow else ''])
+    db.session.remove()
+    return rows, violations
+
+
+def run(args):
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    rows = []
+    violations = []
+    for size in sizes:
+        size_rows, size_violations = run_size(size, args)
+        rows += size_rows
+        violations += size_violations
+
+    print(f"商品规模: {args.sizes}  每场景请求数: {args.repeat}  缓存: {'开启' if args.cached else '关闭'}  "
+          f"倒排索引: {'开启' if args.search_index else '关闭'}")
+    print(format_table(
+        ['商品数', '接口', '场景', '最少语句', '最多语句', 'p50(ms)', 'p95(ms)', 'max(ms)', '预算'],
+        rows
+    ))
+    print()
+    if violations:
+        print(f'{len(violations)} 个场景超出预算：')
+        for violation in violations:
+            print(f'  {violation}')
+    else:
+        print('全部场景均在预算内')
+    return not violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='商品读接口基准')
+    parser.add_argument('--sizes', default='1000,10000', help='商品库规模，逗号分隔（如 1000,10000,100000）')
+    parser.add_argument('--repeat', type=int, default=20, help='每个场景计时的请求数')
+    parser.add_argument('--sellers', type=int, default=50, help='卖家数')
+    parser.add_argument('--cached', action='store_true', help='保留接口响应缓存与业务数据缓存（不检查语句数预算）')
+    parser.add_argument('--search-index', action='store_true', help='启用商品倒排索引')
+    parser.add_argument('--max-p95-ms', type=float, help='单个场景 p95 耗时上限（毫秒），超出时退出码为 1')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+    raise SystemExit(0 if run(args) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -45,9 +45,14 @@ CREATE TABLE IF NOT EXISTS items (
     KEY idx_seller_id (seller_id) COMMENT '卖家索引',
     KEY idx_category (category) COMMENT '分类索引',
     KEY idx_price (price) COMMENT '价格索引',
+    KEY idx_views (views) COMMENT '浏览量索引（热门排序/游标分页）',
     KEY idx_created_at (created_at) COMMENT '创建时间索引',
-    FULLTEXT KEY idx_title_description (title, description) COMMENT '全文搜索索引'
+    KEY idx_updated_at (updated_at) COMMENT '更新时间索引（倒排索引增量同步）',
+    FULLTEXT KEY idx_title_description (title, description) WITH PARSER ngram COMMENT '全文搜索索引（ngram分词，支持中文）'
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='商品表';
+-- 已有数据库升级全文索引为 ngram 分词器：
+-- ALTER TABLE items DROP INDEX idx_title_description,
+--     ADD FULLTEXT KEY idx_title_description (title, description) WITH PARSER ngram;
 
 
 -- =========================================
@@ -64,6 +69,8 @@ CREATE TABLE IF NOT EXISTS orders (
     
     FOREIGN KEY (buyer_id) REFERENCES users(id) ON DELETE CASCADE COMMENT '外键：买家',
     KEY idx_buyer_id (buyer_id) COMMENT '买家索引',
+    KEY idx_buyer_created_at (buyer_id, created_at, id) COMMENT '买家订单列表游标分页索引',
+    KEY idx_buyer_status (buyer_id, status, total_amount) COMMENT '买家订单统计覆盖索引',
     KEY idx_status (status) COMMENT '状态索引',
     KEY idx_created_at (created_at) COMMENT '创建时间索引'
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='订单表';
@@ -125,5 +132,46 @@ CREATE TABLE IF NOT EXISTS reviews (
     FOREIGN KEY (reviewer_id) REFERENCES users(id) COMMENT '外键：评价者',
     FOREIGN KEY (reviewee_id) REFERENCES users(id) COMMENT '外键：被评价者',
     KEY idx_item_id (item_id) COMMENT '商品索引',
-    KEY idx_reviewer_id (reviewer_id) COMMENT '评价者索引'
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='评价表';
\ No newline at end of file
+    KEY idx_reviewer_id (reviewer_id) COMMENT '评价者索引',
+    KEY idx_reviewee_id (reviewee_id) COMMENT '被评价者索引（卖家评分聚合）'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='评价表';
+
+
+-- =========================================
+-- 7. 用户评分汇总表 (User_Ratings)
+-- =========================================
+-- 创建评价时在同一事务内增量维护；可执行 flask rebuild-ratings 从 reviews 表重建
+CREATE TABLE IF NOT EXISTS user_ratings (
+    user_id INT PRIMARY KEY COMMENT '被评价用户ID',
+    rating_sum INT NOT NULL DEFAULT 0 COMMENT '评分总和',
+    rating_count INT NOT NULL DEFAULT 0 COMMENT '评价数量',
+    positive_count INT NOT NULL DEFAULT 0 COMMENT '好评数量（4星及以上）',
+    star_1_count INT NOT NULL DEFAULT 0 COMMENT '1星评价数量',
+    star_2_count INT NOT NULL DEFAULT 0 COMMENT '2星评价数量',
+    star_3_count INT NOT NULL DEFAULT 0 COMMENT '3星评价数量',
+    star_4_count INT NOT NULL DEFAULT 0 COMMENT '4星评价数量',
+    star_5_count INT NOT NULL DEFAULT 0 COMMENT '5星评价数量',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE COMMENT '外键：用户'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='用户评分汇总表';
+
+
+-- =========================================
+-- 8. 库存预留表 (Stock_Reservations)
+-- =========================================
+-- 结算页检查库存时可预留：预留数量已从 items.stock 扣除，下单时消费，过期后归还库存并删除
+CREATE TABLE IF NOT EXISTS stock_reservations (
+    id INT PRIMARY KEY AUTO_INCREMENT COMMENT '预留ID',
+    buyer_id INT NOT NULL COMMENT '买家ID',
+    item_id INT NOT NULL COMMENT '商品ID',
+    quantity INT NOT NULL COMMENT '预留数量',
+    expires_at DATETIME NOT NULL COMMENT '过期时间',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+
+    FOREIGN KEY (buyer_id) REFERENCES users(id) ON DELETE CASCADE COMMENT '外键：买家',
+    FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE COMMENT '外键：商品',
+    UNIQUE KEY uk_buyer_item (buyer_id, item_id) COMMENT '每个买家每件商品一条预留',
+    KEY idx_item_expires (item_id, expires_at) COMMENT '按商品清理过期预留',
+    KEY idx_expires_at (expires_at) COMMENT '过期预留扫描'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='库存预留表';
@@ -12,8 +12,9 @@ from datetime import datetime
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 from app import create_app, db
-from app.models import User, Item, Order, OrderItem, Address, Review
+from app.models import User, Item, Order, OrderItem, Address, Review, UserRating, StockReservation
 from app.utils.password_helper import PasswordHelper
+from benchmarks._support import StatementCounter
 
 
 @pytest.fixture(scope='session')
@@ -30,6 +31,12 @@ def app():
     app.config['TESTING'] = True
     app.config['WTF_CSRF_ENABLED'] = False  # 测试中禁用CSRF
     app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+    app.config['ITEM_COUNT_CACHE_TTL'] = 0  # 测试直接改写数据库，不缓存搜索总数
+    app.config['USER_STATS_CACHE_TTL'] = 0  # 同上，不缓存用户统计
+    app.config['RESPONSE_CACHE_ENABLED'] = False  # 同上，不缓存接口响应
+    app.config['ITEM_DETAIL_CACHE_TTL'] = 0  # 同上，不缓存商品详情
+    app.config['FEATURED_MAX_STALENESS'] = 0  # 同上，每次请求重算推荐榜单
+    app.config['VIEW_COUNTER_ENABLED'] = False  # 浏览量直接写库，避免进程内缓冲在用例间残留
     
     # 创建应用上下文
     with app.app_context():
@@ -58,6 +65,18 @@ def runner(app):
     return app.test_cli_runner()
 
 
+@pytest.fixture(scope='function')
+def statement_counter(app):
+    """
+    SQL 语句计数器（复用基准测试的 StatementCounter，executemany 计为一条）
+    用法：
+        with statement_counter() as counter:
+            ...
+        assert counter.count == 1
+    """
+    return lambda: StatementCounter(db.engine)
+
+
 @pytest.fixture
 def init_database(app):
     """
@@ -67,6 +86,8 @@ def init_database(app):
     with app.app_context():
         # 清空现有数据
         db.session.query(Review).delete()
+        db.session.query(UserRating).delete()
+        db.session.query(StockReservation).delete()
         db.session.query(OrderItem).delete()
         db.session.query(Order).delete()
         db.session.query(Address).delete()
@@ -146,6 +167,8 @@ def init_database(app):
         
         # 清理数据库
         db.session.query(Review).delete()
+        db.session.query(UserRating).delete()
+        db.session.query(StockReservation).delete()
         db.session.query(OrderItem).delete()
         db.session.query(Order).delete()
         db.session.query(Address).delete()
@@ -311,3 +311,49 @@ class TestCartSession:
         
         # 检查响应中是否包含提示使用sessionStorage的信息
         assert response.status_code in [200, 400]
+    
+    def test_get_cart_refreshes_in_one_query(self, client, app, init_database, auth_headers, statement_counter):
+        """测试获取购物车一次查询刷新价格与库存，并同时返回统计"""
+        from app.models import db
+        item1, item2 = init_database['items']  # price=45.50 stock=5, price=5999.99 stock=1
+        item1_id, item2_id = item1.id, item2.id
+        client.post('/api/cart/addCart', json={'itemId': item1_id, 'quantity': 2}, headers=auth_headers)
+        client.post('/api/cart/addCart', json={'itemId': item2_id, 'quantity': 1}, headers=auth_headers)
+        
+        # 加入购物车后商品改价、售罄
+        db.session.query(Item).filter(Item.id == item1_id).update({'price': 40})
+        db.session.query(Item).filter(Item.id == item2_id).update({'stock': 0})
+        db.session.commit()
+        
+        with statement_counter() as counter:
+            response = client.post('/api/cart/getCart', json={}, headers=auth_headers)
+        
+        lines = json.loads(response.data)['data']
+        assert [(line['item_id'], line['price'], line['available']) for line in lines] == [
+            (item1_id, 40.0, True), (item2_id, 5999.99, False)
+        ]
+        assert counter.count == 1
+        
+        stats = json.loads(client.post('/api/cart/getStats', json={}).data)['data']
+        assert stats == {'item_count': 2, 'total_quantity': 2, 'total_amount': 80.0, 'unavailable_count': 1}
+
+    def test_default_secret_key_rejected_outside_testing(self, client, app, init_database, auth_headers, monkeypatch):
+        """测试未配置 SECRET_KEY 时，非调试/测试模式下只有读写 Session 的接口拒绝服务"""
+        from app import DEV_SECRET_KEY
+        from app.utils.response import APIResponse
+        monkeypatch.setitem(app.config, 'SECRET_KEY', DEV_SECRET_KEY)
+        monkeypatch.setitem(app.config, 'TESTING', False)
+        monkeypatch.setattr(app, 'debug', False)
+
+        response = client.post('/api/cart/getCart', json={})
+        assert json.loads(response.data)['code'] == APIResponse.SERVER_ERROR
+        response = client.post('/orders/checkout', json={'address_id': init_database['addresses'][0].id},
+                               headers=auth_headers)
+        assert json.loads(response.data)['code'] == APIResponse.SERVER_ERROR
+        # 不使用 Session 的接口不受影响
+        response = client.post('/api/item/getFeatured', json={'limit': 2})
+        assert response.status_code == 200
+
+        monkeypatch.setitem(app.config, 'SECRET_KEY', 'configured-secret-key')
+        response = client.post('/api/cart/getCart', json={})
+        assert response.status_code == 200
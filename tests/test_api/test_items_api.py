@@ -143,7 +143,205 @@ class TestItemSearch:
         data = json.loads(response.data)
         assert data['code'] == 0
         assert 'pagination' in data['data']
+    
+    def test_search_cursor_pagination(self, client, app, init_database):
+        """测试游标分页：逐页遍历不重复、不遗漏，且不返回总数"""
+        seen_ids = []
+        cursor = ''
+        while True:
+            response = client.post('/api/item/search',
+                json={'query': '', 'sort': 'price-asc', 'limit': 1, 'cursor': cursor},
+                content_type='application/json'
+            )
+            data = json.loads(response.data)
+            assert data['code'] == 0
+            pagination = data['data']['pagination']
+            assert 'total_items' not in pagination
+            seen_ids.extend(item['id'] for item in data['data']['items'])
+            if not pagination['has_more']:
+                break
+            cursor = pagination['next_cursor']
+        
+        expected_ids = [item.id for item in sorted(init_database['items'], key=lambda i: i.price)]
+        assert seen_ids == expected_ids
+    
+    def test_search_response_cached(self, client, app, init_database):
+        """测试搜索响应按请求体缓存，不同请求体互不影响"""
+        from app.utils.cache import response_cache
+        response_cache.clear()
+        app.config['RESPONSE_CACHE_ENABLED'] = True
+        try:
+            first = client.post('/api/item/search', json={'query': '计算机', 'page': 1})
+            hits_before = response_cache.stats()['hits']
+            second = client.post('/api/item/search', json={'page': 1, 'query': '计算机'})
+            assert response_cache.stats()['hits'] == hits_before + 1
+            assert second.status_code == 200
+            assert json.loads(second.data)['data'] == json.loads(first.data)['data']
+            
+            other = client.post('/api/item/search', json={'query': 'MacBook', 'page': 1})
+            assert response_cache.stats()['hits'] == hits_before + 1
+            assert json.loads(other.data)['data']['items'][0]['title'] == 'MacBook Pro'
+        finally:
+            app.config['RESPONSE_CACHE_ENABLED'] = False
+            response_cache.clear()
+    
+    def test_cached_search_invalidated_by_order(self, client, app, init_database):
+        """测试下单扣减库存后，包含该商品的缓存搜索结果失效"""
+        from app.services.order_service import OrderService
+        from app.utils.cache import response_cache
+        item = init_database['items'][0]  # stock=5
+        buyer = init_database['users'][1]
+        address = init_database['addresses'][0]
+        response_cache.clear()
+        app.config['RESPONSE_CACHE_ENABLED'] = True
+        try:
+            body = {'query': '计算机', 'page': 1}
+            data = json.loads(client.post('/api/item/search', json=body).data)
+            assert data['data']['items'][0]['stock'] == 5
+            
+            success, _ = OrderService.create_order(buyer.id, [{'item_id': item.id, 'quantity': 2}], address.id)
+            assert success
+            
+            data = json.loads(client.post('/api/item/search', json=body).data)
+            assert data['data']['items'][0]['stock'] == 3
+        finally:
+            app.config['RESPONSE_CACHE_ENABLED'] = False
+            response_cache.clear()
+    
+    def test_search_invalid_cursor(self, client, app, init_database):
+        """测试无效游标返回错误"""
+        response = client.post('/api/item/search',
+            json={'query': '', 'cursor': 'not-a-cursor'},
+            content_type='application/json'
+        )
+        
+        assert response.status_code == 400
+    
+    def test_search_count_mode(self, client, app, init_database):
+        """测试估算计数模式（SQLite 不支持估算，退回精确计数）"""
+        response = client.post('/api/item/search',
+            json={'query': '', 'countMode': 'estimate'},
+            content_type='application/json'
+        )
+        
+        data = json.loads(response.data)
+        pagination = data['data']['pagination']
+        assert pagination['total_items'] == 2
+        assert pagination['total_is_estimate'] is False
+    
+    def test_search_matches_description(self, client, app, init_database):
+        """测试关键词同时检索商品描述"""
+        response = client.post('/api/item/search',
+            json={
+                'query': '9成新',
+                'type': 'title'
+            },
+            content_type='application/json'
+        )
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        titles = [item['title'] for item in data['data']['items']]
+        assert titles == ['MacBook Pro']
+    
+    def test_search_sort_by_relevance(self, client, app, init_database):
+        """测试按相关度排序"""
+        response = client.post('/api/item/search',
+            json={
+                'query': '新',
+                'type': 'title',
+                'sort': 'relevance'
+            },
+            content_type='application/json'
+        )
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['code'] == 0
+        assert len(data['data']['items']) == 2
+
+    
+    def test_search_with_inverted_index(self, client, app, init_database, monkeypatch):
+        """测试启用内存倒排索引后的关键词搜索及增量更新"""
+        from app.services.item_index import item_index
+        from app.services.item_service import ItemService
+        
+        app.config['ITEM_SEARCH_INDEX'] = True
+        # 关闭检索前的增量同步，确保由删除商品的提交后处理更新索引
+        monkeypatch.setitem(app.config, 'ITEM_SEARCH_INDEX_SYNC_INTERVAL', 3600)
+        try:
+            with app.app_context():
+                item_index.build()
+                # 删除商品后应立即从索引中移除
+                item = init_database['items'][1]
+                assert ItemService.delete_item(item.id, init_database['users'][0].id)['success']
+                assert item.id not in item_index.search('macbook')
+            
+            response = client.post('/api/item/search',
+                json={'query': '导论', 'type': 'title', 'sort': 'relevance'},
+                content_type='application/json'
+            )
+            data = json.loads(response.data)
+            assert [i['title'] for i in data['data']['items']] == ['计算机导论']
+            
+            response = client.post('/api/item/search',
+                json={'query': 'macbook', 'type': 'title'},
+                content_type='application/json'
+            )
+            data = json.loads(response.data)
+            assert data['data']['items'] == []
+        finally:
+            app.config['ITEM_SEARCH_INDEX'] = False
+    
+    def test_inverted_index_sync_overlap(self, app, init_database):
+        """测试增量同步回退同步点：updated_at 早于上次同步、但之后才提交的写入仍会被拉取"""
+        from datetime import datetime, timedelta
+        from app.services.item_index import item_index
+        item = init_database['items'][0]
+        
+        item_index.build()
+        # 模拟其他进程的长事务：updated_at 取自事务开始时间（早于同步点），在同步之后才提交
+        started = datetime.now() - timedelta(seconds=5)
+        item_index.sync()
+        item.title = '显示器支架'
+        item.updated_at = started
+        db.session.commit()
+        
+        item_index.sync()
+        assert item.id in item_index.search('支架')
 
+    
+    def test_listing_query_count_independent_of_page_size(self, client, app, init_database, statement_counter):
+        """测试商品列表（搜索/分类/推荐）的语句数不随每页商品数、卖家数增长（卖家与评分批量查询）"""
+        from app.models import User
+        sellers = [User(username=f'bookseller{i}', email=f'bookseller{i}@seu.edu.cn', password_hash='x', is_active=True)
+                   for i in range(6)]
+        db.session.add_all(sellers)
+        db.session.flush()
+        db.session.add_all([
+            Item(seller_id=sellers[i % len(sellers)].id, title=f'二手书{i}', description='九成新', category='books',
+                 price=10 + i, stock=1, is_active=True)
+            for i in range(12)
+        ])
+        db.session.commit()
+        
+        listings = {
+            'search': lambda limit: client.post('/api/item/search',
+                                                json={'query': '二手书', 'type': 'title', 'page': 1, 'limit': limit}),
+            'getByCategory': lambda limit: client.post('/api/item/getByCategory/books', json={'page': 1, 'limit': limit}),
+            'getFeatured': lambda limit: client.post('/api/item/getFeatured', json={'limit': limit}),
+        }
+        for name, send in listings.items():
+            counts = {}
+            for limit in (1, 12):
+                with statement_counter() as counter:
+                    response = send(limit)
+                data = json.loads(response.data)['data']
+                cards = data if name == 'getFeatured' else data['items']
+                assert len(cards) == limit, name
+                assert len({card['seller_id'] for card in cards}) == min(limit, len(sellers)), name
+                counts[limit] = counter.count
+            assert counts[1] == counts[12], name
 
 class TestItemFeatured:
     """首页推荐API测试"""
@@ -172,7 +370,51 @@ class TestItemFeatured:
         assert response.status_code == 200
         data = json.loads(response.data)
         assert data['code'] == 0
-
+    
+    def test_featured_served_from_leaderboard(self, client, app, init_database):
+        """测试推荐商品读取预计算榜单，商品下架后榜单失效"""
+        from app.services.item_service import ItemService
+        from app.utils.cache import data_cache
+        item1, item2 = init_database['items']
+        seller = init_database['users'][0]
+        app.config['FEATURED_MAX_STALENESS'] = 60
+        try:
+            item1.views = 10
+            db.session.commit()
+            ItemService.refresh_featured()
+            # 榜单生成后浏览量变化，在陈旧时间内仍返回榜单内容
+            item2.views = 100
+            db.session.commit()
+            data = json.loads(client.post('/api/item/getFeatured', json={'limit': 2}).data)
+            assert [card['id'] for card in data['data']] == [item1.id, item2.id]
+            
+            assert ItemService.delete_item(item1.id, seller.id)['success']
+            data = json.loads(client.post('/api/item/getFeatured', json={'limit': 2}).data)
+            assert [card['id'] for card in data['data']] == [item2.id]
+        finally:
+            app.config['FEATURED_MAX_STALENESS'] = 0
+            data_cache.clear()
+    
+    def test_featured_refreshed_after_stock_change(self, client, app, init_database, monkeypatch):
+        """测试榜单内商品被下单后，榜单中的库存立即更新"""
+        from app.services.item_service import ItemService
+        from app.services.order_service import OrderService
+        from app.utils.cache import data_cache
+        item = init_database['items'][0]  # stock=5
+        buyer_id = init_database['users'][1].id
+        address_id = init_database['addresses'][0].id
+        monkeypatch.setitem(app.config, 'FEATURED_MAX_STALENESS', 60)
+        try:
+            ItemService.refresh_featured()
+            data = json.loads(client.post('/api/item/getFeatured', json={'limit': 2}).data)
+            assert {card['id']: card['stock'] for card in data['data']}[item.id] == 5
+            
+            success, result = OrderService.create_order(buyer_id, [{'item_id': item.id, 'quantity': 2}], address_id)
+            assert success, result
+            data = json.loads(client.post('/api/item/getFeatured', json={'limit': 2}).data)
+            assert {card['id']: card['stock'] for card in data['data']}[item.id] == 3
+        finally:
+            data_cache.clear()
 
 class TestItemDetail:
     """商品详情API测试"""
@@ -191,6 +433,46 @@ class TestItemDetail:
         assert data['data']['id'] == item.id
         assert data['data']['title'] == '计算机导论'
     
+    def test_item_views_buffered(self, client, app, init_database):
+        """测试浏览量先进入缓冲区，批量写回后落库，并更新待写回次数与写回延迟指标"""
+        from app.services.view_counter import view_counter
+        from app.utils.metrics import metrics
+        item = init_database['items'][0]
+        views_before = item.views or 0
+        app.config['VIEW_COUNTER_ENABLED'] = True
+        try:
+            client.get(f'/api/item/getDetail/{item.id}')
+            response = client.get(f'/api/item/getDetail/{item.id}')
+            data = json.loads(response.data)
+            # 第二次访问能看到第一次尚未写回的浏览量
+            assert data['data']['views'] == views_before + 1
+            assert db.session.get(Item, item.id).views == views_before
+            assert metrics.get('view_counter.pending') == 2
+            assert metrics.get('view_counter.flush_lag_seconds', None) >= 0
+            
+            assert view_counter.flush() == 2
+            db.session.expire_all()
+            assert db.session.get(Item, item.id).views == views_before + 2
+            assert view_counter.pending(item.id) == 0
+            assert metrics.get('view_counter.pending') == 0
+            assert metrics.get('view_counter.flush_lag_seconds') == 0
+        finally:
+            app.config['VIEW_COUNTER_ENABLED'] = False
+            view_counter.flush()
+    
+    def test_item_detail_cache_invalidated_on_update(self, client, app, init_database, auth_headers):
+        """测试商品更新后详情缓存失效"""
+        from app.services.item_service import ItemService
+        item = init_database['items'][0]
+        seller = init_database['users'][0]
+        app.config['ITEM_DETAIL_CACHE_TTL'] = 300
+        try:
+            assert ItemService.get_item_detail(item.id)['data']['price'] == 45.5
+            assert ItemService.update_item(item.id, seller.id, {'price': 39.9})['success']
+            assert ItemService.get_item_detail(item.id)['data']['price'] == 39.9
+        finally:
+            app.config['ITEM_DETAIL_CACHE_TTL'] = 0
+    
     def test_get_nonexistent_item(self, client, app):
         """测试获取不存在的商品"""
         response = client.get('/api/item/getDetail/99999',
@@ -221,6 +503,36 @@ class TestItemCategory:
         assert data['code'] == 0
 
 
+    def test_category_pages_refreshed_after_update_and_delete(self, client, app, init_database, monkeypatch):
+        """测试商品改分类、下架后，未包含该商品的分类分页缓存同样失效（总数与分页边界更新）"""
+        from app.services.item_service import ItemService
+        from app.utils.cache import response_cache
+        item1, item2 = init_database['items']  # books / electronics
+        seller = init_database['users'][0]
+        monkeypatch.setitem(app.config, 'RESPONSE_CACHE_ENABLED', True)
+        response_cache.clear()
+
+        def books_page(page):
+            response = client.post('/api/item/getByCategory/books', json={'page': page, 'limit': 1})
+            return json.loads(response.data)['data']
+
+        # item2 改为 books 分类：books 第 1 页（最新的 item2）与第 2 页（item1）
+        assert ItemService.update_item(item2.id, seller.id, {'category': 'books'})['success']
+        assert [card['id'] for card in books_page(2)['items']] == [item1.id]
+        assert books_page(2)['pagination']['total_items'] == 2
+
+        # 下架第 1 页的 item2：第 2 页缓存不含该商品，仍需失效
+        assert ItemService.delete_item(item2.id, seller.id)['success']
+        assert books_page(2)['items'] == []
+        assert books_page(2)['pagination']['total_items'] == 1
+
+        # item1 改为其他分类：原分类 books 的列表失效
+        assert [card['id'] for card in books_page(1)['items']] == [item1.id]
+        assert ItemService.update_item(item1.id, seller.id, {'category': 'electronics'})['success']
+        assert books_page(1)['items'] == []
+        response_cache.clear()
+
+
 class TestItemPublish:
     """发布商品API测试"""
     
@@ -337,3 +649,75 @@ class TestItemStockCheck:
         
         # 可能返回200或404取决于端点是否实现
         assert response.status_code in [200, 404, 400]
+
+    def test_check_stock_single_query(self, client, app, init_database, statement_counter):
+        """测试批量检查库存只查询一次商品表"""
+        item1_id, item2_id = [item.id for item in init_database['items']]  # stock=5, stock=1
+        with statement_counter() as counter:
+            response = client.post('/api/item/checkStock', json=[
+                {'itemId': item1_id, 'quantity': 2},
+                {'itemId': item2_id, 'quantity': 2},
+                {'itemId': item2_id, 'quantity': 0},
+                {'itemId': 999999, 'quantity': 1}
+            ])
+
+        data = json.loads(response.data)['data']
+        assert data['valid'] is False
+        assert [(r['available'], r['stock']) for r in data['items']] == [
+            (True, 5), (False, 1), (False, 1), (False, 0)
+        ]
+        assert counter.count == 1
+
+    def test_check_stock_reserve(self, client, app, init_database):
+        """测试预留库存：其他买家看到的库存减少，下单时消费预留且不重复扣减"""
+        from app.services.order_service import OrderService
+        from app.utils.jwt_helper import generate_token
+        item = init_database['items'][0]  # stock=5
+        buyer = init_database['users'][1]
+        headers = {'Authorization': f'Bearer {generate_token(user_id=buyer.id)}'}
+        body = {'items': [{'itemId': item.id, 'quantity': 3}], 'reserve': True}
+
+        # 未登录不能预留
+        response = client.post('/api/item/checkStock', json=body)
+        assert json.loads(response.data)['code'] != 0
+
+        response = client.post('/api/item/checkStock', json=body, headers=headers)
+        data = json.loads(response.data)['data']
+        assert data['valid'] is True
+        assert data['reservation']['items'] == [{'itemId': item.id, 'quantity': 3}]
+
+        # 重复预留替换旧预留；本人可用库存包含自己的预留
+        response = client.post('/api/item/checkStock', json=body, headers=headers)
+        assert json.loads(response.data)['data']['items'][0]['stock'] == 5
+        db.session.expire_all()
+        assert db.session.get(Item, item.id).stock == 2
+
+        # 下单数量少于预留，多余部分归还库存
+        success, result = OrderService.create_order(
+            buyer.id, [{'item_id': item.id, 'quantity': 2}], init_database['addresses'][0].id
+        )
+        assert success, result
+        db.session.expire_all()
+        assert db.session.get(Item, item.id).stock == 3
+
+    def test_check_stock_reserve_database_error(self, client, app, init_database, monkeypatch):
+        """测试预留时的数据库错误返回业务错误而不是 500，无效 Token 视为未登录"""
+        from sqlalchemy.exc import OperationalError
+        from app.services.reservation_service import ReservationService
+        from app.utils.jwt_helper import generate_token
+        item = init_database['items'][0]
+        body = {'items': [{'itemId': item.id, 'quantity': 1}], 'reserve': True}
+
+        response = client.post('/api/item/checkStock', json=body, headers={'Authorization': 'Bearer invalid'})
+        assert json.loads(response.data)['code'] != 0
+
+        def failing_reserve(buyer_id, quantities, ttl=None):
+            raise OperationalError('UPDATE items', {}, Exception(1205, 'Lock wait timeout'))
+
+        monkeypatch.setattr(ReservationService, 'reserve', staticmethod(failing_reserve))
+        headers = {'Authorization': f"Bearer {generate_token(user_id=init_database['users'][1].id)}"}
+        response = client.post('/api/item/checkStock', json=body, headers=headers)
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert data['code'] != 0
+        assert data['message'] == '库存预留失败，请稍后重试'
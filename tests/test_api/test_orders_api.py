@@ -361,3 +361,411 @@ class TestOrderConcurrency:
         
         # 最多只能有一个订单成功
         assert success_count <= 1
+    
+    def test_hot_item_checkout_without_deadlock(self, app, init_database):
+        """测试并发结算同一热点商品不发生死锁、无需重试（仅 MySQL：死锁来自 InnoDB 行锁与外键检查的共享锁）"""
+        import threading
+        from app.services.order_service import OrderService
+        from app.utils.metrics import metrics
+        if db.engine.dialect.name != 'mysql':
+            pytest.skip('需要 MySQL（InnoDB）行锁')
+        item = init_database['items'][0]
+        item_id = item.id
+        buyer_id = init_database['users'][1].id
+        address_id = init_database['addresses'][0].id
+        item.stock = 100
+        db.session.commit()
+        deadlocks_before = metrics.get('transaction.deadlock')
+        retries_before = metrics.get('transaction.retries.create_order')
+        
+        workers, orders_per_worker = 8, 5
+        barrier = threading.Barrier(workers)
+        results = []
+        
+        def checkout():
+            with app.app_context():
+                barrier.wait()
+                for _ in range(orders_per_worker):
+                    success, result = OrderService.create_order(
+                        buyer_id, [{'item_id': item_id, 'quantity': 1}], address_id)
+                    results.append((success, result))
+                db.session.remove()
+        
+        threads = [threading.Thread(target=checkout) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert len(results) == workers * orders_per_worker
+        assert all(success for success, _ in results), [result for success, result in results if not success]
+        assert metrics.get('transaction.deadlock') == deadlocks_before
+        assert metrics.get('transaction.retries.create_order') == retries_before
+        db.session.expire_all()
+        assert db.session.get(Item, item_id).stock == 100 - workers * orders_per_worker
+
+
+class TestStockDeduction:
+    """库存原子扣减测试"""
+    
+    def test_create_order_deducts_stock(self, app, init_database):
+        """测试创建订单扣减库存，取消订单恢复库存"""
+        from app.services.order_service import OrderService
+        item = init_database['items'][0]  # stock=5
+        buyer = init_database['users'][1]
+        address = init_database['addresses'][0]
+        
+        success, result = OrderService.create_order(
+            buyer.id, [{'item_id': item.id, 'quantity': 2}], address.id
+        )
+        assert success, result
+        db.session.expire_all()
+        assert db.session.get(Item, item.id).stock == 3
+        
+        success, _ = OrderService.cancel_order(result['order_id'], buyer.id)
+        assert success
+        db.session.expire_all()
+        assert db.session.get(Item, item.id).stock == 5
+    
+    def test_deduct_rejects_shortfall(self, app, init_database):
+        """测试条件 UPDATE 在库存不足时不扣减"""
+        from app.services.stock_service import StockService, InsufficientStockError
+        item1, item2 = init_database['items']  # stock=5, stock=1
+        
+        with pytest.raises(InsufficientStockError) as exc_info:
+            StockService.deduct({item1.id: 1, item2.id: 2})
+        db.session.rollback()
+        assert exc_info.value.item_id == item2.id
+        
+        db.session.expire_all()
+        assert db.session.get(Item, item1.id).stock == 5
+        assert db.session.get(Item, item2.id).stock == 1
+    
+    def test_deduct_rejects_inactive_item(self, app, init_database):
+        """测试已下架商品不能扣减库存"""
+        from app.services.stock_service import StockService, InsufficientStockError
+        item = init_database['items'][0]
+        item.is_active = False
+        db.session.commit()
+        
+        with pytest.raises(InsufficientStockError):
+            StockService.deduct({item.id: 1})
+        db.session.rollback()
+
+
+class TestTransactionRetry:
+    """订单事务锁冲突重试测试"""
+    
+    def test_retry_on_deadlock(self, app, monkeypatch):
+        """测试死锁时回滚重试，并记录重试次数"""
+        from sqlalchemy.exc import OperationalError
+        from app.utils.transaction import run_in_transaction
+        from app.utils.metrics import metrics
+        monkeypatch.setitem(app.config, 'TX_RETRY_BASE_DELAY', 0)
+        retries_before = metrics.get('transaction.retries.test_tx')
+        calls = []
+        
+        def tx():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError('UPDATE items', {}, Exception(1213, 'Deadlock found'))
+            return True, 'ok'
+        
+        assert run_in_transaction(tx, name='test_tx') == (True, 'ok')
+        assert len(calls) == 3
+        assert metrics.get('transaction.retries.test_tx') == retries_before + 2
+    
+    def test_no_retry_on_other_errors(self, app, monkeypatch):
+        """测试非锁冲突错误直接抛出，重试次数用尽后抛出原异常"""
+        from sqlalchemy.exc import OperationalError
+        from app.utils.transaction import run_in_transaction
+        monkeypatch.setitem(app.config, 'TX_RETRY_BASE_DELAY', 0)
+        calls = []
+        
+        def tx():
+            calls.append(1)
+            raise OperationalError('UPDATE items', {}, Exception(1205, 'Lock wait timeout'))
+        
+        with pytest.raises(OperationalError):
+            run_in_transaction(tx, name='test_tx', max_retries=2)
+        assert len(calls) == 3
+        
+        def bad_tx():
+            raise OperationalError('UPDATE items', {}, Exception(1054, 'Unknown column'))
+        
+        with pytest.raises(OperationalError):
+            run_in_transaction(bad_tx, name='test_tx')
+    
+    def test_retry_on_driver_deadlock(self, app, init_database, monkeypatch):
+        """测试数据库驱动抛出的死锁错误经引擎（含 handle_error 事件）传递后仍被识别并重试"""
+        import sqlite3
+        from sqlalchemy import event, update
+        from app.utils.transaction import run_in_transaction
+        from app.utils.metrics import metrics
+        monkeypatch.setitem(app.config, 'TX_RETRY_BASE_DELAY', 0)
+        item_id = init_database['items'][0].id  # stock=5
+        retries_before = metrics.get('transaction.retries.driver_tx')
+        failures = []
+        
+        def inject_deadlock(conn, cursor, statement, parameters, context, executemany):
+            # 前两次 UPDATE 模拟 MySQL 驱动返回 1213（驱动异常由引擎包装为 OperationalError）
+            if statement.startswith('UPDATE items') and len(failures) < 2:
+                failures.append(1)
+                raise sqlite3.OperationalError(1213, 'Deadlock found when trying to get lock')
+        
+        def tx():
+            db.session.execute(update(Item).where(Item.id == item_id).values(stock=Item.stock - 1))
+            db.session.commit()
+            return True
+        
+        event.listen(db.engine, 'before_cursor_execute', inject_deadlock)
+        try:
+            assert run_in_transaction(tx, name='driver_tx') is True
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', inject_deadlock)
+        
+        assert len(failures) == 2
+        assert metrics.get('transaction.retries.driver_tx') == retries_before + 2
+        db.session.expire_all()
+        assert db.session.get(Item, item_id).stock == 4
+
+
+class TestCheckout:
+    """购物车结算测试"""
+    
+    def test_checkout_splits_orders_by_seller(self, client, app, init_database, statement_counter):
+        """测试跨卖家购物车拆分为多个订单，明细与库存各只写一条语句"""
+        from app.models import User, OrderItem
+        from app.utils.jwt_helper import generate_token
+        seller2 = User(username='seller2', email='seller2@seu.edu.cn', password_hash='x', is_active=True)
+        db.session.add(seller2)
+        db.session.flush()
+        item3 = Item(seller_id=seller2.id, title='台灯', description='九成新', category='daily', price=30, stock=3, is_active=True)
+        db.session.add(item3)
+        db.session.commit()
+        
+        item1_id, item2_id, item3_id = init_database['items'][0].id, init_database['items'][1].id, item3.id
+        buyer_id = init_database['users'][1].id
+        seller1_id, seller2_id = init_database['users'][0].id, seller2.id
+        address_id = init_database['addresses'][0].id
+        headers = {'Authorization': f'Bearer {generate_token(user_id=buyer_id)}'}
+        for item_id, quantity in [(item1_id, 2), (item3_id, 1), (item2_id, 1)]:
+            client.post('/api/cart/addCart', json={'itemId': item_id, 'quantity': quantity})
+        
+        with statement_counter() as counter:
+            response = client.post('/orders/checkout', json={'address_id': address_id}, headers=headers)
+        
+        data = json.loads(response.data)
+        assert data['code'] == 0, data
+        orders = data['data']['orders']
+        assert [(o['seller_id'], o['items_count'], o['total_amount']) for o in orders] == [
+            (seller1_id, 2, 6090.99), (seller2_id, 1, 30.0)
+        ]
+        assert data['data']['total_amount'] == 6120.99
+        assert len([s for s in counter.statements if s.startswith('INSERT INTO order_items')]) == 1
+        assert len([s for s in counter.statements if s.startswith('UPDATE items')]) == 1
+        
+        db.session.expire_all()
+        assert OrderItem.query.filter(OrderItem.order_id == orders[1]['order_id']).one().item_id == item3_id
+        assert [db.session.get(Item, i).stock for i in (item1_id, item2_id, item3_id)] == [3, 0, 2]
+        assert json.loads(client.post('/api/cart/getCart', json={}).data)['data'] == []
+    
+    def test_create_order_rejects_multiple_sellers(self, client, app, init_database):
+        """测试 POST /orders/ 只创建单个订单：跨卖家商品返回错误，不创建订单也不扣库存"""
+        from app.models import User
+        from app.utils.jwt_helper import generate_token
+        seller2 = User(username='seller2', email='seller2@seu.edu.cn', password_hash='x', is_active=True)
+        db.session.add(seller2)
+        db.session.flush()
+        item3 = Item(seller_id=seller2.id, title='台灯', description='九成新', category='daily', price=30, stock=3, is_active=True)
+        db.session.add(item3)
+        db.session.commit()
+        item1_id, item3_id = init_database['items'][0].id, item3.id
+        headers = {'Authorization': f"Bearer {generate_token(user_id=init_database['users'][1].id)}"}
+        orders_before = Order.query.count()
+        
+        response = client.post('/orders/', json={
+            'items': [{'item_id': item1_id, 'quantity': 1}, {'item_id': item3_id, 'quantity': 1}],
+            'address_id': init_database['addresses'][0].id
+        }, headers=headers)
+        
+        data = json.loads(response.data)
+        assert data['code'] != 0
+        assert '多个卖家' in data['message']
+        db.session.expire_all()
+        assert Order.query.count() == orders_before
+        assert [db.session.get(Item, i).stock for i in (item1_id, item3_id)] == [5, 3]
+    
+    def test_checkout_retries_duplicate_order_number(self, app, init_database, monkeypatch):
+        """测试订单号与已有订单重复（工作进程ID冲突）时重新生成订单号重试，库存只扣一次"""
+        from app.services import order_service
+        from app.services.order_service import OrderService
+        from app.utils.metrics import metrics
+        item = init_database['items'][0]  # stock=5
+        buyer_id = init_database['users'][1].id
+        address_id = init_database['addresses'][0].id
+        success, first = OrderService.create_order(buyer_id, [{'item_id': item.id, 'quantity': 1}], address_id)
+        assert success, first
+        taken = db.session.get(Order, first['order_id']).order_number
+        
+        # 前两次生成的订单号与已有订单相同
+        duplicates = iter([taken, taken])
+        real_generate = order_service.generate_order_number
+        monkeypatch.setattr(order_service, 'generate_order_number', lambda: next(duplicates, None) or real_generate())
+        collisions_before = metrics.get('order.number_collisions')
+        success, second = OrderService.create_order(buyer_id, [{'item_id': item.id, 'quantity': 2}], address_id)
+        
+        assert success, second
+        assert metrics.get('order.number_collisions') == collisions_before + 2
+        assert db.session.get(Order, second['order_id']).order_number != taken
+        db.session.expire_all()
+        assert db.session.get(Item, item.id).stock == 2
+
+
+class TestOrderExpiry:
+    """超时未支付订单自动取消测试"""
+    
+    def test_expire_pending_orders(self, app, init_database):
+        """测试超时订单分批取消并恢复库存，未超时订单不受影响"""
+        from datetime import datetime, timedelta
+        from app.services.order_service import OrderService
+        item_id = init_database['items'][0].id  # stock=5
+        buyer_id = init_database['users'][1].id
+        address_id = init_database['addresses'][0].id
+        
+        order_ids = []
+        for _ in range(3):
+            success, result = OrderService.create_order(
+                buyer_id, [{'item_id': item_id, 'quantity': 1}], address_id
+            )
+            assert success, result
+            order_ids.append(result['order_id'])
+        
+        # 前两个订单创建于两小时前
+        db.session.query(Order).filter(Order.id.in_(order_ids[:2])).update(
+            {'created_at': datetime.now() - timedelta(hours=2)}, synchronize_session=False
+        )
+        db.session.commit()
+        
+        assert OrderService.expire_pending_orders(batch_size=1) == 2
+        db.session.expire_all()
+        assert [db.session.get(Order, order_id).status for order_id in order_ids] == [
+            'cancelled', 'cancelled', 'pending'
+        ]
+        assert db.session.get(Item, item_id).stock == 4
+        assert OrderService.expire_pending_orders() == 0
+
+
+class TestStockReservation:
+    """库存预留测试"""
+    
+    def test_expired_reservations_released_in_batches(self, app, init_database):
+        """测试后台任务分批归还过期预留的库存"""
+        from app.models import StockReservation
+        from app.services.reservation_service import ReservationService
+        item1, item2 = init_database['items']  # stock=5, stock=1
+        seller, buyer = init_database['users']
+        item1_id, item2_id = item1.id, item2.id
+        
+        ReservationService.reserve(buyer.id, {item1_id: 1}, ttl=600)
+        ReservationService.reserve(seller.id, {item1_id: 1, item2_id: 1}, ttl=-1)
+        db.session.expire_all()
+        assert db.session.get(Item, item1_id).stock == 3
+        assert db.session.get(Item, item2_id).stock == 0
+        
+        assert ReservationService.release_expired(batch_size=1) == 2
+        db.session.expire_all()
+        assert db.session.get(Item, item1_id).stock == 4
+        assert db.session.get(Item, item2_id).stock == 1
+        assert [(r.buyer_id, r.item_id) for r in StockReservation.query.all()] == [(buyer.id, item1_id)]
+        assert ReservationService.release_expired() == 0
+    
+    def test_order_with_reservation_skips_stock_update(self, app, init_database, statement_counter):
+        """测试预留足额时下单不再更新商品库存行"""
+        from app.services.order_service import OrderService
+        from app.services.reservation_service import ReservationService
+        item_id = init_database['items'][0].id
+        buyer_id = init_database['users'][1].id
+        address_id = init_database['addresses'][0].id
+        ReservationService.reserve(buyer_id, {item_id: 2})
+        
+        with statement_counter() as counter:
+            success, result = OrderService.create_order(
+                buyer_id, [{'item_id': item_id, 'quantity': 2}], address_id
+            )
+        
+        assert success, result
+        assert not [s for s in counter.statements if s.startswith('UPDATE items')]
+        db.session.expire_all()
+        assert db.session.get(Item, item_id).stock == 3
+
+
+class TestOrderListQueries:
+    """订单列表查询次数回归测试"""
+    
+    @staticmethod
+    def _create_orders(init_database, count):
+        from app.models import OrderItem
+        from app.utils.order_number import generate_order_number
+        buyer = init_database['users'][1]
+        seller = init_database['users'][0]
+        for _ in range(count):
+            order = Order(
+                order_number=generate_order_number(),
+                buyer_id=buyer.id,
+                seller_id=seller.id,
+                address_id=init_database['addresses'][0].id,
+                total_amount=51.49,
+                total_price=51.49,
+                status='pending',
+                shipping_address='九龙湖校区'
+            )
+            db.session.add(order)
+            db.session.flush()
+            for item in init_database['items']:
+                db.session.add(OrderItem(order_id=order.id, item_id=item.id, quantity=1, unit_price=item.price))
+        db.session.commit()
+        return buyer
+    
+    def test_query_count_independent_of_page_size(self, app, init_database, statement_counter):
+        """测试订单明细批量加载，查询次数不随每页订单数增长"""
+        from app.services.order_service import OrderService
+        buyer = self._create_orders(init_database, 30)
+        
+        counts = {}
+        for limit in (2, 30):
+            db.session.expire_all()
+            with statement_counter() as counter:
+                success, result = OrderService.get_orders(buyer.id, page=1, limit=limit)
+            counts[limit] = counter.count
+            assert success
+            assert len(result['orders']) == limit
+            assert all(order['items_count'] == 2 for order in result['orders'])
+        
+        assert counts[2] == counts[30]
+        
+        db.session.expire_all()
+        with statement_counter() as counter:
+            success, result = OrderService.get_orders(buyer.id, limit=30, cursor='')
+        assert success
+        assert counter.count == counts[30] - 1  # 游标分页不执行 count 查询
+    
+    def test_statistics_single_query(self, app, init_database, statement_counter):
+        """测试订单统计由一条聚合查询完成"""
+        from app.services.order_service import OrderService
+        buyer_id = self._create_orders(init_database, 3).id
+        orders = Order.query.filter_by(buyer_id=buyer_id).all()
+        orders[0].status = 'completed'
+        orders[1].status = 'paid'
+        db.session.commit()
+        
+        with statement_counter() as counter:
+            success, stats = OrderService.get_statistics(buyer_id)
+        assert success
+        assert counter.count == 1
+        assert stats == {
+            'total_orders': 3,
+            'pending_orders': 1,
+            'completed_orders': 1,
+            'total_spent': 102.98
+        }
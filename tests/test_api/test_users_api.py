@@ -0,0 +1,57 @@
+"""
+用户资料API测试
+测试用户资料查询及其中的统计数据
+"""
+
+import json
+from app.models import db
+
+
+class TestUserProfileStats:
+    """用户资料统计测试"""
+    
+    def test_profile_stats(self, client, app, init_database):
+        """测试用户资料中的已发布/已售出/收藏统计"""
+        from app.models import Order, OrderItem
+        from app.utils.order_number import generate_order_number
+        seller, buyer = init_database['users']
+        item1, item2 = init_database['items']
+        item1.favorites = 3
+        item2.favorites = 2
+        order = Order(
+            order_number=generate_order_number(),
+            buyer_id=buyer.id,
+            seller_id=seller.id,
+            address_id=init_database['addresses'][0].id,
+            total_amount=91.00,
+            total_price=91.00,
+            status='completed',
+            shipping_address='九龙湖校区'
+        )
+        db.session.add(order)
+        db.session.flush()
+        db.session.add(OrderItem(order_id=order.id, item_id=item1.id, quantity=2, unit_price=item1.price))
+        db.session.commit()
+        
+        response = client.get(f'/api/user/getUserProfile/{seller.id}')
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['data']['stats'] == {'published': 2, 'sold': 1, 'favorites': 5}
+    
+    def test_stats_cache_invalidated_on_item_write(self, app, init_database):
+        """测试统计缓存（共享的业务数据缓存）在商品下架后失效"""
+        from app.services.item_service import ItemService
+        from app.services.user_service import UserService
+        from app.utils.cache import data_cache
+        seller = init_database['users'][0]
+        item = init_database['items'][0]
+        app.config['USER_STATS_CACHE_TTL'] = 60
+        try:
+            assert UserService._get_user_stats(seller.id)['published'] == 2
+            assert data_cache.get(f'user_stats:{seller.id}')['published'] == 2
+            assert ItemService.delete_item(item.id, seller.id)['success']
+            assert UserService._get_user_stats(seller.id)['published'] == 1
+        finally:
+            app.config['USER_STATS_CACHE_TTL'] = 0
+            UserService.invalidate_user_stats(seller.id)
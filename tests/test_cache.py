@@ -0,0 +1,147 @@
+"""
+缓存工具测试
+测试 LRU 淘汰、SQLite 共享后端、并发加载合并与标签失效
+"""
+
+import threading
+import time
+import pytest
+from app.utils.cache import TTLCache, SQLiteCacheBackend, Cache, create_backend, invalidate_cache_tags
+
+
+class TestTTLCache:
+    """进程内缓存测试"""
+
+    def test_lru_eviction(self):
+        """测试容量满时淘汰最久未访问的记录"""
+        cache = TTLCache(ttl=60, max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1  # 访问 a，b 成为最久未访问
+        cache.set('c', 3)
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+
+    def test_expiry(self):
+        """测试记录过期"""
+        cache = TTLCache(ttl=60)
+        cache.set('a', 1, ttl=0)
+        assert cache.get('a', 'missing') == 'missing'
+
+    def test_max_ttl(self):
+        """测试 memory 后端的过期时间上限截断更长的 TTL（限制其他进程读到旧数据的时间）"""
+        cache = create_backend('memory', local_max_ttl=0.05)
+        cache.set('a', 1, ttl=300)
+        assert cache.get('a') == 1
+        time.sleep(0.1)
+        assert cache.get('a', 'missing') == 'missing'
+
+        unlimited = create_backend('memory', local_max_ttl=0)
+        unlimited.set('a', 1, ttl=300)
+        time.sleep(0.1)
+        assert unlimited.get('a') == 1
+
+
+class TestSQLiteCacheBackend:
+    """SQLite 共享缓存后端测试"""
+
+    def test_shared_between_instances(self, tmp_path):
+        """测试同一文件的两个后端实例共享数据（模拟多个工作进程）"""
+        path = str(tmp_path / 'cache.sqlite3')
+        backend1 = SQLiteCacheBackend(path)
+        backend2 = SQLiteCacheBackend(path)
+
+        backend1.set('key', {'items': [1, 2]}, ttl=60)
+        assert backend2.get('key') == {'items': [1, 2]}
+
+        backend2.delete('key')
+        assert backend1.get('key') is None
+
+        backend1.set('expired', 1, ttl=0)
+        assert backend2.get('expired', 'missing') == 'missing'
+
+    def test_unknown_backend(self):
+        """测试未知后端名称"""
+        with pytest.raises(ValueError):
+            create_backend('redis')
+
+
+class TestCacheSingleFlight:
+    """并发加载合并测试"""
+
+    def test_concurrent_misses_load_once(self):
+        """测试同一键的并发未命中只执行一次加载"""
+        cache = Cache('test_single_flight')
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_set('key', loader, ttl=60)))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert results == ['value'] * 8
+        assert len(calls) == 1
+        assert cache.get_or_set('key', loader) == 'value'
+        assert len(calls) == 1
+
+    def test_uncacheable_result(self):
+        """测试不可缓存的结果不写入缓存"""
+        cache = Cache('test_uncacheable')
+        cache.get_or_set('key', lambda: None, cacheable=lambda value: value is not None)
+
+        assert cache.get('key') is None
+        assert cache.stats()['misses'] == 2
+
+
+class TestCacheTags:
+    """标签失效测试"""
+
+    def test_invalidate_by_tag(self):
+        """测试标签失效只影响带该标签的条目"""
+        cache = Cache('test_tags')
+        cache.set_tagged('list:1', [1, 2], ['item:1', 'item:2'])
+        cache.set_tagged('list:2', [3], ['item:3'])
+
+        invalidate_cache_tags('item:2')
+
+        assert cache.get('list:1') is None
+        assert cache.get('list:2') == [3]
+
+    def test_evicted_tag_version_does_not_revive_entry(self):
+        """测试标签版本号被淘汰后，旧条目不会重新生效"""
+        cache = Cache('test_tag_eviction', backend=TTLCache(max_entries=100))
+        cache.set_tagged('detail', {'stock': 5}, ['item:1'])
+        cache.backend.delete('tag:item:1')
+
+        assert cache.get('detail') is None
+
+    @pytest.mark.parametrize('result_tags', [False, True])
+    def test_invalidation_during_load_skips_store(self, result_tags):
+        """测试加载期间标签被失效时，加载结果（可能已过期）不写入缓存"""
+        cache = Cache(f'test_tag_race_{result_tags}')
+        db_stock = {'value': 5}
+
+        def loader():
+            value = {'stock': db_stock['value']}
+            # 加载读库之后、写入缓存之前，另一个请求修改库存并失效标签
+            db_stock['value'] = 3
+            invalidate_cache_tags('item:1')
+            return value
+
+        tags = (lambda value: ['item:1']) if result_tags else ['item:1']
+        assert cache.get_or_set('detail', loader, tags=tags) == {'stock': 5}
+        assert cache.get('detail') is None
+        assert cache.get_or_set('detail', lambda: {'stock': db_stock['value']}, tags=tags) == {'stock': 3}
+        assert cache.get('detail') == {'stock': 3}
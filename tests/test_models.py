@@ -5,7 +5,7 @@
 
 import pytest
 from datetime import datetime
-from app.models import User, Item, Order, OrderItem, Address, Review, db
+from app.models import User, Item, Order, OrderItem, Address, Review, UserRating, db
 
 
 class TestUserModel:
@@ -176,6 +176,21 @@ class TestOrderModel:
                 db.session.add(order)
                 db.session.commit()
 
+    
+    def test_generate_order_number(self):
+        """测试订单号唯一、定长且按生成顺序递增"""
+        from app.utils.order_number import OrderNumberGenerator, parse_order_number
+        generator = OrderNumberGenerator(worker_id=7)
+        numbers = [generator.next_order_number() for _ in range(10000)]
+        
+        assert len(set(numbers)) == len(numbers)
+        assert numbers == sorted(numbers)
+        assert all(len(n) == 22 and n.startswith('ORD') for n in numbers)
+        
+        parsed = parse_order_number(numbers[0])
+        assert parsed['worker_id'] == 7
+        assert abs((parsed['created_at'] - datetime.now()).total_seconds()) < 60
+        assert parse_order_number('ORD17000000001234') is None
 
 class TestOrderItemModel:
     """订单明细模型测试"""
@@ -311,6 +326,88 @@ class TestReviewModel:
             assert review.rating == 3
 
 
+class TestUserRatingModel:
+    """评分汇总模型测试"""
+    
+    def _create_completed_order(self, buyer, seller, address, item):
+        """创建一个包含指定商品的已完成订单"""
+        order = Order(
+            order_number=f'ORDTEST{item.id}',
+            buyer_id=buyer.id,
+            seller_id=seller.id,
+            address_id=address.id,
+            total_amount=100.0,
+            total_price=100.0,
+            shipping_address='测试地址',
+            status='completed'
+        )
+        db.session.add(order)
+        db.session.flush()
+        db.session.add(OrderItem(order_id=order.id, item_id=item.id, quantity=1, unit_price=item.price))
+        db.session.commit()
+        return order
+    
+    def test_create_review_updates_summary(self, app, init_database):
+        """测试创建评价时同步更新评分汇总"""
+        from app.services.review_service import ReviewService
+        from app.services.user_service import UserService
+        
+        with app.app_context():
+            seller, buyer = init_database['users']
+            address = init_database['addresses'][0]
+            item1, item2 = init_database['items']
+            order1 = self._create_completed_order(buyer, seller, address, item1)
+            order2 = self._create_completed_order(buyer, seller, address, item2)
+            
+            assert ReviewService.create_review(order1.id, item1.id, buyer.id, 5, '很好')[0]
+            assert ReviewService.create_review(order2.id, item2.id, buyer.id, 2, '一般')[0]
+            
+            summary = db.session.get(UserRating, seller.id)
+            assert summary.rating_sum == 7
+            assert summary.rating_count == 2
+            assert summary.positive_count == 1
+            assert UserService._get_user_rating(seller.id) == 3.5
+            
+            success, rating = ReviewService.get_user_rating(seller.id)
+            assert success
+            assert rating['histogram'] == {'1': 0, '2': 1, '3': 0, '4': 0, '5': 1}
+    
+    def test_create_review_invalid_rating(self, app, init_database):
+        """测试评分超出范围时不写入评价和汇总"""
+        from app.services.review_service import ReviewService
+        
+        with app.app_context():
+            seller, buyer = init_database['users']
+            address = init_database['addresses'][0]
+            item = init_database['items'][0]
+            order = self._create_completed_order(buyer, seller, address, item)
+            
+            success, _ = ReviewService.create_review(order.id, item.id, buyer.id, 6, '越界')
+            assert not success
+            assert db.session.get(UserRating, seller.id) is None
+    
+    def test_rebuild_rating_summaries(self, app, init_database):
+        """测试从评价表重建评分汇总"""
+        from app.services.review_service import ReviewService
+        
+        with app.app_context():
+            seller, buyer = init_database['users']
+            address = init_database['addresses'][0]
+            item = init_database['items'][0]
+            order = self._create_completed_order(buyer, seller, address, item)
+            
+            # 直接写入评价（模拟历史数据，汇总表中无记录）
+            db.session.add(Review(order_id=order.id, item_id=item.id, reviewer_id=buyer.id,
+                                  reviewee_id=seller.id, rating=4, content='历史评价'))
+            db.session.commit()
+            
+            assert ReviewService.rebuild_rating_summaries() == 1
+            summary = db.session.get(UserRating, seller.id)
+            assert summary.rating_count == 1
+            assert summary.star_4_count == 1
+            assert summary.average_rating == 4.0
+
+
 class TestDatabaseIntegrity:
     """数据库完整性测试"""
     
@@ -0,0 +1,56 @@
+"""
+游标分页工具测试
+测试游标编解码与排序键为 NULL 时的范围条件
+"""
+
+import base64
+import pytest
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, select
+from app.utils.pagination import CursorError, encode_cursor, decode_cursor, keyset_condition, keyset_order
+
+
+class TestKeysetPagination:
+    """游标分页测试"""
+
+    def test_cursor_round_trip_with_null_key(self):
+        """测试 NULL 排序键可以编码并解析，排序方式不匹配时报错"""
+        cursor = encode_cursor('popular', None, 7)
+        assert decode_cursor(cursor, 'popular', 'int') == (None, 7)
+        with pytest.raises(CursorError):
+            decode_cursor(cursor, 'latest', 'datetime')
+
+    @pytest.mark.parametrize('payload', [b'[1]', b'1', b'"popular"', b'null', b'{"s": "popular"}', b'not json'])
+    def test_malformed_cursor_rejected(self, payload):
+        """测试内容不是合法游标对象的游标报 CursorError（而不是其他异常）"""
+        cursor = base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+        with pytest.raises(CursorError):
+            decode_cursor(cursor, 'popular', 'int')
+
+    @pytest.mark.parametrize('descending', [True, False])
+    def test_pages_cover_null_keys(self, descending):
+        """测试逐页翻页覆盖全部记录（包括排序键为 NULL 的记录），且与一次性排序结果一致"""
+        engine = create_engine('sqlite://')
+        table = Table('rows', MetaData(), Column('id', Integer, primary_key=True), Column('views', Integer))
+        table.metadata.create_all(engine)
+        values = [5, None, 3, 5, None, 1, None, 3]
+        with engine.begin() as conn:
+            conn.execute(table.insert(), [{'id': i + 1, 'views': v} for i, v in enumerate(values)])
+
+            order = keyset_order(table.c.views, table.c.id, descending)
+            expected = [row.id for row in conn.execute(select(table.c.id).order_by(*order))]
+
+            seen = []
+            cursor = ''
+            while True:
+                query = select(table.c.id, table.c.views).order_by(*order).limit(3)
+                if cursor:
+                    key_value, last_id = decode_cursor(cursor, 'popular', 'int')
+                    query = query.where(keyset_condition(table.c.views, table.c.id, key_value, last_id, descending))
+                rows = conn.execute(query).all()
+                if not rows:
+                    break
+                seen += [row.id for row in rows]
+                cursor = encode_cursor('popular', rows[-1].views, rows[-1].id)
+
+        assert seen == expected
+        assert len(seen) == len(values)
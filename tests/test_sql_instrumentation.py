@@ -0,0 +1,65 @@
+"""
+SQL 执行统计测试
+测试请求级语句数统计、Server-Timing 响应头、慢查询日志与执行失败时的原始异常
+"""
+
+import logging
+import re
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from app import db
+from app.models import Item
+from app.utils.metrics import metrics
+
+
+class TestSQLInstrumentation:
+    """SQL 执行统计测试"""
+
+    def test_server_timing_header(self, client, app, init_database, statement_counter):
+        """测试响应头中的语句数与实际执行的语句数一致，并按接口累计"""
+        item_id = init_database['items'][0].id
+        before = metrics.get('sql.queries.items.get_detail')
+        with statement_counter() as counter:
+            response = client.get(f'/api/item/getDetail/{item_id}')
+
+        assert response.status_code == 200
+        header = response.headers['Server-Timing']
+        match = re.match(r'db;dur=[\d.]+;desc="(\d+) queries", app;dur=[\d.]+$', header)
+        assert match is not None
+        assert int(match.group(1)) == counter.count > 0
+        assert metrics.get('sql.queries.items.get_detail') - before == counter.count
+
+    def test_slow_query_logged_with_plan(self, client, app, init_database, caplog):
+        """测试超过阈值的语句记录参数、接口与执行计划"""
+        item_id = init_database['items'][0].id
+        app.config['SQL_SLOW_QUERY_MS'] = 0.000001
+        try:
+            with caplog.at_level(logging.WARNING, logger='app.middleware.sql_instrumentation'):
+                response = client.get(f'/api/item/getDetail/{item_id}')
+        finally:
+            app.config['SQL_SLOW_QUERY_MS'] = 200
+
+        assert response.status_code == 200
+        messages = [record.getMessage() for record in caplog.records if '慢查询' in record.getMessage()]
+        assert messages
+        assert all('接口: items.get_detail' in message for message in messages)
+        assert any(message.startswith('慢查询') and '\nSQL: SELECT' in message and '\n参数: ' in message
+                   and '\n执行计划:' in message for message in messages)
+
+    def test_failed_statement_keeps_original_error(self, app, init_database):
+        """测试语句执行失败时抛出原始的数据库异常，且计时栈被清空"""
+        seller_id = init_database['users'][0].id
+        with pytest.raises(OperationalError):
+            db.session.execute(text('SELECT * FROM no_such_table'))
+        db.session.rollback()
+
+        # 缺少 NOT NULL 字段 description
+        with pytest.raises(IntegrityError):
+            db.session.execute(insert(Item).values(seller_id=seller_id, title='x', category='books',
+                                                   price=1, stock=1, description=None))
+        db.session.rollback()
+
+        connection = db.session.connection()
+        assert connection.info.get('sql_started', []) == []
+        assert db.session.execute(text('SELECT 1')).scalar() == 1